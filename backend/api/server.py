@@ -4,18 +4,42 @@ FastAPI server for Circuit Design Agent
 Provides REST API endpoints for React frontend communication
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response, PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import sys
 import os
+import json
+import uuid
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 # Add the src directory to the path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from circuit_agent import CircuitDesignAgent
+from session_store import SessionManager
+from response_cache import ResponseCache
+from batch_validation import validate_batch, ValidationSummary
+from llm_backend import backend_from_env, call_settings_from_env, LLMError
+from llm_scheduler import LLMScheduler
+from design_store import DesignStore, encode_json, summarize_design
+from compression import CompressionCache
+from template_index import TemplateIndex
+from exporters import EXPORTERS, export_design
+from design_analysis import DEFAULT_MAX_FAN_OUT, analyze_design, analyze_model
+from design_prefetch import DesignPrefetcher
+from observability import REGISTRY, LOCAL_LATENCY_BUCKETS, configure_logging
+
+# LOG_LEVEL, LOG_FORMAT=json for structured logs, DEBUG_DUMPS=0 to never dump response text
+configure_logging()
+logger = logging.getLogger("api")
 
 app = FastAPI(
     title="Circuit Design Agent API",
@@ -32,9 +56,66 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global agent instance
+# Global agent instance; holds the API clients shared by every session
 agent = None
 
+# Per-session conversation state, keyed by session_id
+sessions = SessionManager.from_env()
+
+# Generated designs, served as summaries and per-block details with ETags
+design_store = DesignStore.from_env()
+compressed_payloads = CompressionCache()
+
+# Speculative design generation after a requirements summary turn (DESIGN_PREFETCH=1)
+prefetcher = DesignPrefetcher.from_env()
+
+# Signal-graph analysis of generated designs before they are returned (DESIGN_ANALYSIS=0 to skip)
+design_analysis_enabled = os.getenv("DESIGN_ANALYSIS", "1") != "0"
+analysis_max_fan_out = int(os.getenv("ANALYSIS_MAX_FAN_OUT", str(DEFAULT_MAX_FAN_OUT)))
+
+# Process pool for bulk validation, created on first use
+validation_workers = os.cpu_count() or 1
+validation_pool = None
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "API latency to the response headers, by route, method and status"
+)
+DESIGN_ANALYSIS_SECONDS = REGISTRY.histogram(
+    "design_analysis_duration_seconds", "Time to analyze the signal graph of a generated design", LOCAL_LATENCY_BUCKETS
+)
+DESIGN_ISSUES = REGISTRY.counter("design_analysis_issues_total", "Signal-graph issues found in generated designs, by kind")
+REGISTRY.gauge("design_sessions_active", "Sessions held in the session store", lambda: sessions.stats()["active_sessions"])
+REGISTRY.gauge("design_store_designs", "Designs held in the design store", lambda: design_store.stats()["designs"])
+REGISTRY.gauge("llm_queued_calls", "LLM calls waiting in the scheduler queue", lambda: agent.scheduler.stats()["queued"] if agent else None)
+REGISTRY.gauge("llm_in_flight_calls", "LLM calls in progress", lambda: agent.scheduler.stats()["in_flight"] if agent else None)
+REGISTRY.gauge(
+    "llm_response_cache_lookups_total", "LLM response cache lookups by result",
+    lambda: {key: value for key, value in agent.response_cache.stats().items() if key in ("memory_hits", "disk_hits", "misses")}
+    if agent and agent.response_cache else None,
+    label="result", kind="counter"
+)
+REGISTRY.gauge(
+    "design_templates", "Designs in the template retrieval index",
+    lambda: len(agent.template_index) if agent and agent.template_index is not None else None
+)
+REGISTRY.gauge(
+    "design_recoveries_total", "Generated designs by recovery tier",
+    lambda: dict(agent.repair_metrics.counts) if agent else None,
+    label="tier", kind="counter"
+)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Observe the latency of every API request under its route template"""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        route=route.path if route else "unmatched", method=request.method, status=response.status_code
+    )
+    return response
+
 class SessionStartRequest(BaseModel):
     description: str
 
@@ -44,6 +125,25 @@ class UserResponseRequest(BaseModel):
 
 class CircuitGenerationRequest(BaseModel):
     session_id: str
+    # Concurrent candidates for best-of-N generation (default: DESIGN_CANDIDATES)
+    candidates: Optional[int] = None
+    # Return the first valid candidate instead of waiting for the best-scored one
+    first_valid: bool = True
+    # Skeleton call plus concurrent per-block detail calls (default: HIERARCHICAL_GENERATION)
+    hierarchical: Optional[bool] = None
+    # Return only ids, positions, ports and edges; fetch block details from /api/circuit/{design_id}/block/{block_id}
+    summary: bool = False
+
+class DesignEditRequest(BaseModel):
+    # Natural-language edit, turned into a JSON Patch by the LLM
+    instruction: Optional[str] = None
+    # JSON Patch (RFC 6902) to apply directly instead of an instruction
+    patch: Optional[List[Dict[str, Any]]] = None
+    # Blocks the instruction is about, in addition to those it names
+    block_ids: Optional[List[str]] = None
+    # Also return the edited design (full, or its summary projection)
+    include_design: bool = False
+    summary: bool = False
 
 class SessionResponse(BaseModel):
     session_id: str
@@ -53,16 +153,148 @@ class CircuitDesignResponse(BaseModel):
     circuit_design: Dict[str, Any]
     success: bool
     errors: Optional[List[str]] = None
+    design_id: Optional[str] = None
+    # Retrieved template: template_id, name, score and whether it was returned as is instead of generating
+    template: Optional[Dict[str, Any]] = None
+    # Signal-graph analysis of the design (see /api/circuit/analyze), unless DESIGN_ANALYSIS=0
+    analysis: Optional[Dict[str, Any]] = None
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize the circuit design agent on startup"""
     global agent
     try:
-        agent = CircuitDesignAgent()
-        print("Circuit Design Agent initialized successfully")
+        agent = CircuitDesignAgent(
+            prompt_caching=os.getenv("PROMPT_CACHING", "1") != "0",
+            auto_layout=os.getenv("AUTO_LAYOUT", "1") != "0",
+            llm_repair=os.getenv("LLM_REPAIR", "1") != "0",
+            temperature=float(os.getenv("LLM_TEMPERATURE", "0.7")),
+            response_cache=ResponseCache.from_env(),
+            backend=backend_from_env(),
+            call_settings=call_settings_from_env(),
+            design_candidates=int(os.getenv("DESIGN_CANDIDATES", "1")),
+            history_token_budget=int(os.getenv("HISTORY_TOKEN_BUDGET", "8000")),
+            hierarchical=os.getenv("HIERARCHICAL_GENERATION", "0") == "1",
+            block_detail_concurrency=int(os.getenv("BLOCK_DETAIL_CONCURRENCY", "8")),
+            scheduler=LLMScheduler.from_env(),
+            template_index=TemplateIndex.from_env(),
+            template_reuse_score=float(os.getenv("TEMPLATE_REUSE_SCORE", "0.9")),
+            template_hint_score=float(os.getenv("TEMPLATE_HINT_SCORE", "0.3"))
+        )
+        logger.info("Circuit Design Agent initialized successfully")
     except Exception as e:
-        print(f"Failed to initialize Circuit Design Agent: {e}")
+        logger.error("Failed to initialize Circuit Design Agent: %s", e)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the bulk validation worker processes"""
+    if validation_pool is not None:
+        validation_pool.shutdown(cancel_futures=True)
+
+async def take_prefetched(session_agent: CircuitDesignAgent, request: CircuitGenerationRequest) -> Optional[dict]:
+    """Return the design prefetched for this exact request (setting the agent's template match), or None"""
+    if not prefetcher:
+        return None
+    prefetched = await prefetcher.take(
+        request.session_id, session_agent.session_state(), (request.candidates, request.first_valid, request.hierarchical)
+    )
+    if prefetched is None:
+        return None
+    design, session_agent.last_template = prefetched
+    return design
+
+def get_session_agent(session_id: str) -> CircuitDesignAgent:
+    """Load a session's state into an agent bound to it, or raise 404"""
+    state = sessions.get(session_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"Session not found or expired: {session_id}")
+    return agent.for_session(state)
+
+def llm_error_exception(error: LLMError) -> HTTPException:
+    """Map a failed LLM call to 503 with Retry-After if it may succeed later, else 502"""
+    if error.retryable:
+        retry_after = str(max(1, math.ceil(error.retry_after or 1)))
+        return HTTPException(status_code=503, detail=f"LLM temporarily unavailable: {str(error)}", headers={"Retry-After": retry_after})
+    return HTTPException(status_code=502, detail=f"LLM request failed: {str(error)}")
+
+def llm_error_event(error: LLMError) -> str:
+    """SSE error event for an LLM call that failed mid-stream; the session is not saved"""
+    return sse_event("error", {"detail": str(error), "retryable": error.retryable, "retry_after": error.retry_after})
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag, ignoring weak and encoding markers"""
+    if not if_none_match:
+        return False
+    base = etag.strip('"')
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"').split("-")[0] == base:
+            return True
+    return False
+
+def design_payload_response(request: Request, payload) -> Response:
+    """Serve a stored (body, ETag) with conditional GET and cached gzip/brotli compression"""
+    body, etag = payload
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    content, encoding = compressed_payloads.encode(body, etag, request.headers.get("accept-encoding"))
+    # Each encoding is a different representation, so it gets its own ETag
+    headers["ETag"] = f'{etag[:-1]}-{encoding}"' if encoding else etag
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type="application/json", headers=headers)
+
+def export_response(design: Dict[str, Any], fmt: str, include_power: bool, filename: str) -> StreamingResponse:
+    """Stream a design in an export format as a download"""
+    if fmt not in EXPORTERS:
+        raise HTTPException(status_code=404, detail=f"Unknown export format: {fmt} (expected one of {', '.join(EXPORTERS)})")
+    _, media_type, extension = EXPORTERS[fmt]
+    return StreamingResponse(
+        (chunk.encode() for chunk in export_design(design, fmt, include_power)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}{extension}"'}
+    )
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Events message; bytes are taken as already serialized JSON"""
+    payload = data if isinstance(data, bytes) else encode_json(data)
+    return f"event: {event}\ndata: {payload.decode()}\n\n"
+
+def precheck_design(design_id: str) -> Optional[Dict[str, Any]]:
+    """Analyze a stored design's signal graph on its model, recording issue metrics; None when disabled"""
+    if not design_analysis_enabled:
+        return None
+    analysis = analyze_model(design_store.model(design_id), max_fan_out=analysis_max_fan_out)
+    DESIGN_ANALYSIS_SECONDS.observe(analysis["analysis_ms"] / 1000)
+    for kind, count in analysis["issues"].items():
+        if count:
+            DESIGN_ISSUES.inc(count, kind=kind)
+    if analysis["warnings"]:
+        logger.info("design %s: %d signal-graph issues", design_id, len(analysis["warnings"]))
+    return analysis
+
+def design_response_body(design_id: str, summary: bool, template: Optional[Dict[str, Any]]) -> bytes:
+    """Serialize a successful CircuitDesignResponse around the stored design's cached view bytes.
+    
+    The design was validated when it was generated, so it is neither
+    re-validated by pydantic nor serialized a second time.
+    """
+    body, _ = design_store.view(design_id, "summary" if summary else "full")
+    return (b'{"circuit_design":' + body + b',"success":true,"errors":null,"design_id":' + encode_json(design_id)
+            + b',"template":' + encode_json(template) + b',"analysis":' + encode_json(precheck_design(design_id)) + b'}')
+
+def sse_response(events) -> StreamingResponse:
+    """Wrap an async generator of SSE messages in a streaming response"""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/")
 async def root():
@@ -78,13 +310,17 @@ async def start_session(request: SessionStartRequest):
         raise HTTPException(status_code=500, detail="Agent not initialized")
     
     try:
-        response = agent.start_design_session(request.description)
-        session_id = f"session_{hash(request.description)}_{len(agent.conversation_history)}"
+        session_agent = agent.for_session()
+        response = await session_agent.start_design_session_async(request.description)
+        session_id = f"session_{uuid.uuid4().hex}"
+        sessions.save(session_id, session_agent.session_state())
         
         return SessionResponse(
             session_id=session_id,
             agent_response=response
         )
+    except LLMError as e:
+        raise llm_error_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to start session: {str(e)}")
 
@@ -96,13 +332,23 @@ async def process_response(request: UserResponseRequest):
     if not agent:
         raise HTTPException(status_code=500, detail="Agent not initialized")
     
+    session_agent = get_session_agent(request.session_id)
+    if prefetcher:
+        # The answer changes the conversation the prefetch was generating from
+        prefetcher.discard(request.session_id)
+    
     try:
-        response = agent.process_user_response(request.response)
+        response = await session_agent.process_user_response_async(request.response)
+        sessions.save(request.session_id, session_agent.session_state())
+        if prefetcher:
+            prefetcher.start(request.session_id, session_agent, response)
         
         return SessionResponse(
             session_id=request.session_id,
             agent_response=response
         )
+    except LLMError as e:
+        raise llm_error_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process response: {str(e)}")
 
@@ -114,52 +360,429 @@ async def generate_circuit(request: CircuitGenerationRequest):
     if not agent:
         raise HTTPException(status_code=500, detail="Agent not initialized")
     
+    session_agent = get_session_agent(request.session_id)
+    
     try:
-        circuit_design = agent.generate_circuit_design()
+        prefetched = await take_prefetched(session_agent, request)
+        if prefetched:
+            circuit_design = prefetched
+        else:
+            circuit_design = await session_agent.generate_circuit_design_async(
+                candidates=request.candidates,
+                first_valid=request.first_valid,
+                hierarchical=request.hierarchical
+            )
         
         if "error" in circuit_design:
             return CircuitDesignResponse(
                 circuit_design={},
                 success=False,
-                errors=[circuit_design.get("error", "Unknown error")]
+                errors=[circuit_design.get("error", "Unknown error")],
+                template=session_agent.last_template
             )
         
-        return CircuitDesignResponse(
-            circuit_design=circuit_design,
-            success=True
+        design_id = design_store.put(circuit_design)
+        return Response(
+            content=design_response_body(design_id, request.summary, session_agent.last_template),
+            media_type="application/json"
         )
+    except LLMError as e:
+        raise llm_error_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate circuit: {str(e)}")
 
+@app.post("/api/session/start/stream")
+async def start_session_stream(request: SessionStartRequest):
+    """Start a new design session, streaming the agent's questions as SSE"""
+    global agent
+    
+    if not agent:
+        raise HTTPException(status_code=500, detail="Agent not initialized")
+    
+    session_agent = agent.for_session()
+    session_id = f"session_{uuid.uuid4().hex}"
+    
+    async def events():
+        yield sse_event("session", {"session_id": session_id})
+        try:
+            async for text in session_agent.stream_design_session(request.description):
+                yield sse_event("delta", {"text": text})
+        except LLMError as e:
+            yield llm_error_event(e)
+            return
+        sessions.save(session_id, session_agent.session_state())
+        yield sse_event("done", {
+            "session_id": session_id,
+            "agent_response": session_agent.conversation_history[-1]["content"]
+        })
+    
+    return sse_response(events())
+
+@app.post("/api/session/respond/stream")
+async def process_response_stream(request: UserResponseRequest):
+    """Process a user response, streaming the agent's reply as SSE"""
+    global agent
+    
+    if not agent:
+        raise HTTPException(status_code=500, detail="Agent not initialized")
+    
+    session_agent = get_session_agent(request.session_id)
+    if prefetcher:
+        prefetcher.discard(request.session_id)
+    
+    async def events():
+        try:
+            async for text in session_agent.stream_user_response(request.response):
+                yield sse_event("delta", {"text": text})
+        except LLMError as e:
+            yield llm_error_event(e)
+            return
+        sessions.save(request.session_id, session_agent.session_state())
+        if prefetcher:
+            prefetcher.start(request.session_id, session_agent, session_agent.conversation_history[-1]["content"])
+        yield sse_event("done", {
+            "session_id": request.session_id,
+            "agent_response": session_agent.conversation_history[-1]["content"]
+        })
+    
+    return sse_response(events())
+
+@app.post("/api/circuit/generate/stream")
+async def generate_circuit_stream(request: CircuitGenerationRequest):
+    """Generate a circuit design, streaming circuit_info, each block and each signal_flow edge as SSE"""
+    global agent
+    
+    if not agent:
+        raise HTTPException(status_code=500, detail="Agent not initialized")
+    
+    session_agent = get_session_agent(request.session_id)
+    
+    async def events():
+        try:
+            async for event in session_agent.stream_circuit_design(await take_prefetched(session_agent, request)):
+                if event["type"] != "design":
+                    yield sse_event(event["type"], event["data"])
+                    continue
+                
+                circuit_design = event["data"]
+                if "error" in circuit_design:
+                    result = CircuitDesignResponse(circuit_design={}, success=False, errors=[circuit_design["error"]],
+                                                   template=session_agent.last_template)
+                    yield sse_event("done", result.model_dump())
+                else:
+                    design_id = design_store.put(circuit_design)
+                    yield sse_event("done", design_response_body(design_id, request.summary, session_agent.last_template))
+        except LLMError as e:
+            yield llm_error_event(e)
+    
+    return sse_response(events())
+
+@app.get("/api/circuit/{design_id}")
+async def get_design(design_id: str, request: Request):
+    """Get a stored circuit design in full"""
+    payload = design_store.view(design_id, "full")
+    if payload is None:
+        raise HTTPException(status_code=404, detail=f"Design not found: {design_id}")
+    return design_payload_response(request, payload)
+
+@app.get("/api/circuit/{design_id}/summary")
+async def get_design_summary(design_id: str, request: Request):
+    """Get the summary projection of a stored design: circuit info, block ids/positions/ports and signal flow"""
+    payload = design_store.view(design_id, "summary")
+    if payload is None:
+        raise HTTPException(status_code=404, detail=f"Design not found: {design_id}")
+    return design_payload_response(request, payload)
+
+@app.get("/api/circuit/{design_id}/block/{block_id}")
+async def get_design_block(design_id: str, block_id: str, request: Request):
+    """Get every field of one block of a stored design"""
+    payload = design_store.view(design_id, "block", block_id)
+    if payload is None:
+        raise HTTPException(status_code=404, detail=f"Block not found: {design_id}/{block_id}")
+    return design_payload_response(request, payload)
+
+@app.get("/api/circuit/{design_id}/export/{fmt}")
+async def export_stored_design(design_id: str, fmt: str, include_power: bool = True):
+    """Export a stored design as an SVG diagram, GraphViz DOT, a SPICE-style netlist or JSON"""
+    design = design_store.get(design_id)
+    if design is None:
+        raise HTTPException(status_code=404, detail=f"Design not found: {design_id}")
+    return export_response(design, fmt, include_power, design_id)
+
+@app.post("/api/circuit/export/{fmt}")
+async def export_circuit(fmt: str, circuit_design: Dict[str, Any], include_power: bool = True):
+    """Export a design sent in the body"""
+    return export_response(circuit_design, fmt, include_power, "circuit_design")
+
+@app.post("/api/circuit/{design_id}/edit")
+async def edit_design(design_id: str, request: DesignEditRequest):
+    """Edit a stored design with an instruction or a JSON Patch; returns the patch that was applied"""
+    global agent
+    
+    if not agent:
+        raise HTTPException(status_code=500, detail="Agent not initialized")
+    
+    design = design_store.get(design_id)
+    if design is None:
+        raise HTTPException(status_code=404, detail=f"Design not found: {design_id}")
+    
+    try:
+        result = await agent.edit_circuit_design_async(
+            design, instruction=request.instruction, patch=request.patch, focus_block_ids=request.block_ids
+        )
+    except LLMError as e:
+        raise llm_error_exception(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to edit circuit: {str(e)}")
+    
+    if "error" in result:
+        return {
+            "success": False,
+            "design_id": design_id,
+            "errors": [result["error"]] + result.get("validation_errors", []),
+            "patch": result.get("patch")
+        }
+    
+    design_store.put(result["design"], design_id)
+    response = {
+        "success": True,
+        "design_id": design_id,
+        "patch": result["patch"],
+        "changed_blocks": result["changed_blocks"],
+        "added_blocks": result["added_blocks"],
+        "removed_blocks": result["removed_blocks"],
+        "warnings": result["warnings"]
+    }
+    if request.include_design:
+        response["circuit_design"] = summarize_design(result["design"]) if request.summary else result["design"]
+    return response
+
 @app.post("/api/circuit/validate")
-async def validate_circuit(circuit_design: Dict[str, Any]):
-    """Validate a circuit design JSON structure"""
+async def validate_circuit(circuit_design: Dict[str, Any], strict_ports: bool = False, detect_cycles: bool = False):
+    """Validate a circuit design JSON structure and its signal flow"""
     global agent
     
     if not agent:
         raise HTTPException(status_code=500, detail="Agent not initialized")
     
     try:
-        validation_result = agent.validate_circuit_design(circuit_design)
+        validation_result = agent.validate_circuit_design(
+            circuit_design, strict_ports=strict_ports, detect_cycles=detect_cycles
+        )
         return {
             "valid": validation_result["valid"],
-            "errors": validation_result["errors"]
+            "errors": validation_result["errors"],
+            "warnings": validation_result["warnings"]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to validate circuit: {str(e)}")
 
+@app.post("/api/circuit/analyze")
+async def analyze_circuit(circuit_design: Dict[str, Any], max_fan_out: int = DEFAULT_MAX_FAN_OUT):
+    """Analyze a design's signal graph: reachability, orphaned and unpowered blocks, fan-out, loops and power budget"""
+    global agent
+    
+    if not agent:
+        raise HTTPException(status_code=500, detail="Agent not initialized")
+    
+    try:
+        validation_result = agent.validate_circuit_design(circuit_design)
+        if not validation_result["valid"]:
+            return {"valid": False, "errors": validation_result["errors"], "analysis": None}
+        return {"valid": True, "errors": [], "analysis": analyze_design(circuit_design, max_fan_out=max_fan_out)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to analyze circuit: {str(e)}")
+
+@app.post("/api/circuit/layout")
+async def layout_circuit(circuit_design: Dict[str, Any]):
+    """Return the design with block positions computed from its signal flow"""
+    global agent
+    
+    if not agent:
+        raise HTTPException(status_code=500, detail="Agent not initialized")
+    
+    try:
+        blocks = agent.suggest_block_positions(circuit_design.get("blocks", []), circuit_design.get("signal_flow", []))
+        return dict(circuit_design, blocks=blocks)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to lay out circuit: {str(e)}")
+
+@app.get("/api/templates/search")
+async def search_templates(q: str, limit: int = 5):
+    """Find indexed designs similar to a description, best first"""
+    global agent
+    
+    if not agent:
+        raise HTTPException(status_code=500, detail="Agent not initialized")
+    if agent.template_index is None:
+        raise HTTPException(status_code=404, detail="Template index not enabled (TEMPLATE_INDEX=1)")
+    
+    return {"query": q, "matches": agent.template_index.search(q, limit=max(1, min(limit, 50)))}
+
+@app.get("/api/templates/{template_id}")
+async def get_template(template_id: str):
+    """Get an indexed design"""
+    global agent
+    
+    if not agent:
+        raise HTTPException(status_code=500, detail="Agent not initialized")
+    design = agent.template_index.get(template_id) if agent.template_index is not None else None
+    if design is None:
+        raise HTTPException(status_code=404, detail=f"Template not found: {template_id}")
+    return design
+
+@app.post("/api/templates")
+async def add_template(circuit_design: Dict[str, Any]):
+    """Add a valid design to the template index"""
+    global agent
+    
+    if not agent:
+        raise HTTPException(status_code=500, detail="Agent not initialized")
+    if agent.template_index is None:
+        raise HTTPException(status_code=404, detail="Template index not enabled (TEMPLATE_INDEX=1)")
+    
+    validation_result = agent.validate_circuit_design(circuit_design)
+    if not validation_result["valid"]:
+        raise HTTPException(status_code=400, detail={"message": "Invalid circuit design", "errors": validation_result["errors"]})
+    try:
+        return {"template_id": agent.template_index.add(circuit_design), "templates": len(agent.template_index)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to add template: {str(e)}")
+
+@app.post("/api/circuit/validate/batch")
+async def validate_circuit_batch(request: Request, strict_ports: bool = False, detect_cycles: bool = False,
+                                 batch_size: int = 64):
+    """Validate many designs, streaming results as the process pool finishes them
+    
+    The body is either a JSON array of designs, answered with a JSON array of
+    results whose last element is the summary, or, with Content-Type
+    application/x-ndjson, one design per line, answered with one result per
+    line followed by a summary line. Designs are handed to the process pool
+    batch by batch (NDJSON bodies as they arrive), so only the designs of the
+    batches in flight are held in memory.
+    """
+    global validation_pool
+    
+    if validation_pool is None:
+        validation_pool = ProcessPoolExecutor(max_workers=validation_workers)
+    max_pending = validation_workers * 4
+    loop = asyncio.get_running_loop()
+    summary = ValidationSummary()
+    pending = deque()
+    batch = []
+    
+    def send():
+        if batch:
+            pending.append(loop.run_in_executor(validation_pool, validate_batch, list(batch), strict_ports, detect_cycles))
+            batch.clear()
+    
+    async def completed(limit):
+        """Serialized results of the oldest batches until at most limit are in flight"""
+        while len(pending) > limit:
+            for result in await pending.popleft():
+                summary.add(result)
+                yield json.dumps(result)
+    
+    if not request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        try:
+            designs = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON body: {str(e)}")
+        if not isinstance(designs, list):
+            designs = [designs]
+        
+        async def array_results():
+            yield "["
+            for i, design in enumerate(designs):
+                batch.append(("design", f"designs[{i}]", design))
+                if len(batch) >= batch_size:
+                    send()
+                    async for item in completed(max_pending):
+                        yield item + ",\n"
+            send()
+            async for item in completed(0):
+                yield item + ",\n"
+            yield json.dumps({"summary": summary.as_dict()}) + "]\n"
+        
+        return StreamingResponse(array_results(), media_type="application/json")
+    
+    # The body must be consumed here: StreamingResponse reads the receive channel itself
+    finished = []
+    buffer = b""
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                batch.append(("line", f"line {line_number}", line))
+                if len(batch) >= batch_size:
+                    send()
+                    async for item in completed(max_pending):
+                        finished.append(item)
+    if buffer.strip():
+        batch.append(("line", f"line {line_number + 1}", buffer))
+    send()
+    
+    async def line_results():
+        for item in finished:
+            yield item + "\n"
+        async for item in completed(0):
+            yield item + "\n"
+        yield json.dumps({"summary": summary.as_dict()}) + "\n"
+    
+    return StreamingResponse(line_results(), media_type="application/x-ndjson")
+
 @app.get("/api/session/status")
-async def get_session_status():
-    """Get current session status and conversation history length"""
+async def get_session_status(session_id: Optional[str] = None):
+    """Get session status, conversation history length and session store usage"""
     global agent
     
     if not agent:
         raise HTTPException(status_code=500, detail="Agent not initialized")
     
-    return {
-        "conversation_length": len(agent.conversation_history),
-        "has_active_session": len(agent.conversation_history) > 0
-    }
+    status = {"sessions": sessions.stats()}
+    if session_id:
+        state = sessions.get(session_id)
+        history = state["conversation_history"] if state else []
+        status.update({
+            "session_id": session_id,
+            "conversation_length": len(history),
+            "has_active_session": state is not None,
+            "session_bytes": sessions.size_of(session_id)
+        })
+    return status
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: LLM latency/TTFT histograms, tokens, parse/validation time, sessions and API latency"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/metrics/usage")
+async def get_usage_metrics():
+    """Get per-call and aggregate token usage, prompt cache and response cache hit rates, and design repair rates"""
+    global agent
+    
+    if not agent:
+        raise HTTPException(status_code=500, detail="Agent not initialized")
+    
+    usage = agent.usage_metrics.summary()
+    usage["response_cache"] = agent.response_cache.stats() if agent.response_cache else None
+    usage["repair"] = agent.repair_metrics.summary(agent.usage_metrics)
+    usage["design_store"] = dict(design_store.stats(), compression=compressed_payloads.stats())
+    usage["scheduler"] = agent.scheduler.stats()
+    usage["templates"] = agent.template_index.stats() if agent.template_index is not None else None
+    usage["prefetch"] = prefetcher.stats() if prefetcher else None
+    return usage
+
+@app.delete("/api/session/{session_id}")
+async def end_session(session_id: str):
+    """End a session and free its state"""
+    sessions.delete(session_id)
+    if prefetcher:
+        prefetcher.discard(session_id)
+    return {"session_id": session_id, "deleted": True}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+from llm_backend import LLMError
+
+# Characters allowed in a job id, which is also the design's file name
+_UNSAFE_ID = re.compile(r"[^A-Za-z0-9_.-]+")
+CHECKPOINT_FILE = "checkpoint.jsonl"
+# Final statuses of a job; "error" (the LLM call failed) is always run again on resume
+FINISHED = ("ok", "invalid")
+
+
+def job_id_for(job: Dict[str, Any]) -> str:
+    """The job's "id", or a slug of its description plus a hash of the description and answers.
+
+    Derived ids do not depend on the job's line, so reordering or extending
+    the input does not break resuming.
+    """
+    if job.get("id"):
+        return _UNSAFE_ID.sub("_", str(job["id"])).strip("._") or "job"
+    digest = hashlib.sha256(json.dumps([job["description"], job["answers"]], ensure_ascii=False).encode()).hexdigest()
+    slug = _UNSAFE_ID.sub("_", job["description"].lower()).strip("._")[:40].rstrip("_")
+    return f"{slug or 'design'}_{digest[:8]}"
+
+
+def load_jobs(path: str) -> List[Dict[str, Any]]:
+    """Read generation jobs from JSONL: {"description", "answers": [...], "id"?, "hierarchical"?} per line.
+
+    answers are the user's replies, sent in order after the agent's
+    questions whatever they are; a single string counts as one answer.
+    Raises ValueError for a malformed line or a duplicate id.
+    """
+    jobs = []
+    seen = {}
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            where = f"{path}:{line_number}"
+            try:
+                job = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{where}: invalid JSON: {e}")
+            if not isinstance(job, dict) or not isinstance(job.get("description"), str) or not job["description"].strip():
+                raise ValueError(f"{where}: a job needs a non-empty description")
+            answers = job.get("answers", [])
+            if isinstance(answers, str):
+                answers = [answers]
+            if not isinstance(answers, list) or not all(isinstance(answer, str) for answer in answers):
+                raise ValueError(f"{where}: answers must be a list of strings")
+            job = dict(job, answers=answers)
+            job["id"] = job_id_for(job)
+            if job["id"] in seen:
+                raise ValueError(f"{where}: duplicate job id {job['id']} (first on line {seen[job['id']]})")
+            seen[job["id"]] = line_number
+            jobs.append(job)
+    return jobs
+
+
+class Checkpoint:
+    """Append-only JSONL record of finished jobs, so an interrupted run resumes where it stopped.
+
+    Each line is a job's result; the last line of a job wins. Lines are
+    flushed to disk as they are written, after the job's design file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.results = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    # A line cut short by a crash is ignored; that job runs again
+                    try:
+                        result = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.results[result["id"]] = result
+
+    def finished(self, job_id: str, retry_invalid: bool = False) -> bool:
+        status = self.results.get(job_id, {}).get("status")
+        return status == "ok" or (status in FINISHED and not retry_invalid)
+
+    def record(self, result: Dict[str, Any]) -> None:
+        self.results[result["id"]] = result
+        with open(self.path, "a") as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def write_design(design: Dict[str, Any], path: str) -> None:
+    """Write a design atomically: a crash leaves the previous file or none, never half of one."""
+    with open(path + ".tmp", "w") as f:
+        json.dump(design, f, indent=2, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+async def run_job(agent: Any, job: Dict[str, Any], output_dir: str, hierarchical: Optional[bool] = None) -> Dict[str, Any]:
+    """Run one job's session on its own view of agent: description, canned answers, then the design.
+
+    Valid designs are written to <output_dir>/<id>.json; the result record
+    has "status" ok, invalid (with "errors") or error (an LLM call failed
+    after the scheduler's retries).
+    """
+    session = agent.for_session()
+    start = time.perf_counter()
+    result = {"id": job["id"], "description": job["description"]}
+    try:
+        await session.start_design_session_async(job["description"])
+        for answer in job["answers"]:
+            await session.process_user_response_async(answer)
+        design = await session.generate_circuit_design_async(
+            hierarchical=job.get("hierarchical", hierarchical)
+        )
+    except LLMError as e:
+        result.update(status="error", error=str(e), retryable=e.retryable)
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        return result
+
+    if "error" in design:
+        result.update(status="invalid", errors=[design["error"]])
+    else:
+        validation = session.validate_circuit_design(design)
+        if validation["valid"]:
+            path = os.path.join(output_dir, job["id"] + ".json")
+            write_design(design, path)
+            result.update(status="ok", path=path, blocks=len(design.get("blocks", [])), warnings=validation["warnings"])
+        else:
+            result.update(status="invalid", errors=validation["errors"])
+    if session.last_template:
+        result["template"] = session.last_template
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+async def run_jobs(agent: Any, jobs: Iterable[Dict[str, Any]], output_dir: str, checkpoint: Checkpoint,
+                   concurrency: int = 8, hierarchical: Optional[bool] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Run jobs with at most concurrency sessions at once, yielding each result as it finishes.
+
+    Every result is recorded in checkpoint before it is yielded; results
+    come in completion order. Filter out the jobs the checkpoint already
+    finished first (Checkpoint.finished) to resume a run.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(job):
+        async with semaphore:
+            return await run_job(agent, job, output_dir, hierarchical)
+
+    tasks = [asyncio.create_task(run(job)) for job in jobs]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            result = await finished
+            checkpoint.record(result)
+            yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class GenerationSummary:
+    """Counts of a generation run, by status."""
+
+    def __init__(self, total: int, skipped: int):
+        self.total = total
+        self.skipped = skipped
+        self.statuses = Counter()
+        self.seconds = 0.0
+        self.start = time.perf_counter()
+
+    def add(self, result: Dict[str, Any]) -> None:
+        self.statuses[result["status"]] += 1
+        self.seconds += result.get("seconds", 0.0)
+
+    def as_dict(self) -> Dict[str, Any]:
+        run = sum(self.statuses.values())
+        return {
+            "jobs": self.total,
+            "skipped": self.skipped,
+            "run": run,
+            "ok": self.statuses["ok"],
+            "invalid": self.statuses["invalid"],
+            "error": self.statuses["error"],
+            "remaining": self.total - self.skipped - run,
+            "wall_seconds": round(time.perf_counter() - self.start, 3),
+            "mean_job_seconds": round(self.seconds / run, 3) if run else 0.0
+        }
@@ -0,0 +1,187 @@
+import json
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from design_analysis import DEFAULT_MAX_FAN_OUT, analyze_design
+from design_validator import validate_design
+
+# A design source: ("file", path, None), ("line", "<path>:<line number>", raw JSON text)
+# or ("design", name, already parsed design)
+Source = Tuple[str, str, Any]
+
+
+def iter_design_sources(paths: Iterable[str]) -> Iterator[Source]:
+    """Lazily yield design sources from .json files, .jsonl files and directories of them.
+
+    Nothing is read here except JSONL lines, one at a time, so corpora larger
+    than memory can be streamed.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith((".json", ".jsonl")):
+                        yield from iter_design_sources([os.path.join(root, name)])
+        elif path.endswith(".jsonl"):
+            with open(path) as f:
+                for line_number, line in enumerate(f, 1):
+                    if line.strip():
+                        yield ("line", f"{path}:{line_number}", line)
+        else:
+            yield ("file", path, None)
+
+
+def load_source(source: Source) -> Any:
+    """Return the design of a source; raises OSError or ValueError if it cannot be read or parsed."""
+    kind, name, payload = source
+    if kind == "design":
+        return payload
+    if kind == "file":
+        with open(name) as f:
+            return json.loads(f.read())
+    return json.loads(payload)
+
+
+def validate_source(source: Source, strict_ports: bool = False, detect_cycles: bool = False,
+                    analyze: bool = False, max_fan_out: int = DEFAULT_MAX_FAN_OUT) -> Dict[str, Any]:
+    """Load and validate one design source, returning its result record.
+
+    With analyze, valid designs are also run through the signal-graph
+    analysis, whose result is the record's "analysis" (None if invalid).
+    """
+    name = source[1]
+    start = time.perf_counter()
+    try:
+        design = load_source(source)
+    except (OSError, ValueError) as e:
+        result = {"source": name, "valid": False, "parse_error": True, "errors": [f"Could not load design: {e}"], "warnings": []}
+        if analyze:
+            result["analysis"] = None
+        return result
+
+    result = validate_design(design, strict_ports=strict_ports, detect_cycles=detect_cycles)
+    blocks = design.get("blocks") if isinstance(design, dict) else None
+    record = {
+        "source": name,
+        "valid": result["valid"],
+        "parse_error": False,
+        "blocks": len(blocks) if isinstance(blocks, list) else 0,
+        "errors": result["errors"],
+        "warnings": result["warnings"],
+        "validation_ms": round((time.perf_counter() - start) * 1000, 3)
+    }
+    if analyze:
+        record["analysis"] = analyze_design(design, max_fan_out=max_fan_out) if result["valid"] else None
+    return record
+
+
+def validate_batch(sources: List[Source], strict_ports: bool = False, detect_cycles: bool = False,
+                   analyze: bool = False, max_fan_out: int = DEFAULT_MAX_FAN_OUT) -> List[Dict[str, Any]]:
+    """Validate a batch of sources; the unit of work sent to pool workers."""
+    return [validate_source(source, strict_ports, detect_cycles, analyze, max_fan_out) for source in sources]
+
+
+def _batches(sources: Iterator[Source], batch_size: int) -> Iterator[List[Source]]:
+    batch = []
+    for source in sources:
+        batch.append(source)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def validate_corpus(sources: Iterable[Source], workers: Optional[int] = None, batch_size: int = 64,
+                    strict_ports: bool = False, detect_cycles: bool = False) -> Iterator[Dict[str, Any]]:
+    """Validate sources on a process pool, yielding results as batches finish.
+
+    At most a few batches per worker are in flight, so memory stays bounded no
+    matter how large the corpus is. Results are yielded in completion order.
+    """
+    return _run_batches(validate_batch, sources, workers, batch_size, strict_ports, detect_cycles)
+
+
+def analyze_corpus(sources: Iterable[Source], workers: Optional[int] = None, batch_size: int = 64,
+                   max_fan_out: int = DEFAULT_MAX_FAN_OUT) -> Iterator[Dict[str, Any]]:
+    """Validate and analyze sources on a process pool, yielding results as batches finish (see validate_corpus)."""
+    return _run_batches(validate_batch, sources, workers, batch_size, False, False, True, max_fan_out)
+
+
+def _run_batches(task, sources: Iterable[Source], workers: Optional[int], batch_size: int, *args) -> Iterator[Dict[str, Any]]:
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 4
+    batches = _batches(iter(sources), batch_size)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for batch in batches:
+            pending.add(pool.submit(task, batch, *args))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
+class ValidationSummary:
+    """Running totals over a stream of validation results."""
+
+    # Indices and quoted values vary per design; strip them to group errors by kind
+    _ERROR_KIND = re.compile(r"\[\d+\]|\b\d+\b|'[^']*'")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = 0
+        self.valid = 0
+        self.parse_errors = 0
+        self.blocks = 0
+        self.error_kinds = Counter()
+
+    def add(self, result: Dict[str, Any]) -> None:
+        self.total += 1
+        self.valid += result["valid"]
+        self.parse_errors += result.get("parse_error", False)
+        self.blocks += result.get("blocks", 0)
+        for error in result["errors"]:
+            self.error_kinds[self._ERROR_KIND.sub("_", error)] += 1
+
+    def as_dict(self, top_errors: int = 10) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.start
+        return {
+            "total": self.total,
+            "valid": self.valid,
+            "invalid": self.total - self.valid,
+            "parse_errors": self.parse_errors,
+            "blocks": self.blocks,
+            "elapsed_s": round(elapsed, 3),
+            "designs_per_second": round(self.total / elapsed, 1) if elapsed else 0.0,
+            "top_errors": self.error_kinds.most_common(top_errors)
+        }
+
+
+class AnalysisSummary(ValidationSummary):
+    """Running totals over a stream of analysis results: validation totals plus issue counts by kind."""
+
+    def __init__(self):
+        super().__init__()
+        self.with_issues = 0
+        self.issues = Counter()
+
+    def add(self, result: Dict[str, Any]) -> None:
+        super().add(result)
+        analysis = result.get("analysis")
+        if analysis:
+            self.with_issues += any(analysis["issues"].values())
+            self.issues.update(analysis["issues"])
+
+    def as_dict(self, top_errors: int = 10) -> Dict[str, Any]:
+        return dict(super().as_dict(top_errors), with_issues=self.with_issues, issues=dict(self.issues))
@@ -1,33 +1,44 @@
-import anthropic
+import asyncio
+import copy
+from concurrent.futures import ThreadPoolExecutor
 import os
 import json
-from typing import List, Dict, Any, Optional
+import logging
+import re
+import time
+from typing import List, Dict, Any, Optional, AsyncIterator
 from dotenv import load_dotenv
+from json_stream import IncrementalDesignParser
+from usage_metrics import UsageMetrics, RepairMetrics
+from response_cache import ResponseCache
+from design_validator import validate_design, validate_design_incremental, score_design, is_power_signal
+from layout import layout_design, place_new_blocks, apply_layout
+from json_repair import extract_json_object, repair_json
+from json_patch import apply_patch, JsonPatchError
+from history_compaction import compact_history, estimate_message_tokens, estimate_tokens, update_requirements
+from llm_backend import LLMBackend, LLMResponse, LLMError, AnthropicBackend, DEFAULT_MODEL, DEFAULT_MAX_TOKENS
+from llm_scheduler import LLMScheduler, is_speculative
+from template_index import TemplateIndex
+from design_store import summarize_design
+from observability import REGISTRY, LOCAL_LATENCY_BUCKETS, Timer, debug_dumps_enabled
 
 # Load environment variables from .env file
 load_dotenv()
 
-class CircuitDesignAgent:
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize the circuit design agent with Anthropic API key."""
-        if api_key:
-            self.client = anthropic.Anthropic(api_key=api_key)
-        else:
-            api_key = os.getenv("ANTHROPIC_API_KEY")
-            if not api_key:
-                raise ValueError("Anthropic API key is required. Set ANTHROPIC_API_KEY in .env file or pass api_key parameter.")
-            self.client = anthropic.Anthropic(api_key=api_key)
-        
-        self.conversation_history = []
-        self.user_requirements = {}
-    
-    def start_design_session(self, initial_description: str) -> str:
-        """Start a new circuit design session with initial description."""
-        self.conversation_history = []
-        self.user_requirements = {"initial_description": initial_description}
-        
-        # Create the initial prompt
-        system_prompt = """You are a circuit design assistant. Your role is to ask strategic, specific questions to understand the user's circuit requirements better. 
+logger = logging.getLogger(__name__)
+
+DESIGN_PARSE_SECONDS = REGISTRY.histogram(
+    "design_parse_duration_seconds", "Time to extract and parse (or locally repair) design JSON", LOCAL_LATENCY_BUCKETS
+)
+DESIGN_VALIDATION_SECONDS = REGISTRY.histogram(
+    "design_validation_duration_seconds", "Time to validate a design", LOCAL_LATENCY_BUCKETS
+)
+SESSIONS_STARTED = REGISTRY.counter("design_sessions_started_total", "Design sessions started")
+LLM_ERRORS = REGISTRY.counter("llm_errors_total", "Failed LLM calls (after retries) by call type and error")
+TEMPLATE_MATCHES = REGISTRY.counter("design_template_matches_total", "Design requests by template retrieval outcome (reused, hint, miss)")
+
+# System prompt for the first question turn of a design session
+QUESTION_SYSTEM_PROMPT = """You are a circuit design assistant. Your role is to ask strategic, specific questions to understand the user's circuit requirements better. 
 
 Guidelines:
 - Ask 2-3 specific, objective questions at a time
@@ -45,35 +56,26 @@ Example bad questions:
 - "What do you want to do with this circuit?" (too vague)
 - "Tell me more about your project" (too open-ended)"""
 
-        user_prompt = f"I want to design a circuit: {initial_description}. Please ask me 2-3 specific questions to understand my requirements better."
-
-        response = self._get_claude_response(system_prompt, user_prompt)
-        self.conversation_history.append({"role": "assistant", "content": response})
-        
-        return response
-    
-    def process_user_response(self, user_response: str) -> str:
-        """Process user's response and ask follow-up questions or provide recommendations."""
-        self.conversation_history.append({"role": "user", "content": user_response})
-        
-        system_prompt = """You are a circuit design assistant. Based on the user's responses, either:
+# System prompt for follow-up question turns
+FOLLOW_UP_SYSTEM_PROMPT = """You are a circuit design assistant. Based on the user's responses, either:
 1. Ask 1-2 more specific follow-up questions if you need more information
 2. Provide a brief summary of requirements and ask if they want to proceed with design recommendations
 
 Keep responses concise and focused on gathering practical circuit design requirements."""
 
-        # Build conversation context
-        messages = [{"role": "system", "content": system_prompt}]
-        messages.extend(self.conversation_history)
-        
-        response = self._get_claude_response_from_messages(messages)
-        self.conversation_history.append({"role": "assistant", "content": response})
-        
-        return response
-    
-    def generate_circuit_design(self) -> dict:
-        """Generate structured circuit design JSON optimized for React frontend with signal type-based connections."""
-        system_prompt = """
+# Signal type list shared by the design and skeleton prompts
+SIGNAL_TYPES_GUIDE = """SIGNAL TYPES TO USE:
+- "audio_signal" - Audio signals (oscillator output, processed audio)
+- "cv_signal" - Control voltage (1V/oct, modulation, etc.)
+- "gate_signal" - Gate/trigger signals
+- "sync_signal" - Synchronization signals
+- "power_12v" - +12V power supply
+- "power_neg12v" - -12V power supply
+- "power_5v" - +5V power supply
+- "ground" - Ground connections"""
+
+# System prompt for the final circuit design generation
+DESIGN_SYSTEM_PROMPT = """
 You are a circuit design expert. Based on the conversation history, generate a structured JSON response for a React frontend that will display an interactive functional block diagram of the circuit.
 
 CRITICAL: You must respond with ONLY valid JSON. No text before or after the JSON. No explanations outside the JSON structure.
@@ -130,15 +132,7 @@ The JSON must follow this exact structure:
   ]
 }
 
-SIGNAL TYPES TO USE:
-- "audio_signal" - Audio signals (oscillator output, processed audio)
-- "cv_signal" - Control voltage (1V/oct, modulation, etc.)
-- "gate_signal" - Gate/trigger signals
-- "sync_signal" - Synchronization signals
-- "power_12v" - +12V power supply
-- "power_neg12v" - -12V power supply
-- "power_5v" - +5V power supply
-- "ground" - Ground connections
+""" + SIGNAL_TYPES_GUIDE + """
 
 POSITIONING GUIDELINES:
 - Input blocks: x=0, y=0 to y=300
@@ -154,204 +148,984 @@ Guidelines:
 - Include practical fields: main_components, parameters, adjustment, test_points, troubleshooting
 - RESPOND WITH ONLY JSON, NO EXPLANATIONS"""
 
+# System prompt for the skeleton phase of hierarchical generation: structure only, no detail fields
+SKELETON_SYSTEM_PROMPT = """
+You are a circuit design expert. Based on the conversation history, generate the skeleton of a functional block diagram: the circuit info, every block with its ports, and the signal flow. The detailed per-block fields are filled in later, so leave them out.
+
+CRITICAL: You must respond with ONLY valid JSON. No text before or after the JSON.
+
+The JSON must follow this exact structure:
+{
+  "circuit_info": {"name": "string", "description": "string", "supply_voltage": "string (ex: ±12V, +5V, etc.)", "categories": ["string", ...]},
+  "blocks": [
+    {
+      "id": "unique_block_id",
+      "name": "display_name",
+      "function": "one sentence function description",
+      "position": {"x": 0, "y": 0},
+      "inputs": [{"signal_type": "signal_type_name", "name": "input_display_name", "required": true}],
+      "outputs": [{"signal_type": "signal_type_name", "name": "output_display_name"}]
+    }
+  ],
+  "signal_flow": [
+    {"signal_type": "signal_type_name", "from_block": "source_block_id", "to_block": "destination_block_id", "description": "what this signal carries"}
+  ]
+}
+
+""" + SIGNAL_TYPES_GUIDE + """
+
+Guidelines:
+- Each block represents a function (ex: Oscillator Core, Waveshaper, Output Buffer)
+- Include every block the full design needs, including power supply blocks
+- RESPOND WITH ONLY JSON, NO EXPLANATIONS"""
+
+# Final user turn for the skeleton phase
+SKELETON_USER_INSTRUCTION = "Now generate only the circuit skeleton JSON: circuit_info, blocks (id, name, function, position, inputs/outputs by signal_type) and signal_flow. No explanations, only JSON."
+
+# System prompt for the per-block detail calls of hierarchical generation
+BLOCK_DETAIL_SYSTEM_PROMPT = """You are a circuit design expert. You receive the requirements and skeleton of a circuit design and one of its blocks. Describe how to build that block.
+
+Respond with ONLY a JSON object with these fields:
+{
+  "implementation": "string (how it is implemented, ex: OTA integrator core)",
+  "how_it_works": "string (explain the working principle, cite the concept or subcircuit name)",
+  "keywords": ["string", ...],
+  "main_components": ["string", ...],
+  "parameters": {"param": "value", ...},
+  "adjustment": "string (how to adjust/calibrate)",
+  "test_points": ["string", ...],
+  "troubleshooting": "string (diagnostic tips)",
+  "alternatives": [{"method": "string", "pros": ["string"], "cons": ["string"]}]
+}
+RESPOND WITH ONLY JSON, NO EXPLANATIONS"""
+
+# Verbose block fields filled in by the per-block detail calls
+BLOCK_DETAIL_FIELDS = ("implementation", "how_it_works", "keywords", "main_components", "parameters",
+                       "adjustment", "test_points", "troubleshooting", "alternatives")
+
+# System prompt for the targeted repair call that patches an invalid design
+REPAIR_SYSTEM_PROMPT = """You are a circuit design JSON repair tool. You receive the skeleton of a circuit design and the validation errors found in it.
+
+Respond with ONLY a JSON Patch (RFC 6902) array of operations that fixes every error. Do not resend the design.
+- Paths point into the full design, ex: /blocks/2/function, /signal_flow/-, /circuit_info/supply_voltage
+- Keep existing block ids and array indices
+- Use only the defined signal types: audio_signal, cv_signal, gate_signal, sync_signal, power_12v, power_neg12v, power_5v, ground
+- supply_voltage must look like "±12V", "+5V", "±12V, +5V" or "+12V/-12V"
+- RESPOND WITH ONLY THE JSON ARRAY, NO EXPLANATIONS"""
+
+# System prompt for incremental edits of an existing design
+EDIT_SYSTEM_PROMPT = """You are a circuit design editor. You receive the part of an existing circuit design that an edit request concerns, and the request.
+
+Respond with ONLY a JSON Patch (RFC 6902) array of operations that applies the edit to the full design. Do not resend the design.
+- Blocks and signal_flow entries carry their "index" in the full design; use it in paths, ex: /blocks/4/name, /signal_flow/7
+- Append new blocks and connections with /blocks/- and /signal_flow/-
+- When removing several array entries, remove the highest index first
+- New blocks need id, name, function, position ({"x": 0, "y": 0} is fine, they are laid out automatically), inputs and outputs; ports are objects like {"signal_type": "audio_signal", "name": "Audio In"}
+- Rewire connections when inserting or removing a block, and remove the connections of removed blocks
+- Use only the defined signal types: audio_signal, cv_signal, gate_signal, sync_signal, power_12v, power_neg12v, power_5v, ground
+- RESPOND WITH ONLY THE JSON ARRAY, NO EXPLANATIONS"""
+
+# Block fields sent to the repair call; the verbose text fields are left out
+REPAIR_BLOCK_FIELDS = ("id", "name", "function", "position", "inputs", "outputs")
+
+# Retrieved templates larger than this (estimated tokens) are shown to the LLM as their summary projection
+TEMPLATE_HINT_MAX_TOKENS = 3000
+
+# Final user turn appended to the history when generating the design
+DESIGN_USER_INSTRUCTION = "Now generate only the structured circuit JSON with the new format: circuit_info, blocks (with position, inputs/outputs by signal_type), and signal_flow (connections between blocks). Use the defined signal types (audio_signal, cv_signal, gate_signal, etc.) and position the blocks following the guidelines. No explanations, only JSON."
+
+class CircuitDesignAgent:
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 prompt_caching: bool = True, temperature: float = 0.7,
+                 response_cache: Optional[ResponseCache] = None, auto_layout: bool = True,
+                 llm_repair: bool = True, backend: Optional[LLMBackend] = None,
+                 call_settings: Optional[Dict[str, Dict[str, Any]]] = None, design_candidates: int = 1,
+                 history_token_budget: int = 8000, hierarchical: bool = False, block_detail_concurrency: int = 8,
+                 scheduler: Optional[LLMScheduler] = None, template_index: Optional[TemplateIndex] = None,
+                 template_reuse_score: float = 0.9, template_hint_score: float = 0.3):
+        """Initialize the circuit design agent with Anthropic API key or another LLM backend."""
+        # Defaults to the Anthropic API; FakeBackend serves canned replies offline
+        self.backend = backend or AnthropicBackend(api_key=api_key, base_url=base_url)
+        # Concurrency, rate limits, priorities and retries of every LLM call; shared by session views
+        self.scheduler = scheduler or LLMScheduler()
+        # Per call type model/max_tokens/temperature overrides, plus a "default" entry
+        self.call_settings = call_settings or {}
+        
+        # Mark static system prompts and the conversation prefix with cache_control
+        self.prompt_caching = prompt_caching
+        # Shared by every session view of this agent
+        self.usage_metrics = UsageMetrics()
+        # Sampling temperature; 0 makes responses deterministic and cache-eligible
+        self.temperature = temperature
+        # Opt-in content-addressed cache of LLM responses
+        self.response_cache = response_cache
+        # Replace LLM-invented block positions with the layered layout
+        self.auto_layout = auto_layout
+        # Patch invalid designs with a targeted follow-up call instead of failing
+        self.llm_repair = llm_repair
+        self.repair_metrics = RepairMetrics()
+        # Concurrent sampled generations per design request (best-of-N)
+        self.design_candidates = design_candidates
+        # Estimated prompt tokens above which old turns are replaced by user_requirements (0 disables)
+        self.history_token_budget = history_token_budget
+        # Generate a skeleton first, then each block's details in concurrent calls
+        self.hierarchical = hierarchical
+        self.block_detail_concurrency = block_detail_concurrency
+        # Validated designs retrieved by similarity: returned as is above template_reuse_score,
+        # shown to the LLM as a reference above template_hint_score; new designs are added to it
+        self.template_index = template_index
+        self.template_reuse_score = template_reuse_score
+        self.template_hint_score = template_hint_score
+        
+        self.conversation_history = []
+        self.user_requirements = {}
+        # Template match of the last design request: template_id, name, score and whether it was reused
+        self.last_template = None
+    
+    def for_session(self, state: Optional[Dict[str, Any]] = None) -> "CircuitDesignAgent":
+        """Return an agent bound to one session's state that shares this agent's LLM backend."""
+        session_agent = copy.copy(self)
+        state = state or {}
+        session_agent.conversation_history = list(state.get("conversation_history", []))
+        session_agent.user_requirements = dict(state.get("user_requirements", {}))
+        session_agent.last_template = None
+        return session_agent
+    
+    def session_state(self) -> Dict[str, Any]:
+        """Return the per-session state that must be persisted between requests."""
+        return {
+            "conversation_history": self.conversation_history,
+            "user_requirements": self.user_requirements
+        }
+    
+    def start_design_session(self, initial_description: str) -> str:
+        """Start a new circuit design session with initial description."""
+        user_prompt = self._begin_design_session(initial_description)
+        response = self._get_claude_response(QUESTION_SYSTEM_PROMPT, user_prompt, call_type="question")
+        self.conversation_history.append({"role": "assistant", "content": response})
+        
+        return response
+    
+    async def start_design_session_async(self, initial_description: str) -> str:
+        """Async variant of start_design_session that does not block the event loop."""
+        user_prompt = self._begin_design_session(initial_description)
+        response = await self._get_claude_response_async(QUESTION_SYSTEM_PROMPT, user_prompt, call_type="question")
+        self.conversation_history.append({"role": "assistant", "content": response})
+        
+        return response
+    
+    def process_user_response(self, user_response: str) -> str:
+        """Process user's response and ask follow-up questions or provide recommendations.
+        
+        If the LLM call fails, the LLMError is raised and the session is left as
+        it was before the answer, so the user can simply send it again.
+        """
+        state = self._snapshot()
+        messages = self._build_follow_up_messages(user_response)
+        try:
+            response = self._get_claude_response_from_messages(messages, call_type="follow_up")
+        except LLMError:
+            self._restore(state)
+            raise
+        self.conversation_history.append({"role": "assistant", "content": response})
+        
+        return response
+    
+    async def process_user_response_async(self, user_response: str) -> str:
+        """Async variant of process_user_response that does not block the event loop."""
+        state = self._snapshot()
+        messages = self._build_follow_up_messages(user_response)
+        try:
+            response = await self._get_claude_response_from_messages_async(messages, call_type="follow_up")
+        except LLMError:
+            self._restore(state)
+            raise
+        self.conversation_history.append({"role": "assistant", "content": response})
+        
+        return response
+    
+    def _snapshot(self) -> tuple:
+        """Copy the session state so a failed turn can be rolled back."""
+        return list(self.conversation_history), copy.deepcopy(self.user_requirements)
+    
+    def _restore(self, state: tuple) -> None:
+        self.conversation_history, self.user_requirements = state
+    
+    def generate_circuit_design(self, hierarchical: Optional[bool] = None) -> dict:
+        """Generate structured circuit design JSON optimized for React frontend with signal type-based connections."""
+        template = self._match_template()
+        if template and self.last_template["reused"]:
+            return template
+        if self.hierarchical if hierarchical is None else hierarchical:
+            design = self._generate_hierarchical_design(template)
+        else:
+            messages = self._build_design_messages(template=template)
+            response = self._get_claude_response_from_messages(messages, call_type="design")
+            design = self._recover_design(self._parse_circuit_design(response))
+        self.learn_template(design)
+        return design
+    
+    async def generate_circuit_design_async(self, candidates: Optional[int] = None, first_valid: bool = True,
+                                            hierarchical: Optional[bool] = None) -> dict:
+        """Async variant of generate_circuit_design that does not block the event loop.
+        
+        With more than one candidate (default: design_candidates), that many
+        sampled generations run concurrently. With first_valid the first design
+        that validates wins and the other requests are cancelled; otherwise all
+        of them finish and the best by score_design wins. If none is valid the
+        best-scored one goes through the usual repair step. hierarchical
+        (default: the agent setting) uses skeleton-then-details generation.
+        
+        With a template index, a close enough match to the requirements is
+        returned without calling the LLM at all, a weaker one is shown to it
+        as a reference, and every new valid design is indexed.
+        """
+        template = self._match_template()
+        if template and self.last_template["reused"]:
+            return template
+        design = await self._generate_design_async(candidates, first_valid, hierarchical, template)
+        self.learn_template(design)
+        return design
+    
+    async def _generate_design_async(self, candidates: Optional[int], first_valid: bool, hierarchical: Optional[bool],
+                                     template: Optional[dict]) -> dict:
+        """Run the LLM generation of generate_circuit_design_async, with an optional reference template."""
+        if self.hierarchical if hierarchical is None else hierarchical:
+            return await self._generate_hierarchical_design_async(template)
+        messages = self._build_design_messages(template=template)
+        candidates = candidates or self.design_candidates
+        # Identical deterministic requests would only return the same design N times
+        if candidates <= 1 or self.settings_for("design")["temperature"] == 0:
+            response = await self._get_claude_response_from_messages_async(messages, call_type="design")
+            return await self._recover_design_async(self._parse_circuit_design(response))
+        
+        async def generate_candidate():
+            response = await self._get_claude_response_from_messages_async(messages, call_type="design")
+            result = self._parse_circuit_design(response)
+            return result, self._candidate_score(result)
+        
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(generate_candidate()) for _ in range(candidates)]
+        best = None
+        failure = None
+        try:
+            for finished in asyncio.as_completed(tasks):
+                try:
+                    result, score = await finished
+                except LLMError as e:
+                    # Another candidate may still succeed
+                    failure = e
+                    continue
+                if best is None or score > best[1]:
+                    best = (result, score)
+                if first_valid and "error" not in result:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Let the cancelled requests unwind so their connections are released
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if best is None:
+            raise failure
+        
+        logger.debug("Best of %d: score %s after %.2fs", candidates, best[1], time.perf_counter() - start)
+        return await self._recover_design_async(best[0])
+    
+    def _candidate_score(self, result: dict) -> float:
+        """Score a parsed candidate design; unparseable responses rank below everything."""
+        if "error" not in result:
+            return score_design(self.validate_circuit_design(result))
+        if "partial_design" in result:
+            return score_design(self.validate_circuit_design(result["partial_design"]))
+        return float("-inf")
+    
+    async def stream_design_session(self, initial_description: str) -> AsyncIterator[str]:
+        """Streaming variant of start_design_session that yields text as it arrives."""
+        user_prompt = self._begin_design_session(initial_description)
+        messages = [
+            {"role": "system", "content": QUESTION_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+        
+        chunks = []
+        async for text in self._stream_claude_response_from_messages(messages, call_type="question"):
+            chunks.append(text)
+            yield text
+        self.conversation_history.append({"role": "assistant", "content": "".join(chunks).strip()})
+    
+    async def stream_user_response(self, user_response: str) -> AsyncIterator[str]:
+        """Streaming variant of process_user_response that yields text as it arrives."""
+        state = self._snapshot()
+        messages = self._build_follow_up_messages(user_response)
+        
+        chunks = []
+        try:
+            async for text in self._stream_claude_response_from_messages(messages, call_type="follow_up"):
+                chunks.append(text)
+                yield text
+        except LLMError:
+            self._restore(state)
+            raise
+        self.conversation_history.append({"role": "assistant", "content": "".join(chunks).strip()})
+    
+    async def stream_circuit_design(self, ready_design: Optional[dict] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of generate_circuit_design.
+        
+        Yields {"type": "circuit_info" | "block" | "signal_flow", "data": ...} events as
+        soon as each part of the JSON is complete, then a final {"type": "design"} event
+        carrying the validated design (or the error dict from generate_circuit_design).
+        A ready_design (such as a prefetched one) or a reused template is replayed
+        as the same events without calling the LLM.
+        """
+        template = None if ready_design is not None else self._match_template()
+        if template and self.last_template["reused"]:
+            ready_design = template
+        if ready_design is not None:
+            yield {"type": "circuit_info", "data": ready_design.get("circuit_info", {})}
+            for block in ready_design["blocks"]:
+                yield {"type": "block", "data": block}
+            for flow in ready_design["signal_flow"]:
+                yield {"type": "signal_flow", "data": flow}
+            yield {"type": "design", "data": ready_design}
+            return
+        messages = self._build_design_messages(template=template)
+        parser = IncrementalDesignParser()
+        
+        chunks = []
+        async for text in self._stream_claude_response_from_messages(messages, call_type="design"):
+            chunks.append(text)
+            for event, data in parser.feed(text):
+                yield {"type": event, "data": data}
+        
+        result = self._parse_circuit_design("".join(chunks).strip())
+        design = await self._recover_design_async(result)
+        self.learn_template(design)
+        yield {"type": "design", "data": design}
+    
+    def _begin_design_session(self, initial_description: str) -> str:
+        """Reset session state and build the first user prompt."""
+        self.conversation_history = []
+        self.user_requirements = {"initial_description": initial_description}
+        SESSIONS_STARTED.inc()
+        
+        return f"I want to design a circuit: {initial_description}. Please ask me 2-3 specific questions to understand my requirements better."
+    
+    def _build_follow_up_messages(self, user_response: str) -> List[Dict[str, str]]:
+        """Record the user's answer and build the messages for a follow-up turn."""
+        last_turn = self.conversation_history[-1] if self.conversation_history else None
+        question = last_turn["content"] if last_turn and last_turn["role"] == "assistant" else ""
+        update_requirements(self.user_requirements, question, user_response)
+        self.conversation_history.append({"role": "user", "content": user_response})
+        self._compact_history(FOLLOW_UP_SYSTEM_PROMPT)
+        
+        # Build conversation context
+        messages = [{"role": "system", "content": FOLLOW_UP_SYSTEM_PROMPT}]
+        messages.extend(self.conversation_history)
+        return messages
+    
+    def _build_design_messages(self, system_prompt: str = DESIGN_SYSTEM_PROMPT,
+                               instruction: str = DESIGN_USER_INSTRUCTION,
+                               template: Optional[dict] = None) -> List[Dict[str, str]]:
+        """Build the messages for the circuit design (or skeleton) generation call, with an optional reference template."""
+        if template is not None:
+            instruction = self._template_hint(template, summary=system_prompt is SKELETON_SYSTEM_PROMPT) + instruction
+        self._compact_history(system_prompt, instruction)
+        
         # Build conversation context
         messages = [{"role": "system", "content": system_prompt}]
         messages.extend(self.conversation_history)
         # Add explicit user instruction to output only JSON
-        messages.append({
-            "role": "user",
-            "content": "Now generate only the structured circuit JSON with the new format: circuit_info, blocks (with position, inputs/outputs by signal_type), and signal_flow (connections between blocks). Use the defined signal types (audio_signal, cv_signal, gate_signal, etc.) and position the blocks following the guidelines. No explanations, only JSON."
-        })
+        messages.append({"role": "user", "content": instruction})
+        return messages
+    
+    def _generate_hierarchical_design(self, template: Optional[dict] = None) -> dict:
+        """Generate a skeleton design, then fill in every block's details with concurrent calls.
         
-        response = self._get_claude_response_from_messages(messages)
+        Each call only has to produce a small part of the design, so large
+        designs no longer hit max_tokens, and the detail phase takes about as
+        long as the slowest block instead of one long serial completion.
+        """
+        messages = self._build_design_messages(SKELETON_SYSTEM_PROMPT, SKELETON_USER_INSTRUCTION, template)
+        response = self._get_claude_response_from_messages(messages, call_type="skeleton")
+        design = self._recover_design(self._parse_circuit_design(response))
+        if "error" in design:
+            return design
         
-        # Debug: Print the raw response
-        print(f"Debug - Raw Claude response: {response[:200]}...")
+        def block_details(block):
+            prompt = self._block_detail_prompt(design, block)
+            try:
+                return self._get_claude_response(BLOCK_DETAIL_SYSTEM_PROMPT, prompt, call_type="block_detail")
+            except LLMError:
+                # The skeleton block is kept
+                return ""
         
+        with ThreadPoolExecutor(max_workers=max(1, self.block_detail_concurrency)) as pool:
+            responses = list(pool.map(block_details, design["blocks"]))
+        return self._merge_block_details(design, responses)
+    
+    async def _generate_hierarchical_design_async(self, template: Optional[dict] = None) -> dict:
+        """Async variant of _generate_hierarchical_design."""
+        messages = self._build_design_messages(SKELETON_SYSTEM_PROMPT, SKELETON_USER_INSTRUCTION, template)
+        response = await self._get_claude_response_from_messages_async(messages, call_type="skeleton")
+        design = await self._recover_design_async(self._parse_circuit_design(response))
+        if "error" in design:
+            return design
+        
+        semaphore = asyncio.Semaphore(max(1, self.block_detail_concurrency))
+        
+        async def block_details(block):
+            async with semaphore:
+                prompt = self._block_detail_prompt(design, block)
+                try:
+                    return await self._get_claude_response_async(BLOCK_DETAIL_SYSTEM_PROMPT, prompt, call_type="block_detail")
+                except LLMError:
+                    return ""
+        
+        responses = await asyncio.gather(*(block_details(block) for block in design["blocks"]))
+        return self._merge_block_details(design, responses)
+    
+    def _template_query(self) -> str:
+        """Text a design request is matched against templates with: the initial description and the user's answers."""
+        parts = [str(self.user_requirements.get("initial_description", ""))]
+        parts.extend(str(answer) for answer in self.user_requirements.get("answers", []))
+        return "\n".join(part for part in parts if part)
+    
+    def _match_template(self) -> Optional[dict]:
+        """Look up the best template for the session's requirements and record it in last_template.
+        
+        Returns a copy of the template design if it scores at least
+        template_hint_score (last_template["reused"] tells whether it is close
+        enough to return as is), else None.
+        """
+        self.last_template = None
+        if self.template_index is None:
+            return None
+        matches = self.template_index.search(self._template_query(), limit=1)
+        if not matches or matches[0]["score"] < self.template_hint_score:
+            TEMPLATE_MATCHES.inc(outcome="miss")
+            return None
+        design = self.template_index.get(matches[0]["template_id"])
+        if design is None:
+            TEMPLATE_MATCHES.inc(outcome="miss")
+            return None
+        reused = matches[0]["score"] >= self.template_reuse_score
+        self.last_template = dict(matches[0], reused=reused)
+        TEMPLATE_MATCHES.inc(outcome="reused" if reused else "hint")
+        logger.info("Template %s (%s) matched with score %.3f%s", matches[0]["template_id"], matches[0]["name"],
+                    matches[0]["score"], ", reused" if reused else "")
+        return copy.deepcopy(design)
+    
+    def _template_hint(self, template: dict, summary: bool = False) -> str:
+        """Reference-design preamble for the design instruction; large templates are shown as their summary."""
+        reference = json.dumps(summarize_design(template) if summary else template, ensure_ascii=False)
+        if not summary and estimate_tokens(reference) > TEMPLATE_HINT_MAX_TOKENS:
+            reference = json.dumps(summarize_design(template), ensure_ascii=False)
+        return ("For reference, a validated design for a similar circuit. Adapt it to my requirements "
+                f"instead of starting from scratch, and keep only what fits:\n{reference}\n\n")
+    
+    def learn_template(self, design: dict) -> None:
+        """Add a newly generated valid design to the template index, keyed also on the requirements.
+        
+        Speculative generations (mark_speculative) are not indexed, since their
+        design may never be used; whoever uses one calls this when it does.
+        """
+        if self.template_index is None or "error" in design or is_speculative():
+            return
+        if self.last_template and self.last_template["reused"]:
+            return
+        self.template_index.add(design, self._template_query())
+    
+    def _block_detail_prompt(self, design: dict, block: dict) -> str:
+        """Build the detail call prompt for one block: requirements, design skeleton and the block."""
+        block_id = block["id"]
+        context = {
+            "requirements": self.user_requirements,
+            "circuit_info": design["circuit_info"],
+            "blocks": [{"id": b["id"], "name": b["name"]} for b in design["blocks"]],
+            "connections": [
+                flow for flow in design["signal_flow"]
+                if flow.get("from_block") == block_id or flow.get("to_block") == block_id
+            ]
+        }
+        block_skeleton = {key: block[key] for key in REPAIR_BLOCK_FIELDS if key in block and key != "position"}
+        return f"Design:\n{json.dumps(context, ensure_ascii=False)}\n\nBlock to describe:\n{json.dumps(block_skeleton, ensure_ascii=False)}"
+    
+    def _merge_block_details(self, design: dict, responses: List[str]) -> dict:
+        """Merge the detail responses into their blocks; details that are unusable are left out."""
+        blocks = []
+        for block, response in zip(design["blocks"], responses):
+            details = None
+            json_str = extract_json_object(response)
+            if json_str is not None:
+                try:
+                    details = json.loads(repair_json(json_str))
+                except json.JSONDecodeError:
+                    details = None
+            if not isinstance(details, dict):
+                logger.warning("No usable details for block %s", block["id"])
+                if debug_dumps_enabled(logger):
+                    logger.debug("Block detail response: %s", response[:200])
+                blocks.append(block)
+                continue
+            blocks.append(dict(block, **{key: details[key] for key in BLOCK_DETAIL_FIELDS if key in details}))
+        
+        merged = dict(design, blocks=blocks)
+        errors = self.validate_circuit_design(merged)["errors"]
+        if errors:
+            # Fall back to the skeleton for blocks whose details broke the schema
+            bad = {int(error[len("blocks["):error.index("]")]) for error in errors if error.startswith("blocks[")}
+            merged["blocks"] = [design["blocks"][i] if i in bad else block for i, block in enumerate(blocks)]
+        return merged
+    
+    def _compact_history(self, system_prompt: str, instruction: str = "") -> None:
+        """Replace old turns with the user_requirements summary if the prompt would exceed its budget."""
+        if not self.history_token_budget:
+            return
+        reserved = estimate_message_tokens([{"role": "system", "content": system_prompt}, {"role": "user", "content": instruction}])
+        before = len(self.conversation_history)
+        self.conversation_history = compact_history(
+            self.conversation_history, self.user_requirements, self.history_token_budget, reserved_tokens=reserved
+        )
+        if len(self.conversation_history) != before:
+            logger.debug("Compacted history from %d to %d messages", before, len(self.conversation_history))
+    
+    def _parse_circuit_design(self, response: str) -> dict:
+        """Extract, parse and validate the circuit design JSON from a raw response.
+        
+        Malformed JSON (code fences, trailing commas, output truncated at
+        max_tokens) goes through the local repair pass before giving up. A design
+        that parses but fails validation is returned as an error that still
+        carries it under "partial_design", so it can be patched.
+        """
+        start = time.perf_counter()
+        if debug_dumps_enabled(logger):
+            logger.debug("Raw design response: %s...", response[:200])
+        
+        json_str = extract_json_object(response)
+        if json_str is None:
+            self.repair_metrics.record("failed", time.perf_counter() - start)
+            return {"error": "Could not parse JSON response", "raw_response": response}
+        
+        tier = "clean"
         try:
-            # Extract JSON from response
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
-            if json_start != -1 and json_end != 0:
-                json_str = response[json_start:json_end]
-                print(f"Debug - Extracted JSON: {json_str[:200]}...")
-                parsed_json = json.loads(json_str)
-                
-                # Validate the circuit design
-                validation_result = self.validate_circuit_design(parsed_json)
-                if validation_result["valid"]:
-                    return parsed_json
-                else:
-                    return {"error": "Circuit design validation failed", "validation_errors": validation_result["errors"], "raw_response": response}
-            else:
-                return {"error": "Could not parse JSON response", "raw_response": response}
+            parsed_json = json.loads(json_str)
         except json.JSONDecodeError as e:
-            return {"error": f"JSON parsing error: {str(e)}", "raw_response": response}
+            try:
+                parsed_json = json.loads(repair_json(json_str))
+                tier = "local_repair"
+            except json.JSONDecodeError:
+                self.repair_metrics.record("failed", time.perf_counter() - start)
+                return {"error": f"JSON parsing error: {str(e)}", "raw_response": response}
+        DESIGN_PARSE_SECONDS.observe(time.perf_counter() - start)
+        
+        # Validate the circuit design
+        validation_result = self.validate_circuit_design(parsed_json)
+        if validation_result["valid"]:
+            self.repair_metrics.record(tier, time.perf_counter() - start)
+            return parsed_json
+        
+        result = {"error": "Circuit design validation failed", "validation_errors": validation_result["errors"], "raw_response": response}
+        if isinstance(parsed_json, dict):
+            result["partial_design"] = parsed_json
+            result["_parse_seconds"] = time.perf_counter() - start
+        else:
+            self.repair_metrics.record("failed", time.perf_counter() - start)
+        return result
+    
+    def _recover_design(self, result: dict) -> dict:
+        """Patch an invalid design with a targeted repair call if possible, then finish it."""
+        repair_prompt = self._repair_prompt(result)
+        if repair_prompt:
+            start = time.perf_counter() - result.pop("_parse_seconds")
+            try:
+                patch = self._get_claude_response(REPAIR_SYSTEM_PROMPT, repair_prompt, call_type="repair")
+                result = self._apply_repair_patch(result, patch, start)
+            except LLMError as e:
+                self.repair_metrics.record("failed", time.perf_counter() - start)
+                result = dict(result, repair_error=str(e))
+        return self._finish_design(result)
+    
+    async def _recover_design_async(self, result: dict) -> dict:
+        """Patch an invalid design with a targeted repair call if possible, then finish it."""
+        repair_prompt = self._repair_prompt(result)
+        if repair_prompt:
+            start = time.perf_counter() - result.pop("_parse_seconds")
+            try:
+                patch = await self._get_claude_response_async(REPAIR_SYSTEM_PROMPT, repair_prompt, call_type="repair")
+                result = self._apply_repair_patch(result, patch, start)
+            except LLMError as e:
+                self.repair_metrics.record("failed", time.perf_counter() - start)
+                result = dict(result, repair_error=str(e))
+        return self._finish_design(result)
+    
+    def _repair_prompt(self, result: dict) -> Optional[str]:
+        """Build the repair call prompt for an invalid design, or None if it cannot be patched."""
+        if "partial_design" not in result:
+            return None
+        if not self.llm_repair:
+            self.repair_metrics.record("failed", result.pop("_parse_seconds"))
+            return None
+        
+        design = result["partial_design"]
+        skeleton = {key: value for key, value in design.items() if key != "blocks"}
+        if isinstance(design.get("blocks"), list):
+            skeleton["blocks"] = [
+                {key: block[key] for key in REPAIR_BLOCK_FIELDS if key in block} if isinstance(block, dict) else block
+                for block in design["blocks"]
+            ]
+        errors = "\n".join(f"- {error}" for error in result["validation_errors"])
+        return f"Validation errors:\n{errors}\n\nDesign skeleton:\n{json.dumps(skeleton)}"
     
-    def _get_claude_response(self, system_prompt: str, user_prompt: str) -> str:
-        """Get response from Claude API."""
+    def _parse_patch_response(self, response: str) -> List[Dict[str, Any]]:
+        """Extract the JSON Patch array from an LLM response, or raise ValueError."""
+        patch_start = response.find("[")
+        if patch_start == -1:
+            raise ValueError(f"no JSON array in response: {response[:200]}")
+        operations = json.loads(repair_json(response[patch_start:]))
+        if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+            raise ValueError("response is not a list of patch operations")
+        return operations
+    
+    def _apply_repair_patch(self, result: dict, response: str, start: float) -> dict:
+        """Apply the JSON Patch returned by the repair call and re-validate the design."""
+        try:
+            operations = self._parse_patch_response(response)
+            design = apply_patch(result["partial_design"], operations)
+        except (ValueError, JsonPatchError) as e:
+            self.repair_metrics.record("failed", time.perf_counter() - start)
+            return dict(result, repair_error=str(e))
+        
+        validation_result = self.validate_circuit_design(design)
+        if not validation_result["valid"]:
+            self.repair_metrics.record("failed", time.perf_counter() - start)
+            return dict(result, partial_design=design, validation_errors=validation_result["errors"])
+        
+        self.repair_metrics.record("llm_patch", time.perf_counter() - start)
+        return design
+    
+    def _finish_design(self, result: dict) -> dict:
+        """Lay out a valid design; error results are returned without their internal fields."""
+        if "error" in result:
+            result.pop("_parse_seconds", None)
+            return result
+        if self.auto_layout:
+            result["blocks"] = self.suggest_block_positions(result["blocks"], result["signal_flow"])
+        return result
+    
+    def edit_circuit_design(self, design: dict, instruction: Optional[str] = None,
+                            patch: Optional[List[Dict[str, Any]]] = None,
+                            focus_block_ids: Optional[List[str]] = None) -> dict:
+        """Apply a natural-language instruction or a JSON Patch to an existing design.
+        
+        For an instruction, the LLM only sees the blocks it concerns (those named
+        in it or in focus_block_ids, plus their neighbors) and returns a JSON
+        Patch. The patch is applied copy-on-write, only the touched blocks and
+        edges are re-validated and only new blocks are placed. Returns the new
+        design with the effective patch (layout moves included) and the changed
+        block ids, or an error dict.
+        """
+        if patch is None:
+            if not instruction:
+                return {"error": "An edit needs an instruction or a patch"}
+            prompt = self._edit_prompt(design, instruction, focus_block_ids)
+            response = self._get_claude_response(EDIT_SYSTEM_PROMPT, prompt, call_type="edit")
+            try:
+                patch = self._parse_patch_response(response)
+            except ValueError as e:
+                return {"error": f"Could not parse edit patch: {str(e)}"}
+        return self._apply_edit(design, patch)
+    
+    async def edit_circuit_design_async(self, design: dict, instruction: Optional[str] = None,
+                                        patch: Optional[List[Dict[str, Any]]] = None,
+                                        focus_block_ids: Optional[List[str]] = None) -> dict:
+        """Async variant of edit_circuit_design that does not block the event loop."""
+        if patch is None:
+            if not instruction:
+                return {"error": "An edit needs an instruction or a patch"}
+            prompt = self._edit_prompt(design, instruction, focus_block_ids)
+            response = await self._get_claude_response_async(EDIT_SYSTEM_PROMPT, prompt, call_type="edit")
+            try:
+                patch = self._parse_patch_response(response)
+            except ValueError as e:
+                return {"error": f"Could not parse edit patch: {str(e)}"}
+        return self._apply_edit(design, patch)
+    
+    def _edit_prompt(self, design: dict, instruction: str, focus_block_ids: Optional[List[str]] = None) -> str:
+        """Build the edit prompt from the subgraph the instruction concerns.
+        
+        Blocks named (by id or name) in the instruction or listed in
+        focus_block_ids are selected together with their direct signal
+        neighbors; power and ground edges are not followed, since the supply
+        feeds every block. If nothing matches, every block is sent, still
+        without the verbose fields.
+        """
+        blocks = design["blocks"]
+        signal_flow = design["signal_flow"]
+        text = instruction.lower()
+        selected = set(focus_block_ids or ())
+        for block in blocks:
+            names = [name.lower() for name in (block["id"], block.get("name")) if name]
+            if any(re.search(r"\b" + re.escape(name) + r"\b", text) for name in names):
+                selected.add(block["id"])
+        if selected:
+            # Edges are sent for the named blocks only; neighbors give the LLM their ports
+            focus = set(selected)
+            for flow in signal_flow:
+                if is_power_signal(flow.get("signal_type")):
+                    continue
+                if flow.get("from_block") in focus or flow.get("to_block") in focus:
+                    selected.update((flow.get("from_block"), flow.get("to_block")))
+        else:
+            focus = selected = {block["id"] for block in blocks}
+        
+        context = {
+            "circuit_info": design["circuit_info"],
+            "block_count": len(blocks),
+            "signal_flow_count": len(signal_flow),
+            "blocks": [
+                dict({"index": i}, **{key: block[key] for key in REPAIR_BLOCK_FIELDS if key in block and key != "position"})
+                for i, block in enumerate(blocks) if block["id"] in selected
+            ],
+            "signal_flow": [
+                dict({"index": i}, **flow)
+                for i, flow in enumerate(signal_flow)
+                if flow.get("from_block") in focus or flow.get("to_block") in focus
+            ]
+        }
+        return f"Design excerpt:\n{json.dumps(context, ensure_ascii=False)}\n\nEdit request: {instruction}"
+    
+    def _apply_edit(self, design: dict, operations: List[Dict[str, Any]]) -> dict:
+        """Apply a patch, validate what it touched, place new blocks and return the result."""
         try:
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=4000,
-                temperature=0.7,
-                system=system_prompt,
-                messages=[
-                    {"role": "user", "content": user_prompt}
-                ]
-            )
+            edited = apply_patch(design, operations)
+        except JsonPatchError as e:
+            return {"error": f"Could not apply edit patch: {str(e)}", "patch": operations}
+        if not isinstance(edited, dict) or not isinstance(edited.get("blocks"), list) or not isinstance(edited.get("signal_flow"), list):
+            return {"error": "Edit patch removed the design structure", "patch": operations}
+        if not all(isinstance(item, dict) for item in edited["blocks"] + edited["signal_flow"]):
+            return {"error": "Edit patch produced invalid blocks", "patch": operations}
+        
+        # apply_patch copies only what it modifies, so untouched blocks and edges keep their identity
+        old_blocks = {block.get("id"): block for block in design["blocks"]}
+        old_flows = {id(flow) for flow in design["signal_flow"]}
+        new_ids = {block.get("id") for block in edited["blocks"]}
+        changed = {block.get("id") for block in edited["blocks"] if old_blocks.get(block.get("id")) is not block}
+        removed = set(old_blocks) - new_ids
+        added = new_ids - set(old_blocks)
+        changed_flows = [i for i, flow in enumerate(edited["signal_flow"]) if id(flow) not in old_flows]
+        
+        validation_result = validate_design_incremental(
+            edited, changed | removed, changed_flows,
+            circuit_info_changed=edited.get("circuit_info") is not design.get("circuit_info")
+        )
+        if not validation_result["valid"]:
+            return {"error": "Edited design failed validation", "validation_errors": validation_result["errors"], "patch": operations}
+        
+        effective_patch = list(operations)
+        if self.auto_layout and added:
+            placed = self.place_new_blocks(edited, sorted(added))
+            for i, (before, after) in enumerate(zip(edited["blocks"], placed)):
+                if before.get("position") != after.get("position"):
+                    effective_patch.append({"op": "replace", "path": f"/blocks/{i}/position", "value": after["position"]})
+            edited = dict(edited, blocks=placed)
+        
+        return {
+            "design": edited,
+            "patch": effective_patch,
+            "changed_blocks": sorted(changed - added),
+            "added_blocks": sorted(added),
+            "removed_blocks": sorted(removed),
+            "warnings": validation_result["warnings"]
+        }
+    
+    def _get_claude_response(self, system_prompt: str, user_prompt: str, call_type: str = "chat") -> str:
+        """Get response from Claude API through the scheduler; raises LLMError if the call fails."""
+        try:
+            params = self._build_request(system_prompt, [{"role": "user", "content": user_prompt}], call_type)
+            cached = self._cached_response(params)
+            if cached is not None:
+                return cached
             
-            # Check if response has content
-            if not response.content or len(response.content) == 0:
-                return "Error: Empty response from Claude API"
+            start = time.perf_counter()
+            response = self.scheduler.call(self.backend.create, params, call_type)
+            self.usage_metrics.record(call_type, response.usage, time.perf_counter() - start)
             
-            return response.content[0].text.strip()
+            return self._store_response(params, response.text)
         except Exception as e:
-            return f"Error communicating with Claude: {str(e)}"
+            raise self._call_failed(call_type, e)
     
-    def _get_claude_response_from_messages(self, messages: List[Dict[str, str]]) -> str:
+    async def _get_claude_response_async(self, system_prompt: str, user_prompt: str, call_type: str = "chat") -> str:
+        """Get response from Claude API without blocking the event loop."""
+        try:
+            params = self._build_request(system_prompt, [{"role": "user", "content": user_prompt}], call_type)
+            cached = self._cached_response(params)
+            if cached is not None:
+                return cached
+            
+            start = time.perf_counter()
+            response = await self.scheduler.call_async(self.backend.create_async, params, call_type)
+            self.usage_metrics.record(call_type, response.usage, time.perf_counter() - start)
+            
+            return self._store_response(params, response.text)
+        except Exception as e:
+            raise self._call_failed(call_type, e)
+    
+    def _get_claude_response_from_messages(self, messages: List[Dict[str, str]], call_type: str = "chat") -> str:
         """Get response from Claude API using message history."""
         try:
-            # Extract system message and user messages
-            system_message = ""
-            user_messages = []
+            system_message, user_messages = self._split_system_message(messages)
             
-            for msg in messages:
-                if msg["role"] == "system":
-                    system_message = msg["content"]
-                else:
-                    user_messages.append({"role": msg["role"], "content": msg["content"]})
+            params = self._build_request(system_message, user_messages, call_type)
+            cached = self._cached_response(params)
+            if cached is not None:
+                return cached
             
-            print(f"Debug - System message length: {len(system_message)}")
-            print(f"Debug - User messages count: {len(user_messages)}")
+            start = time.perf_counter()
+            response = self.scheduler.call(self.backend.create, params, call_type)
+            elapsed = time.perf_counter() - start
             
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=4000,
-                temperature=0.7,
-                system=system_message,
-                messages=user_messages
-            )
+            if debug_dumps_enabled(logger):
+                logger.debug("Response text: %s", response.text[:200])
             
-            print(f"Debug - Response object: {type(response)}")
-            print(f"Debug - Response content: {response.content}")
+            self.usage_metrics.record(call_type, response.usage, elapsed)
+            return self._store_response(params, response.text)
+        except Exception as e:
+            raise self._call_failed(call_type, e)
+    
+    async def _get_claude_response_from_messages_async(self, messages: List[Dict[str, str]], call_type: str = "chat") -> str:
+        """Get response from Claude API using message history without blocking the event loop."""
+        try:
+            system_message, user_messages = self._split_system_message(messages)
+            
+            params = self._build_request(system_message, user_messages, call_type)
+            cached = self._cached_response(params)
+            if cached is not None:
+                return cached
+            
+            start = time.perf_counter()
+            response = await self.scheduler.call_async(self.backend.create_async, params, call_type)
+            elapsed = time.perf_counter() - start
             
-            # Check if response has content
-            if not response.content or len(response.content) == 0:
-                return "Error: Empty response from Claude API"
+            if debug_dumps_enabled(logger):
+                logger.debug("Response text: %s", response.text[:200])
             
-            return response.content[0].text.strip()
+            self.usage_metrics.record(call_type, response.usage, elapsed)
+            return self._store_response(params, response.text)
         except Exception as e:
-            print(f"Debug - Exception details: {str(e)}")
-            return f"Error communicating with Claude: {str(e)}"
-    
-    def validate_circuit_design(self, design: dict) -> dict:
-        """Validate circuit design JSON structure and signal flow consistency."""
-        errors = []
-        
-        # Check required top-level fields
-        required_fields = ["circuit_info", "blocks", "signal_flow"]
-        for field in required_fields:
-            if field not in design:
-                errors.append(f"Missing required field: {field}")
-        
-        if "circuit_info" in design:
-            # Check circuit_info structure
-            circuit_info = design["circuit_info"]
-            required_info_fields = ["name", "description", "supply_voltage"]
-            for field in required_info_fields:
-                if field not in circuit_info:
-                    errors.append(f"Missing circuit_info field: {field}")
-        
-        if "blocks" in design:
-            blocks = design["blocks"]
-            if not isinstance(blocks, list):
-                errors.append("blocks must be a list")
-            else:
-                block_ids = set()
-                for i, block in enumerate(blocks):
-                    # Check required block fields
-                    required_block_fields = ["id", "name", "function", "position", "inputs", "outputs"]
-                    for field in required_block_fields:
-                        if field not in block:
-                            errors.append(f"Block {i}: Missing required field: {field}")
-                    
-                    # Check for duplicate block IDs
-                    if "id" in block:
-                        if block["id"] in block_ids:
-                            errors.append(f"Duplicate block ID: {block['id']}")
-                        block_ids.add(block["id"])
-                    
-                    # Validate inputs and outputs
-                    for io_type in ["inputs", "outputs"]:
-                        if io_type in block and isinstance(block[io_type], list):
-                            for j, io in enumerate(block[io_type]):
-                                if "signal_type" not in io:
-                                    errors.append(f"Block {block.get('id', i)}: {io_type}[{j}] missing signal_type")
-        
-        if "signal_flow" in design and "blocks" in design:
-            signal_flow = design["signal_flow"]
-            if not isinstance(signal_flow, list):
-                errors.append("signal_flow must be a list")
-            else:
-                # Get all block IDs for reference checking
-                block_ids = {block.get("id") for block in design["blocks"] if "id" in block}
-                
-                for i, flow in enumerate(signal_flow):
-                    # Check required signal flow fields
-                    required_flow_fields = ["signal_type", "from_block", "to_block"]
-                    for field in required_flow_fields:
-                        if field not in flow:
-                            errors.append(f"Signal flow {i}: Missing required field: {field}")
-                    
-                    # Check if referenced blocks exist
-                    if "from_block" in flow and flow["from_block"] not in block_ids:
-                        errors.append(f"Signal flow {i}: from_block '{flow['from_block']}' not found")
-                    if "to_block" in flow and flow["to_block"] not in block_ids:
-                        errors.append(f"Signal flow {i}: to_block '{flow['to_block']}' not found")
-        
-        return {"valid": len(errors) == 0, "errors": errors}
-    
-    def suggest_block_positions(self, blocks: list) -> list:
-        """Suggest optimal positions for blocks based on signal flow and block types."""
-        positioned_blocks = []
-        
-        # Define block type categories and their preferred positions
-        input_blocks = ["input", "cv_input", "gate_input", "audio_input"]
-        processing_blocks = ["oscillator", "filter", "amplifier", "mixer", "waveshaper", "vca", "envelope"]
-        output_blocks = ["output", "buffer", "audio_output"]
-        power_blocks = ["power", "regulator", "supply"]
-        
-        input_y = 0
-        processing_y = 0
-        output_y = 0
-        power_y = 0
-        
-        for block in blocks:
-            block_copy = block.copy()
-            block_type = block.get("function", "").lower()
+            raise self._call_failed(call_type, e)
+    
+    async def _stream_claude_response_from_messages(self, messages: List[Dict[str, str]], call_type: str = "chat") -> AsyncIterator[str]:
+        """Stream response text from Claude API using message history."""
+        try:
+            system_message, user_messages = self._split_system_message(messages)
             
-            # Determine position based on block type
-            if any(inp in block_type for inp in input_blocks):
-                block_copy["position"] = {"x": 0, "y": input_y}
-                input_y += 100
-            elif any(proc in block_type for proc in processing_blocks):
-                block_copy["position"] = {"x": 300, "y": processing_y}
-                processing_y += 100
-            elif any(out in block_type for out in output_blocks):
-                block_copy["position"] = {"x": 600, "y": output_y}
-                output_y += 100
-            elif any(pwr in block_type for pwr in power_blocks):
-                block_copy["position"] = {"x": 300, "y": 400}
-                power_y += 50
-            else:
-                # Default to processing area
-                block_copy["position"] = {"x": 300, "y": processing_y}
-                processing_y += 100
+            params = self._build_request(system_message, user_messages, call_type)
+            cached = self._cached_response(params)
+            if cached is not None:
+                yield cached
+                return
             
-            positioned_blocks.append(block_copy)
+            start = time.perf_counter()
+            first_token = None
+            async for item in self.scheduler.stream(self.backend.stream, params, call_type):
+                if isinstance(item, LLMResponse):
+                    self.usage_metrics.record(call_type, item.usage, time.perf_counter() - start, first_token_seconds=first_token)
+                    self._store_response(params, item.text)
+                else:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    yield item
+        except Exception as e:
+            raise self._call_failed(call_type, e)
+    
+    def _call_failed(self, call_type: str, error: Exception) -> LLMError:
+        """Log and count a failed LLM call and return it as the LLMError to raise."""
+        LLM_ERRORS.inc(call_type=call_type, error=type(error).__name__)
+        logger.warning("LLM %s call failed: %s", call_type, error)
+        if isinstance(error, LLMError):
+            return error
+        return LLMError(f"Error communicating with Claude: {str(error)}")
+    
+    def _build_request(self, system_message: str, user_messages: List[Dict[str, str]], call_type: str = "chat") -> Dict[str, Any]:
+        """Build Messages API parameters, marking the static prefix as cacheable.
+        
+        The system prompt and the last message each get an ephemeral cache_control
+        breakpoint. The system prompts never change, and each turn only appends to
+        conversation_history, so the next call reads everything up to the previous
+        breakpoint from the prompt cache instead of reprocessing it.
+        """
+        params = self.settings_for(call_type)
+        params["system"] = system_message
+        params["messages"] = user_messages
+        if not self.prompt_caching:
+            return params
+        
+        cache_control = {"type": "ephemeral"}
+        if system_message:
+            params["system"] = [{"type": "text", "text": system_message, "cache_control": cache_control}]
+        if user_messages:
+            # Copy the last message so conversation_history keeps plain string content
+            last = user_messages[-1]
+            params["messages"] = user_messages[:-1] + [{
+                "role": last["role"],
+                "content": [{"type": "text", "text": last["content"], "cache_control": cache_control}]
+            }]
+        return params
+    
+    def settings_for(self, call_type: str) -> Dict[str, Any]:
+        """Return the model, max_tokens and temperature used for one call type."""
+        settings = {"model": DEFAULT_MODEL, "max_tokens": DEFAULT_MAX_TOKENS, "temperature": self.temperature}
+        settings.update(self.call_settings.get("default", {}))
+        settings.update(self.call_settings.get(call_type, {}))
+        return settings
+    
+    def _cached_response(self, params: Dict[str, Any]) -> Optional[str]:
+        """Return a cached response for these request parameters, if caching applies."""
+        if self.response_cache is None or not self.response_cache.is_eligible(params):
+            return None
+        return self.response_cache.get(params)
+    
+    def _store_response(self, params: Dict[str, Any], text: str) -> str:
+        """Store a successful response in the response cache and return it."""
+        if self.response_cache is not None and self.response_cache.is_eligible(params):
+            self.response_cache.put(params, text)
+        return text
+    
+    def _split_system_message(self, messages: List[Dict[str, str]]):
+        """Extract system message and user messages."""
+        system_message = ""
+        user_messages = []
         
-        return positioned_blocks
+        for msg in messages:
+            if msg["role"] == "system":
+                system_message = msg["content"]
+            else:
+                user_messages.append({"role": msg["role"], "content": msg["content"]})
+        
+        logger.debug("System message length: %d, user messages: %d", len(system_message), len(user_messages))
+        
+        return system_message, user_messages
+    
+    def validate_circuit_design(self, design: dict, strict_ports: bool = False, detect_cycles: bool = False) -> dict:
+        """Validate circuit design JSON against the compiled schema and check signal flow consistency."""
+        with Timer(DESIGN_VALIDATION_SECONDS):
+            return validate_design(design, strict_ports=strict_ports, detect_cycles=detect_cycles)
+    
+    def suggest_block_positions(self, blocks: list, signal_flow: Optional[list] = None) -> list:
+        """Suggest positions for blocks with a layered layout of the signal flow graph."""
+        positions = layout_design(blocks, signal_flow or [])
+        return apply_layout(blocks, positions)
+    
+    def place_new_blocks(self, design: dict, new_block_ids: list) -> list:
+        """Position newly added blocks around the existing layout without moving other blocks."""
+        new_block_ids = set(new_block_ids)
+        positions = {
+            block["id"]: block["position"]
+            for block in design["blocks"]
+            if block.get("id") not in new_block_ids and isinstance(block.get("position"), dict)
+        }
+        positions = place_new_blocks(positions, design["blocks"], design["signal_flow"], new_block_ids)
+        return apply_layout(design["blocks"], positions)
 
 
 # Main function moved to scripts/run_agent.py for CLI interface 
\ No newline at end of file
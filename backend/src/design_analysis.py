@@ -0,0 +1,295 @@
+import re
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from design_model import Design, SignalType, POWER_SIGNAL_TYPES
+
+# Outgoing edges of one signal type a block may drive before it is reported
+DEFAULT_MAX_FAN_OUT = 8
+
+# Nominal rail voltages, to turn a power draw given in watts into a current
+RAIL_VOLTS = {SignalType.POWER_12V: 12.0, SignalType.POWER_NEG12V: 12.0, SignalType.POWER_5V: 5.0}
+
+# Block parameters read as a current draw (or, for supplies, the current they can deliver)
+_DRAW_KEYWORDS = ("current", "consumption", "draw")
+_QUANTITY = re.compile(r"(\d+(?:\.\d+)?)\s*(µ|u|m)?(A|W)\b")
+_PREFIXES = {None: 1.0, "m": 1e-3, "u": 1e-6, "µ": 1e-6}
+
+
+def parse_draw(value: Any) -> Tuple[Optional[float], Optional[float]]:
+    """Read a parameter value such as "20mA", "1.5 A" or "250mW" as (milliamps, milliwatts)."""
+    if not isinstance(value, str):
+        return None, None
+    match = _QUANTITY.search(value)
+    if not match:
+        return None, None
+    amount = float(match.group(1)) * _PREFIXES[match.group(2)] * 1000
+    return (amount, None) if match.group(3) == "A" else (None, amount)
+
+
+def block_draw(parameters: Any) -> Tuple[Optional[float], Optional[float]]:
+    """The largest current (mA) and power (mW) among a block's draw parameters."""
+    current = power = None
+    if not isinstance(parameters, dict):
+        return current, power
+    for key, value in parameters.items():
+        if not any(keyword in key.lower() for keyword in _DRAW_KEYWORDS):
+            continue
+        ma, mw = parse_draw(value)
+        if ma is not None:
+            current = max(current or 0.0, ma)
+        if mw is not None:
+            power = max(power or 0.0, mw)
+    return current, power
+
+
+def _reach(roots: Iterable[str], successors: Dict[str, List[str]]) -> set:
+    """Every node reachable from roots (roots included), breadth first."""
+    seen = set(roots)
+    queue = deque(seen)
+    while queue:
+        for child in successors.get(queue.popleft(), ()):
+            if child not in seen:
+                seen.add(child)
+                queue.append(child)
+    return seen
+
+
+def find_cycles(nodes: Iterable[str], successors: Dict[str, List[str]]) -> List[List[str]]:
+    """Return the feedback loops of a directed graph: its strongly connected components with a cycle.
+
+    Iterative Tarjan, so deep graphs do not hit the recursion limit; every
+    node and edge is visited once.
+    """
+    index = {}
+    low = {}
+    on_stack = set()
+    stack = []
+    cycles = []
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors.get(root, ())))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors.get(child, ()))))
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] != index[node]:
+                    continue
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                if len(component) > 1 or node in successors.get(node, ()):
+                    cycles.append(component[::-1])
+    return cycles
+
+
+def _power_inputs(design: Design) -> Dict[str, set]:
+    """The power rail and ground signal types each block receives an edge of."""
+    fed = {}
+    for flow in design.signal_flow:
+        if flow.signal_type in POWER_SIGNAL_TYPES:
+            fed.setdefault(flow.to_block, set()).add(flow.signal_type)
+    return fed
+
+
+def _power_budget(design: Design, fed: Dict[str, set]) -> Dict[str, Any]:
+    """Sum block current draws per rail against what the supply blocks can deliver."""
+    adjacency = design.adjacency
+    rails = {}
+    unassigned = 0.0
+    estimated = unestimated = 0
+
+    def rail(signal_type):
+        return rails.setdefault(signal_type, {"draw_ma": 0.0, "capacity_ma": None, "blocks": 0})
+
+    for block in design.blocks:
+        current, power = block_draw((block.details or {}).get("parameters"))
+        if block.id in adjacency.power_ids:
+            if current is not None:
+                for port in block.outputs:
+                    if port.signal_type in RAIL_VOLTS:
+                        entry = rail(port.signal_type)
+                        entry["capacity_ma"] = (entry["capacity_ma"] or 0.0) + current
+            continue
+
+        block_rails = sorted({t for t in fed.get(block.id, ()) if t in RAIL_VOLTS}
+                             | {p.signal_type for p in block.inputs if p.signal_type in RAIL_VOLTS})
+        if current is None and power is not None and block_rails:
+            # The same current flows through every rail of a bipolar supply
+            current = power / sum(RAIL_VOLTS[t] for t in block_rails)
+        if current is None:
+            unestimated += 1
+            continue
+        estimated += 1
+        if not block_rails:
+            unassigned += current
+        for signal_type in block_rails:
+            entry = rail(signal_type)
+            entry["draw_ma"] += current
+            entry["blocks"] += 1
+
+    budget = {}
+    over_budget = []
+    for signal_type, entry in sorted(rails.items()):
+        capacity = entry["capacity_ma"]
+        budget[signal_type.value] = {
+            "draw_ma": round(entry["draw_ma"], 3),
+            "capacity_ma": capacity,
+            "headroom_ma": round(capacity - entry["draw_ma"], 3) if capacity is not None else None,
+            "blocks": entry["blocks"]
+        }
+        if capacity is not None and entry["draw_ma"] > capacity:
+            over_budget.append(signal_type.value)
+    return {
+        "rails": budget,
+        "unassigned_ma": round(unassigned, 3),
+        "estimated_blocks": estimated,
+        "unestimated_blocks": unestimated,
+        "over_budget": over_budget
+    }
+
+
+def analyze_model(design: Design, max_fan_out: int = DEFAULT_MAX_FAN_OUT) -> Dict[str, Any]:
+    """Analyze the signal graph of a valid design.
+
+    Every check walks the design's adjacency index once, so the whole
+    analysis is linear in blocks plus edges:
+
+    - reachability: signal origins are blocks with outgoing but no incoming
+      signal edges, and outputs the reverse; blocks no origin reaches and
+      blocks that reach no output (both only happen inside loops) are
+      reported, overall and per signal type
+    - orphans: blocks without any signal edge (supplies: without any edge)
+    - unpowered: blocks missing a power rail or ground edge they declare an
+      input for, or missing ground while fed a rail in a design that wires ground
+    - fan_out: blocks driving more than max_fan_out edges of one signal type
+    - cycles: feedback loops of the signal graph (strongly connected components)
+    - power_budget: block current draws from their parameters, per rail,
+      against the current the supply blocks can deliver
+
+    Findings are advisory: each one is also listed as a warning message.
+    """
+    start = time.perf_counter()
+    adjacency = design.adjacency
+    successors = adjacency.successors
+    predecessors = adjacency.predecessors
+    signal_ids = [block.id for block in design.blocks if block.id not in adjacency.power_ids]
+    warnings = []
+
+    orphans = []
+    if len(design.blocks) > 1:
+        for block in design.blocks:
+            if block.id in adjacency.power_ids:
+                if not adjacency.flows_by_block.get(block.id):
+                    orphans.append(block.id)
+            elif block.id not in successors and block.id not in predecessors:
+                orphans.append(block.id)
+    warnings.extend(f"Block {block_id} is not connected to any signal" for block_id in orphans)
+
+    origins = [i for i in signal_ids if i in successors and i not in predecessors]
+    outputs = [i for i in signal_ids if i in predecessors and i not in successors]
+    connected = [i for i in signal_ids if i in successors or i in predecessors]
+    reached = _reach(origins, successors)
+    reaching = _reach(outputs, predecessors)
+    unreachable = [i for i in connected if i not in reached]
+    dead_ends = [i for i in connected if i not in reaching]
+    warnings.extend(f"Block {block_id} is only fed from a feedback loop, never from a signal source" for block_id in unreachable)
+    warnings.extend(f"Block {block_id} never reaches an output block" for block_id in dead_ends)
+
+    by_signal_type = {}
+    fan_out = []
+    for signal_type, type_successors in adjacency.successors_by_type.items():
+        targets = {t for children in type_successors.values() for t in children}
+        nodes = type_successors.keys() | targets
+        sources = [n for n in nodes if n not in targets]
+        type_reached = _reach(sources, type_successors)
+        name = getattr(signal_type, "value", signal_type)
+        by_signal_type[name] = {
+            "edges": sum(len(children) for children in type_successors.values()),
+            "sources": len(sources),
+            "sinks": sum(1 for n in nodes if n not in type_successors),
+            "reached": len(type_reached),
+            "unreached": sorted(nodes - type_reached)
+        }
+        for block_id, children in type_successors.items():
+            if len(children) > max_fan_out:
+                fan_out.append({"block": block_id, "signal_type": name, "fan_out": len(children)})
+                warnings.append(f"Block {block_id} drives {len(children)} {name} edges (limit {max_fan_out})")
+
+    fed = _power_inputs(design)
+    has_ground = any(SignalType.GROUND in types for types in fed.values())
+    unpowered = []
+    no_power = frozenset()
+    for block in design.blocks:
+        if block.id in adjacency.power_ids:
+            continue
+        block_fed = fed.get(block.id, no_power)
+        missing = {p.signal_type for p in block.inputs if p.signal_type in POWER_SIGNAL_TYPES} - block_fed
+        if has_ground and block_fed and SignalType.GROUND not in block_fed:
+            missing.add(SignalType.GROUND)
+        if missing:
+            names = sorted(t.value for t in missing)
+            unpowered.append({"block": block.id, "missing": names})
+            warnings.append(f"Block {block.id} has no {', '.join(names)} connection")
+
+    cycles = find_cycles(connected, successors)
+    warnings.extend(f"Signal flow contains a feedback loop through {', '.join(cycle)}" for cycle in cycles)
+
+    power_budget = _power_budget(design, fed)
+    for rail in power_budget["over_budget"]:
+        entry = power_budget["rails"][rail]
+        warnings.append(f"Rail {rail} draws {entry['draw_ma']}mA of the {entry['capacity_ma']}mA its supplies deliver")
+
+    return {
+        "blocks": len(design.blocks),
+        "edges": len(design.signal_flow),
+        "issues": {
+            "orphans": len(orphans),
+            "unreachable": len(unreachable),
+            "dead_ends": len(dead_ends),
+            "unpowered": len(unpowered),
+            "fan_out": len(fan_out),
+            "cycles": len(cycles),
+            "over_budget": len(power_budget["over_budget"])
+        },
+        "reachability": {
+            "origins": len(origins),
+            "outputs": len(outputs),
+            "unreachable": unreachable,
+            "dead_ends": dead_ends,
+            "by_signal_type": by_signal_type
+        },
+        "orphans": orphans,
+        "unpowered": unpowered,
+        "fan_out": fan_out,
+        "cycles": cycles,
+        "power_budget": power_budget,
+        "warnings": warnings,
+        "analysis_ms": round((time.perf_counter() - start) * 1000, 3)
+    }
+
+
+def analyze_design(design: Dict[str, Any], max_fan_out: int = DEFAULT_MAX_FAN_OUT) -> Dict[str, Any]:
+    """Analyze a valid design given as parsed JSON (see analyze_model)."""
+    return analyze_model(Design.from_dict(design), max_fan_out=max_fan_out)
@@ -0,0 +1,245 @@
+import json
+import sys
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the json module is the fallback serializer
+    orjson = None
+
+
+class SignalType(str, Enum):
+    """Signal types of the schema; members compare equal to their string values."""
+
+    AUDIO = "audio_signal"
+    CV = "cv_signal"
+    GATE = "gate_signal"
+    SYNC = "sync_signal"
+    POWER_12V = "power_12v"
+    POWER_NEG12V = "power_neg12v"
+    POWER_5V = "power_5v"
+    GROUND = "ground"
+
+    @property
+    def is_power(self) -> bool:
+        return self in POWER_SIGNAL_TYPES
+
+
+_SIGNAL_TYPES = {member.value: member for member in SignalType}
+# Power rails and ground; set membership is much cheaper than the is_power property in hot loops
+POWER_SIGNAL_TYPES = frozenset(m for m in SignalType if m is SignalType.GROUND or m.value.startswith("power_"))
+
+# Block fields held as attributes; the detail fields and any other keys stay in Block.details
+_BLOCK_KEYS = frozenset(("id", "name", "function", "position", "inputs", "outputs"))
+_PORT_KEYS = frozenset(("signal_type", "name", "required", "description"))
+_FLOW_KEYS = frozenset(("signal_type", "from_block", "to_block", "description"))
+
+
+def signal_type(value: Any) -> Union[SignalType, Any]:
+    """Return the SignalType for a schema signal type string; other values are returned (interned) as is."""
+    member = _SIGNAL_TYPES.get(value)
+    if member is not None:
+        return member
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _plain(value: Any) -> Any:
+    return value.value if isinstance(value, SignalType) else value
+
+
+@dataclass(slots=True)
+class Port:
+    signal_type: Union[SignalType, str]
+    name: str
+    required: Optional[bool] = None
+    description: Optional[str] = None
+    extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Port":
+        extra = {k: v for k, v in data.items() if k not in _PORT_KEYS} if not data.keys() <= _PORT_KEYS else None
+        return cls(signal_type(data.get("signal_type")), data.get("name"), data.get("required"), data.get("description"), extra)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"signal_type": _plain(self.signal_type), "name": self.name}
+        if self.required is not None:
+            data["required"] = self.required
+        if self.description is not None:
+            data["description"] = self.description
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class Flow:
+    signal_type: Union[SignalType, str]
+    from_block: str
+    to_block: str
+    description: Optional[str] = None
+    extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Flow":
+        extra = {k: v for k, v in data.items() if k not in _FLOW_KEYS} if not data.keys() <= _FLOW_KEYS else None
+        return cls(signal_type(data.get("signal_type")), _intern(data.get("from_block")), _intern(data.get("to_block")),
+                   data.get("description"), extra)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"signal_type": _plain(self.signal_type), "from_block": self.from_block, "to_block": self.to_block}
+        if self.description is not None:
+            data["description"] = self.description
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class Block:
+    id: str
+    name: str
+    function: str
+    x: float
+    y: float
+    inputs: Tuple[Port, ...]
+    outputs: Tuple[Port, ...]
+    # Detail fields (implementation, how_it_works, ...) and any other keys, as parsed
+    details: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Block":
+        position = data.get("position") or {}
+        details = {k: v for k, v in data.items() if k not in _BLOCK_KEYS}
+        return cls(
+            _intern(data.get("id")), data.get("name"), data.get("function"), position.get("x", 0), position.get("y", 0),
+            tuple(Port.from_dict(p) for p in data.get("inputs") or ()),
+            tuple(Port.from_dict(p) for p in data.get("outputs") or ()),
+            details or None
+        )
+
+    @property
+    def is_power(self) -> bool:
+        """True for blocks whose outputs are all power rails or ground (supplies, regulators)."""
+        return bool(self.outputs) and all(p.signal_type in POWER_SIGNAL_TYPES for p in self.outputs)
+
+    def summary_dict(self) -> Dict[str, Any]:
+        """The fields the diagram draws (design_store.SUMMARY_BLOCK_FIELDS)."""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "function": self.function,
+            "position": {"x": self.x, "y": self.y},
+            "inputs": [p.to_dict() for p in self.inputs],
+            "outputs": [p.to_dict() for p in self.outputs]
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self.summary_dict()
+        if self.details:
+            data.update(self.details)
+        return data
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class AdjacencyIndex:
+    """Block and edge lookups over a design's signal_flow, built in one pass.
+
+    successors/predecessors hold block ids per block (non-power edges only,
+    as the layout and cycle checks use them), successors_by_type splits the
+    successors by signal type, and flows_by_block holds the indices of every
+    signal_flow edge touching a block, power edges included.
+    """
+
+    __slots__ = ("by_id", "successors", "predecessors", "successors_by_type", "flows_by_block", "power_ids")
+
+    def __init__(self, design: "Design"):
+        self.by_id = {block.id: block for block in design.blocks}
+        self.power_ids = frozenset(block.id for block in design.blocks if block.is_power)
+        self.successors = {}
+        self.predecessors = {}
+        self.successors_by_type = {}
+        self.flows_by_block = {}
+        for i, flow in enumerate(design.signal_flow):
+            self.flows_by_block.setdefault(flow.from_block, []).append(i)
+            if flow.to_block != flow.from_block:
+                self.flows_by_block.setdefault(flow.to_block, []).append(i)
+            if flow.signal_type in POWER_SIGNAL_TYPES:
+                continue
+            self.successors.setdefault(flow.from_block, []).append(flow.to_block)
+            self.predecessors.setdefault(flow.to_block, []).append(flow.from_block)
+            self.successors_by_type.setdefault(flow.signal_type, {}).setdefault(flow.from_block, []).append(flow.to_block)
+
+    def signal_edges(self) -> List[Tuple[str, str]]:
+        """The (from_block, to_block) pairs of the non-power edges, like layout.signal_edges."""
+        return [(u, v) for u, targets in self.successors.items() for v in targets]
+
+
+@dataclass(slots=True)
+class Design:
+    """Compact typed form of a validated design, built once from its parsed JSON.
+
+    Blocks, ports and edges are slotted objects instead of dicts, block ids
+    are interned and signal types are SignalType members, so the many
+    repeated strings of a large design are stored once. to_dict()
+    reproduces the JSON (detail fields and unknown keys included) and
+    dumps() serializes it.
+    """
+
+    circuit_info: Dict[str, Any]
+    blocks: List[Block]
+    signal_flow: List[Flow]
+    extra: Optional[Dict[str, Any]] = None
+    _adjacency: Optional[AdjacencyIndex] = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Design":
+        """Build the model from a design that passed schema validation."""
+        extra = {k: v for k, v in data.items() if k not in ("circuit_info", "blocks", "signal_flow")}
+        return cls(
+            data.get("circuit_info") or {},
+            [Block.from_dict(b) for b in data.get("blocks") or ()],
+            [Flow.from_dict(f) for f in data.get("signal_flow") or ()],
+            extra or None
+        )
+
+    @property
+    def adjacency(self) -> AdjacencyIndex:
+        """Lookup index over blocks and signal_flow, built on first use."""
+        if self._adjacency is None:
+            self._adjacency = AdjacencyIndex(self)
+        return self._adjacency
+
+    def block(self, block_id: str) -> Optional[Block]:
+        return self.adjacency.by_id.get(block_id)
+
+    def summary_dict(self) -> Dict[str, Any]:
+        """Same projection as design_store.summarize_design."""
+        return {
+            "circuit_info": self.circuit_info,
+            "blocks": [b.summary_dict() for b in self.blocks],
+            "signal_flow": [f.to_dict() for f in self.signal_flow]
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "circuit_info": self.circuit_info,
+            "blocks": [b.to_dict() for b in self.blocks],
+            "signal_flow": [f.to_dict() for f in self.signal_flow]
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+def dumps(payload: Any) -> bytes:
+    """Serialize a payload (dicts or models) to compact UTF-8 JSON, with orjson when it is installed."""
+    if isinstance(payload, (Design, Block)):
+        payload = payload.to_dict()
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
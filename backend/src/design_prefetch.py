@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from llm_scheduler import TokenBucket, mark_speculative
+from observability import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PREFETCHES = REGISTRY.counter(
+    "design_prefetches_total",
+    "Speculative design generations by outcome (started, hit, stale, discarded, expired, failed, skipped)"
+)
+PREFETCH_SAVED_SECONDS = REGISTRY.histogram(
+    "design_prefetch_saved_seconds", "Design generation latency hidden from the user by a prefetch hit"
+)
+
+# Follow-up turns that summarize the requirements or offer to go ahead instead of asking more questions
+_READY_PATTERN = re.compile(
+    r"\b(proceed|summary|summari[sz]e|to recap|everything (?:i|we) need|"
+    r"ready to (?:generate|design|build|start)|shall i (?:generate|design|go ahead|start))\b",
+    re.IGNORECASE
+)
+
+# Generation parameters a prefetch runs with: (candidates, first_valid, hierarchical), all agent defaults
+DEFAULT_PARAMS = (None, True, None)
+
+
+def looks_ready_to_generate(response: str) -> bool:
+    """True for an agent turn that summarizes the requirements or offers to proceed with the design."""
+    return bool(_READY_PATTERN.search(response or ""))
+
+
+def state_key(state: Dict[str, Any], params: Tuple = DEFAULT_PARAMS) -> str:
+    """Fingerprint of a session state and generation parameters; a prefetch only answers the exact same request."""
+    payload = json.dumps([state, list(params)], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class DesignPrefetcher:
+    """Speculative design generation while the user reads the requirements summary.
+
+    When a follow-up turn looks like the "summary, shall I proceed?" message,
+    start() begins generating the design in the background on a copy of the
+    session, with its LLM calls queued behind every regular call. If the
+    next generate request finds the session unchanged, take() returns that
+    design (waiting for it if it is still running); any further answer from
+    the user, a different request or the TTL discards it. At most
+    max_concurrency prefetches run at once and at most per_minute start per
+    minute (0 disables either limit); prefetches over a limit are skipped.
+    """
+
+    def __init__(self, max_concurrency: int = 2, per_minute: float = 10.0, ttl: float = 600.0):
+        self.max_concurrency = max_concurrency
+        self.ttl = ttl
+        self.budget = TokenBucket(per_minute) if per_minute else None
+        # session_id -> {"key", "agent", "task", "started", "finished"}
+        self._entries = {}
+        self.outcomes = dict.fromkeys(("started", "hit", "stale", "discarded", "expired", "failed", "skipped"), 0)
+        self.saved_seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> Optional["DesignPrefetcher"]:
+        """Create a prefetcher from DESIGN_PREFETCH=1 and PREFETCH_* environment variables, or None if disabled."""
+        if os.getenv("DESIGN_PREFETCH", "0") != "1":
+            return None
+        return cls(
+            max_concurrency=int(os.getenv("PREFETCH_MAX_CONCURRENCY", "2")),
+            per_minute=float(os.getenv("PREFETCH_PER_MINUTE", "10")),
+            ttl=float(os.getenv("PREFETCH_TTL", "600"))
+        )
+
+    def start(self, session_id: str, session_agent: Any, response: str) -> bool:
+        """Start prefetching the session's design if response offers to proceed and the limits allow; returns whether it started."""
+        self.discard(session_id)
+        self._expire()
+        if not looks_ready_to_generate(response):
+            return False
+        running = sum(1 for entry in self._entries.values() if not entry["task"].done())
+        if (self.max_concurrency and running >= self.max_concurrency) or (self.budget and self.budget.wait_time(1) > 0):
+            self._record("skipped")
+            return False
+        if self.budget:
+            self.budget.take(1)
+
+        state = session_agent.session_state()
+        entry = {"key": state_key(state), "started": time.monotonic(), "finished": None}
+        entry["agent"] = session_agent.for_session(state)
+        entry["task"] = asyncio.create_task(self._generate(entry, entry["agent"]))
+        self._entries[session_id] = entry
+        self._record("started")
+        return True
+
+    async def take(self, session_id: str, state: Dict[str, Any], params: Tuple = DEFAULT_PARAMS) -> Optional[Tuple[dict, Optional[dict]]]:
+        """Return the prefetched (design, template match) for this exact request, or None to generate as usual."""
+        entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return None
+        requested = time.monotonic()
+        if requested - entry["started"] > self.ttl:
+            self._cancel(entry, "expired")
+            return None
+        if entry["key"] != state_key(state, params):
+            self._cancel(entry, "stale")
+            return None
+        try:
+            design, template = await entry["task"]
+        except Exception as e:
+            # The request generates the design itself instead
+            logger.info("Prefetched design for %s failed: %s", session_id, e)
+            self._record("failed")
+            return None
+        if "error" in design:
+            self._record("failed")
+            return None
+
+        # Only a design the user actually gets joins the template index
+        entry["agent"].learn_template(design)
+        saved = min(requested, entry["finished"]) - entry["started"]
+        self.saved_seconds += saved
+        PREFETCH_SAVED_SECONDS.observe(saved)
+        self._record("hit")
+        return design, template
+
+    def discard(self, session_id: str) -> None:
+        """Drop the session's prefetch (the user answered again or restarted), cancelling it if it is running."""
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._cancel(entry, "discarded")
+
+    def stats(self) -> Dict[str, Any]:
+        started = self.outcomes["started"]
+        return dict(
+            self.outcomes,
+            running=sum(1 for entry in self._entries.values() if not entry["task"].done()),
+            held=len(self._entries),
+            hit_rate=round(self.outcomes["hit"] / started, 3) if started else 0.0,
+            saved_seconds=round(self.saved_seconds, 3)
+        )
+
+    async def _generate(self, entry: Dict[str, Any], session_agent: Any) -> Tuple[dict, Optional[dict]]:
+        mark_speculative()
+        design = await session_agent.generate_circuit_design_async()
+        entry["finished"] = time.monotonic()
+        return design, session_agent.last_template
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for session_id in [s for s, entry in self._entries.items() if now - entry["started"] > self.ttl]:
+            self._cancel(self._entries.pop(session_id), "expired")
+
+    def _cancel(self, entry: Dict[str, Any], outcome: str) -> None:
+        task = entry["task"]
+        if task.done():
+            if not task.cancelled():
+                # Retrieve the exception, if any, so asyncio does not log it as never retrieved
+                task.exception()
+        else:
+            task.cancel()
+        self._record(outcome)
+
+    def _record(self, outcome: str) -> None:
+        self.outcomes[outcome] += 1
+        PREFETCHES.inc(outcome=outcome)
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from design_model import Design, dumps
+from session_store import SessionBackend, backend_from_url
+
+# Block fields the diagram needs; everything else is served per block on demand
+SUMMARY_BLOCK_FIELDS = ("id", "name", "function", "position", "inputs", "outputs")
+
+
+def summarize_design(design: Dict[str, Any]) -> Dict[str, Any]:
+    """Project a full design onto what the diagram draws: circuit_info, block ports/positions and edges."""
+    return {
+        "circuit_info": design.get("circuit_info", {}),
+        "blocks": [
+            {key: block[key] for key in SUMMARY_BLOCK_FIELDS if key in block}
+            for block in design.get("blocks", [])
+        ],
+        "signal_flow": design.get("signal_flow", [])
+    }
+
+
+def encode_json(payload: Any) -> bytes:
+    """Serialize a payload compactly for HTTP responses and storage."""
+    return dumps(payload)
+
+
+def etag_for(data: bytes) -> str:
+    """Return a strong ETag for a response body."""
+    return '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+
+
+class DesignStore:
+    """Bounded LRU of generated designs with their serialized views.
+
+    Each entry keeps the design as a compact design_model.Design plus lazily
+    built "full", "summary" and per-block views as (bytes, ETag), so repeated
+    and conditional GETs never re-serialize. With a backend (sqlite:/file:
+    as for sessions) designs survive restarts and are shared between workers;
+    the stored bytes are compared with the cached entry on every read, so
+    another worker's update is never served stale. from_env keeps designs in
+    a "designs" table, so the sqlite file may be SESSION_BACKEND's; a file:
+    directory must not be.
+    """
+
+    def __init__(self, max_designs: int = 500, backend: Optional[SessionBackend] = None):
+        self.max_designs = max_designs
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._designs = OrderedDict()  # design_id -> {"model", "data" (serialized), "views": {view: (bytes, etag)}}
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "DesignStore":
+        """Create a design store configured from DESIGN_STORE_* environment variables."""
+        return cls(
+            max_designs=int(os.getenv("DESIGN_STORE_MAX", "500")),
+            backend=backend_from_url(os.getenv("DESIGN_STORE_BACKEND"), table="designs")
+        )
+
+    def put(self, design: Dict[str, Any], design_id: Optional[str] = None) -> str:
+        """Store a design (replacing any previous version) and return its id."""
+        design_id = design_id or f"design_{uuid.uuid4().hex}"
+        data = encode_json(design)
+        self._cache(design_id, {"model": Design.from_dict(design), "data": data, "views": {}})
+        if self.backend:
+            self.backend.put(design_id, data)
+        return design_id
+
+    def get(self, design_id: str) -> Optional[Dict[str, Any]]:
+        """Return the full design as a new dict the caller may modify, or None if unknown."""
+        entry = self._entry(design_id)
+        # Decoded from the stored bytes: to_dict() would share circuit_info and detail fields with the model
+        return json.loads(entry["data"]) if entry else None
+
+    def model(self, design_id: str) -> Optional[Design]:
+        """Return the stored design model (shared, do not modify), or None if unknown."""
+        entry = self._entry(design_id)
+        return entry["model"] if entry else None
+
+    def delete(self, design_id: str) -> None:
+        with self._lock:
+            self._designs.pop(design_id, None)
+        if self.backend:
+            self.backend.delete(design_id)
+
+    def view(self, design_id: str, view: str = "full", block_id: Optional[str] = None) -> Optional[Tuple[bytes, str]]:
+        """Return the serialized (body, ETag) of the full design, its summary or one block.
+
+        None means the design or block does not exist.
+        """
+        entry = self._entry(design_id)
+        if entry is None:
+            return None
+        key = (view, block_id)
+        cached = entry["views"].get(key)
+        if cached is not None:
+            return cached
+
+        model = entry["model"]
+        if view == "full":
+            cached = (entry["data"], etag_for(entry["data"]))
+            entry["views"][key] = cached
+            return cached
+        if view == "summary":
+            payload = model.summary_dict()
+        elif view == "block":
+            block = model.block(block_id)
+            if block is None:
+                return None
+            payload = block.to_dict()
+        else:
+            raise ValueError(f"Unknown design view: {view}")
+        data = encode_json(payload)
+        cached = (data, etag_for(data))
+        entry["views"][key] = cached
+        return cached
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "designs": len(self._designs),
+                "max_designs": self.max_designs,
+                "evictions": self.evictions,
+                "backend": type(self.backend).__name__ if self.backend else None
+            }
+
+    def _entry(self, design_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._designs.get(design_id)
+            if entry is not None:
+                self._designs.move_to_end(design_id)
+        if not self.backend:
+            return entry
+
+        data = self.backend.get(design_id)
+        if data is None:
+            if entry is not None:
+                with self._lock:
+                    self._designs.pop(design_id, None)
+            return None
+        if entry is not None and entry["data"] == data:
+            return entry
+        entry = {"model": Design.from_dict(json.loads(data)), "data": data, "views": {}}
+        self._cache(design_id, entry)
+        return entry
+
+    def _cache(self, design_id: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._designs.pop(design_id, None)
+            self._designs[design_id] = entry
+            while len(self._designs) > self.max_designs:
+                self._designs.popitem(last=False)
+                self.evictions += 1
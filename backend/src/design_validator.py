@@ -0,0 +1,359 @@
+import json
+import os
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Shared schema used by both the backend and the frontend
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'shared', 'schemas', 'circuit_schema.json')
+
+# Validator signature: (value, errors) -> None; errors are appended in place
+Validator = Callable[[Any, List[str]], None]
+
+# JSON schema type -> Python type expression used in the generated isinstance() checks
+_TYPES = {
+    "object": "dict",
+    "array": "list",
+    "string": "str",
+    "number": "(int, float)",
+    "integer": "int",
+    "boolean": "bool",
+    "null": "type(None)"
+}
+
+
+class _SchemaCompiler:
+    """Generates the source of one validation function for a schema."""
+
+    def __init__(self):
+        self.lines = []
+        self.constants = {}
+        self._names = 0
+
+    def name(self, prefix: str) -> str:
+        self._names += 1
+        return f"{prefix}{self._names}"
+
+    def constant(self, prefix: str, value: Any) -> str:
+        name = self.name(prefix)
+        self.constants[name] = value
+        return name
+
+    def emit(self, indent: int, line: str) -> None:
+        self.lines.append("    " * indent + line)
+
+    def error(self, indent: int, path: List[str], message: str) -> None:
+        """Emit an errors.append() whose path is only formatted when the error happens."""
+        rendered = "".join(path).lstrip(".") or "design"
+        self.emit(indent, f'errors.append(f"{rendered}: {message}")')
+
+    def node(self, schema: Dict[str, Any], var: str, path: List[str], indent: int) -> None:
+        """Emit the checks for one schema node applied to the variable var."""
+        type_name = schema.get("type")
+        if type_name:
+            bool_guard = f" or isinstance({var}, bool)" if type_name in ("number", "integer") else ""
+            self.emit(indent, f"if not isinstance({var}, {_TYPES[type_name]}){bool_guard}:")
+            self.error(indent + 1, path, f"expected {type_name}, got {{type({var}).__name__}}")
+            if not self._has_checks(schema):
+                return
+            self.emit(indent, "else:")
+            indent += 1
+
+        if schema.get("enum"):
+            enum = self.constant("ENUM", frozenset(schema["enum"]))
+            self.emit(indent, f"if {var} not in {enum}:")
+            self.error(indent + 1, path, f"{{{var}!r}} is not one of {_escape(str(schema['enum']))}")
+
+        if "pattern" in schema:
+            pattern = self.constant("PATTERN", re.compile(schema["pattern"]))
+            self.emit(indent, f"if isinstance({var}, str) and not {pattern}.search({var}):")
+            self.error(indent + 1, path, f"{{{var}!r}} does not match pattern {_escape(repr(schema['pattern']))}")
+
+        if schema.get("required") or schema.get("properties"):
+            guard = "" if type_name == "object" else f"if isinstance({var}, dict):"
+            if guard:
+                self.emit(indent, guard)
+                indent += 1
+            for field in schema.get("required", ()):
+                self.emit(indent, f"if {field!r} not in {var}:")
+                self.error(indent + 1, path, f"Missing required field: {_escape(field)}")
+            for field, sub_schema in schema.get("properties", {}).items():
+                if not sub_schema:
+                    continue
+                item = self.name("v")
+                self.emit(indent, f"{item} = {var}.get({field!r}, MISSING)")
+                self.emit(indent, f"if {item} is not MISSING:")
+                self.node(sub_schema, item, path + ["." + _escape(field)], indent + 1)
+            if guard:
+                indent -= 1
+
+        if "minItems" in schema or "items" in schema:
+            guard = "" if type_name == "array" else f"if isinstance({var}, list):"
+            if guard:
+                self.emit(indent, guard)
+                indent += 1
+            if "minItems" in schema:
+                self.emit(indent, f"if len({var}) < {int(schema['minItems'])}:")
+                self.error(indent + 1, path, f"expected at least {int(schema['minItems'])} items")
+            if "items" in schema:
+                index = self.name("i")
+                item = self.name("v")
+                self.emit(indent, f"for {index}, {item} in enumerate({var}):")
+                self.node(schema["items"], item, path + [f"[{{{index}}}]"], indent + 1)
+
+    def _has_checks(self, schema: Dict[str, Any]) -> bool:
+        return any(key in schema for key in ("enum", "pattern", "required", "properties", "minItems", "items"))
+
+
+def _escape(text: str) -> str:
+    """Escape text for use inside a generated double-quoted f-string."""
+    return text.replace("\\", "\\\\").replace('"', '\\"').replace("{", "{{").replace("}", "}}")
+
+
+def compile_schema(schema: Dict[str, Any], root_path: Optional[List[str]] = None) -> Validator:
+    """Compile a JSON schema (the draft-07 subset used by circuit_schema.json) into a validator.
+
+    The schema is walked once, here, and turned into the source of a single
+    Python function with every check and loop inlined, so validating a design
+    is one pass with no schema lookups or per-node calls. Error paths such as
+    blocks[3].inputs[0].signal_type are only formatted when an error occurs.
+    root_path prefixes every error path and may refer to the validator's
+    optional index argument, e.g. ["blocks[{index}]"] for a block sub-schema.
+    """
+    compiler = _SchemaCompiler()
+    compiler.emit(0, "def validate(value, errors, index=0):")
+    compiler.node(schema, "value", list(root_path or []), 1)
+    compiler.emit(1, "return errors")
+
+    namespace = dict(compiler.constants, MISSING=object())
+    exec(compile("\n".join(compiler.lines), "<circuit_schema>", "exec"), namespace)
+    validate = namespace["validate"]
+    validate.source = "\n".join(compiler.lines)
+    return validate
+
+
+def load_schema(path: str = SCHEMA_PATH) -> Dict[str, Any]:
+    """Load the circuit design JSON schema."""
+    with open(path) as f:
+        return json.load(f)
+
+
+# Compiled once at import so every validation reuses it
+_SCHEMA = load_schema()
+validate_schema = compile_schema(_SCHEMA)
+
+# Sub-schema validators used by incremental validation; error paths match validate_schema's
+validate_block_schema = compile_schema(_SCHEMA["properties"]["blocks"]["items"], ["blocks[{index}]"])
+validate_flow_schema = compile_schema(_SCHEMA["properties"]["signal_flow"]["items"], ["signal_flow[{index}]"])
+validate_circuit_info_schema = compile_schema(_SCHEMA["properties"]["circuit_info"], [".circuit_info"])
+
+
+def check_signal_graph(design: Dict[str, Any], strict_ports: bool = False,
+                       detect_cycles: bool = False) -> Dict[str, List[str]]:
+    """Check that signal_flow agrees with the blocks it connects.
+
+    Every edge must leave an output and enter an input of its signal_type, and
+    block ids must be unique. Ports without an edge are reported as warnings,
+    since inputs and outputs often face the outside world (jacks, LEDs); with
+    strict_ports an unconnected required input is an error. With detect_cycles,
+    loops in the non-power signal graph are reported as errors.
+    """
+    errors = []
+    warnings = []
+    blocks = design.get("blocks")
+    signal_flow = design.get("signal_flow")
+    if not isinstance(blocks, list) or not isinstance(signal_flow, list):
+        return {"errors": errors, "warnings": warnings}
+
+    # Index block ports by id in one pass: id -> (input types, output types)
+    ports = {}
+    for i, block in enumerate(blocks):
+        if not isinstance(block, dict) or not isinstance(block.get("id"), str):
+            continue
+        block_id = block["id"]
+        if block_id in ports:
+            errors.append(f"Duplicate block ID: {block_id}")
+            continue
+        ports[block_id] = (
+            {io.get("signal_type") for io in block.get("inputs") or () if isinstance(io, dict)},
+            {io.get("signal_type") for io in block.get("outputs") or () if isinstance(io, dict)}
+        )
+
+    connected_inputs = set()
+    connected_outputs = set()
+    successors = {}
+    for i, flow in enumerate(signal_flow):
+        if not isinstance(flow, dict):
+            continue
+        signal_type = flow.get("signal_type")
+        from_block = flow.get("from_block")
+        to_block = flow.get("to_block")
+
+        if from_block not in ports:
+            errors.append(f"Signal flow {i}: from_block '{from_block}' not found")
+        elif signal_type not in ports[from_block][1]:
+            errors.append(f"Signal flow {i}: block '{from_block}' has no {signal_type} output")
+        else:
+            connected_outputs.add((from_block, signal_type))
+
+        if to_block not in ports:
+            errors.append(f"Signal flow {i}: to_block '{to_block}' not found")
+        elif signal_type not in ports[to_block][0]:
+            errors.append(f"Signal flow {i}: block '{to_block}' has no {signal_type} input")
+        else:
+            connected_inputs.add((to_block, signal_type))
+
+        if detect_cycles and from_block in ports and to_block in ports and not is_power_signal(signal_type):
+            successors.setdefault(from_block, []).append(to_block)
+
+    for block in blocks:
+        if not isinstance(block, dict) or block.get("id") not in ports:
+            continue
+        block_id = block["id"]
+        for io in block.get("inputs") or ():
+            if not isinstance(io, dict) or (block_id, io.get("signal_type")) in connected_inputs:
+                continue
+            message = f"Block {block_id}: input '{io.get('name')}' ({io.get('signal_type')}) is not connected"
+            if strict_ports and io.get("required"):
+                errors.append(message)
+            else:
+                warnings.append(message)
+        for io in block.get("outputs") or ():
+            if isinstance(io, dict) and (block_id, io.get("signal_type")) not in connected_outputs:
+                warnings.append(f"Block {block_id}: output '{io.get('name')}' ({io.get('signal_type')}) is not connected")
+
+    if detect_cycles:
+        cycle = find_cycle(successors)
+        if cycle:
+            errors.append(f"Signal flow contains a cycle: {' -> '.join(cycle)}")
+
+    return {"errors": errors, "warnings": warnings}
+
+
+def is_power_signal(signal_type: Optional[str]) -> bool:
+    """Return True for power rail and ground signal types."""
+    return signal_type == "ground" or (isinstance(signal_type, str) and signal_type.startswith("power_"))
+
+
+def find_cycle(successors: Dict[str, List[str]]) -> Optional[List[str]]:
+    """Return one cycle in a directed graph as a list of node ids, or None (iterative DFS)."""
+    state = {}  # node -> 1 while on the DFS stack, 2 when finished
+    for root in successors:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(successors.get(root, ())))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if state.get(child) == 1:
+                    path = [n for n, _ in stack]
+                    return path[path.index(child):] + [child]
+                if child not in state:
+                    state[child] = 1
+                    stack.append((child, iter(successors.get(child, ()))))
+                    break
+            else:
+                state[node] = 2
+                stack.pop()
+    return None
+
+
+def validate_design(design: Any, strict_ports: bool = False, detect_cycles: bool = False) -> Dict[str, Any]:
+    """Validate a circuit design against the schema and its signal graph."""
+    errors = []
+    validate_schema(design, errors)
+    warnings = []
+    if isinstance(design, dict):
+        graph = check_signal_graph(design, strict_ports=strict_ports, detect_cycles=detect_cycles)
+        errors.extend(graph["errors"])
+        warnings = graph["warnings"]
+    return {"valid": len(errors) == 0, "errors": errors, "warnings": warnings}
+
+
+def score_design(validation: Dict[str, Any]) -> float:
+    """Rank a validation result: every error costs more than any realistic number of warnings.
+
+    Used to pick the best of several candidate designs; higher is better and a
+    valid design without warnings scores 0.
+    """
+    return -(100.0 * len(validation["errors"]) + len(validation["warnings"]))
+
+
+def validate_design_incremental(design: Dict[str, Any], changed_block_ids: Iterable[str],
+                                changed_flow_indices: Iterable[int] = (), circuit_info_changed: bool = False,
+                                strict_ports: bool = False) -> Dict[str, Any]:
+    """Validate only what an edit touched in an otherwise valid design.
+
+    Schema checks run on the changed (or added) blocks, the changed edges and,
+    if it changed, circuit_info. Graph checks run on every edge that touches a
+    changed block (removed block ids included, so dangling edges are caught)
+    and on the changed edges, and port warnings are reported for the changed
+    blocks only. Finding the affected blocks and edges is a single scan of
+    ids, which also catches duplicate ids anywhere in the design; the
+    expensive per-field work is limited to what changed. Cycle
+    detection needs the whole graph and is left to validate_design.
+    """
+    errors = []
+    warnings = []
+    blocks = design.get("blocks")
+    signal_flow = design.get("signal_flow")
+    if not isinstance(blocks, list) or not isinstance(signal_flow, list):
+        return validate_design(design, strict_ports=strict_ports)
+    if not blocks:
+        errors.append("blocks: expected at least 1 items")
+    if circuit_info_changed:
+        if "circuit_info" in design:
+            validate_circuit_info_schema(design["circuit_info"], errors)
+        else:
+            errors.append("design: Missing required field: circuit_info")
+
+    changed = set(changed_block_ids)
+    changed_flows = set(changed_flow_indices)
+    by_id = {}
+    for i, block in enumerate(blocks):
+        block_id = block.get("id") if isinstance(block, dict) else None
+        if block_id in changed or not isinstance(block, dict):
+            validate_block_schema(block, errors, i)
+        # Every id is checked: a copied block is the same object as its source, so it is not "changed"
+        if isinstance(block_id, str):
+            if block_id in by_id:
+                errors.append(f"Duplicate block ID: {block_id}")
+                continue
+            by_id[block_id] = block
+
+    def ports(block_id, key):
+        block = by_id.get(block_id)
+        return {io.get("signal_type") for io in block.get(key) or () if isinstance(io, dict)}
+
+    connected = set()
+    for i, flow in enumerate(signal_flow):
+        touches = isinstance(flow, dict) and (flow.get("from_block") in changed or flow.get("to_block") in changed)
+        if i in changed_flows:
+            validate_flow_schema(flow, errors, i)
+        elif not touches:
+            continue
+        if not isinstance(flow, dict):
+            continue
+        signal_type = flow.get("signal_type")
+        for end, key, label in (("from_block", "outputs", "output"), ("to_block", "inputs", "input")):
+            block_id = flow.get(end)
+            if block_id not in by_id:
+                errors.append(f"Signal flow {i}: {end} '{block_id}' not found")
+            elif signal_type not in ports(block_id, key):
+                errors.append(f"Signal flow {i}: block '{block_id}' has no {signal_type} {label}")
+            else:
+                connected.add((block_id, key, signal_type))
+
+    for block_id in changed:
+        block = by_id.get(block_id)
+        if not isinstance(block, dict):
+            continue
+        for io in block.get("inputs") or ():
+            if isinstance(io, dict) and (block_id, "inputs", io.get("signal_type")) not in connected:
+                message = f"Block {block_id}: input '{io.get('name')}' ({io.get('signal_type')}) is not connected"
+                (errors if strict_ports and io.get("required") else warnings).append(message)
+        for io in block.get("outputs") or ():
+            if isinstance(io, dict) and (block_id, "outputs", io.get("signal_type")) not in connected:
+                warnings.append(f"Block {block_id}: output '{io.get('name')}' ({io.get('signal_type')}) is not connected")
+
+    return {"valid": len(errors) == 0, "errors": errors, "warnings": warnings}
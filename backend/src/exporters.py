@@ -0,0 +1,328 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from batch_validation import Source, load_source
+from design_validator import is_power_signal
+from layout import is_power_block
+
+# Block geometry in the SVG diagram, in the units of block positions
+BLOCK_WIDTH = 180
+BLOCK_HEADER = 30
+PORT_SPACING = 18
+MARGIN = 40
+
+SIGNAL_COLORS = {
+    "audio_signal": "#1f77b4",
+    "cv_signal": "#ff7f0e",
+    "gate_signal": "#2ca02c",
+    "sync_signal": "#9467bd",
+    "power_12v": "#d62728",
+    "power_neg12v": "#8c564b",
+    "power_5v": "#e377c2",
+    "ground": "#7f7f7f"
+}
+DEFAULT_COLOR = "#555555"
+
+# Global nets of the power rails in the netlist; "0" is the SPICE ground node
+POWER_NETS = {"power_12v": "VP12", "power_neg12v": "VN12", "power_5v": "VP5", "ground": "0"}
+
+# Exported text is yielded in pieces of about this many characters
+CHUNK_CHARS = 64 * 1024
+
+
+def _blocks(design: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [b for b in design.get("blocks") or [] if isinstance(b, dict) and isinstance(b.get("id"), str)]
+
+
+def _flows(design: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    return (f for f in design.get("signal_flow") or [] if isinstance(f, dict))
+
+
+def _ports(block: Dict[str, Any], side: str) -> List[Dict[str, Any]]:
+    return [p for p in block.get(side) or [] if isinstance(p, dict)]
+
+
+class _PortMatcher:
+    """Assigns each signal_flow edge to a port of its block by signal_type.
+
+    Edges of one type go to that type's ports in turn, so a block with two
+    audio inputs gets one edge on each; -1 means the block has no such port.
+    """
+
+    def __init__(self, blocks: Iterable[Dict[str, Any]], side: str):
+        self._ports = {}
+        for block in blocks:
+            by_type = {}
+            for i, port in enumerate(_ports(block, side)):
+                by_type.setdefault(port.get("signal_type"), []).append(i)
+            self._ports[block["id"]] = by_type
+        self._used = {}
+
+    def next(self, block_id: str, signal_type: str) -> int:
+        indices = self._ports.get(block_id, {}).get(signal_type)
+        if not indices:
+            return -1
+        key = (block_id, signal_type)
+        count = self._used.get(key, 0)
+        self._used[key] = count + 1
+        return indices[count % len(indices)]
+
+
+def chunked(pieces: Iterable[str], size: int = CHUNK_CHARS) -> Iterator[str]:
+    """Join small pieces of text into chunks of about size characters."""
+    buffer = []
+    length = 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def iter_svg(design: Dict[str, Any], include_power: bool = True) -> Iterator[str]:
+    """Render a design as an SVG block diagram, one element at a time.
+
+    Blocks are drawn at their positions with inputs on the left edge and
+    outputs on the right; each signal_flow edge is a curve from the output
+    port to the input port of its signal_type, colored by type (power edges
+    dashed, or left out without include_power).
+    """
+    blocks = _blocks(design)
+    geometry = {}  # block id -> (x, y, height)
+    min_x = min_y = float("inf")
+    max_x = max_y = float("-inf")
+    for block in blocks:
+        position = block.get("position") or {}
+        x, y = float(position.get("x", 0) or 0), float(position.get("y", 0) or 0)
+        rows = max(len(_ports(block, "inputs")), len(_ports(block, "outputs")), 1)
+        height = BLOCK_HEADER + rows * PORT_SPACING
+        geometry[block["id"]] = (x, y, height)
+        min_x, min_y = min(min_x, x), min(min_y, y)
+        max_x, max_y = max(max_x, x + BLOCK_WIDTH), max(max_y, y + height)
+    if not blocks:
+        min_x = min_y = max_x = max_y = 0.0
+
+    info = design.get("circuit_info") or {}
+    width, height = max_x - min_x + 2 * MARGIN, max_y - min_y + 2 * MARGIN
+    yield (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{min_x - MARGIN:g} {min_y - MARGIN:g} {width:g} {height:g}" '
+           f'width="{width:g}" height="{height:g}" font-family="sans-serif" font-size="11">\n')
+    yield f"<title>{escape(str(info.get('name', 'Circuit design')))}</title>\n"
+    yield '<g class="signal-flow" fill="none" stroke-width="1.5">\n'
+    outputs = _PortMatcher(blocks, "outputs")
+    inputs = _PortMatcher(blocks, "inputs")
+    for flow in _flows(design):
+        source, target = geometry.get(flow.get("from_block")), geometry.get(flow.get("to_block"))
+        signal_type = flow.get("signal_type")
+        if source is None or target is None or (is_power_signal(signal_type) and not include_power):
+            continue
+        out_index = outputs.next(flow["from_block"], signal_type)
+        in_index = inputs.next(flow["to_block"], signal_type)
+        x1 = source[0] + BLOCK_WIDTH
+        y1 = source[1] + (BLOCK_HEADER + (out_index + 0.5) * PORT_SPACING if out_index >= 0 else source[2] / 2)
+        x2 = target[0]
+        y2 = target[1] + (BLOCK_HEADER + (in_index + 0.5) * PORT_SPACING if in_index >= 0 else target[2] / 2)
+        bend = max(40.0, abs(x2 - x1) / 2)
+        dash = ' stroke-dasharray="4 3" stroke-opacity="0.5"' if is_power_signal(signal_type) else ""
+        title = escape(f"{flow.get('from_block')} -> {flow.get('to_block')}: {signal_type}")
+        yield (f'<path d="M{x1:g},{y1:g} C{x1 + bend:g},{y1:g} {x2 - bend:g},{y2:g} {x2:g},{y2:g}" '
+               f'stroke="{SIGNAL_COLORS.get(signal_type, DEFAULT_COLOR)}"{dash}><title>{title}</title></path>\n')
+    yield "</g>\n"
+
+    for block in blocks:
+        x, y, block_height = geometry[block["id"]]
+        yield f'<g class="block" id={quoteattr(block["id"])}>\n'
+        yield (f'<rect x="{x:g}" y="{y:g}" width="{BLOCK_WIDTH}" height="{block_height:g}" rx="6" '
+               f'fill="#ffffff" stroke="#333333"><title>{escape(str(block.get("function", "")))}</title></rect>\n')
+        yield (f'<text x="{x + BLOCK_WIDTH / 2:g}" y="{y + 19:g}" text-anchor="middle" font-weight="bold">'
+               f'{escape(str(block.get("name", block["id"])))}</text>\n')
+        for side, port_x, anchor, dx in (("inputs", x, "start", 8), ("outputs", x + BLOCK_WIDTH, "end", -8)):
+            for i, port in enumerate(_ports(block, side)):
+                port_y = y + BLOCK_HEADER + (i + 0.5) * PORT_SPACING
+                color = SIGNAL_COLORS.get(port.get("signal_type"), DEFAULT_COLOR)
+                yield (f'<circle cx="{port_x:g}" cy="{port_y:g}" r="4" fill="{color}"/>'
+                       f'<text x="{port_x + dx:g}" y="{port_y + 4:g}" text-anchor="{anchor}">'
+                       f'{escape(str(port.get("name", "")))}</text>\n')
+        yield "</g>\n"
+    yield "</svg>\n"
+
+
+def _dot_id(value: Any) -> str:
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+def iter_dot(design: Dict[str, Any], include_power: bool = True) -> Iterator[str]:
+    """Render a design as a GraphViz DOT digraph, one statement at a time.
+
+    Edges are labeled and colored by signal_type; power blocks are ranked
+    together at the bottom and power edges are dashed (or left out).
+    """
+    info = design.get("circuit_info") or {}
+    yield f"digraph {_dot_id(info.get('name', 'circuit'))} {{\n"
+    yield "  rankdir=LR;\n  node [shape=box, style=rounded, fontname=\"sans-serif\"];\n  edge [fontname=\"sans-serif\", fontsize=9];\n"
+    power_ids = []
+    for block in _blocks(design):
+        if is_power_block(block):
+            power_ids.append(block["id"])
+        label = str(block.get("name", block["id"]))
+        yield f"  {_dot_id(block['id'])} [label={_dot_id(label)}, tooltip={_dot_id(block.get('function', ''))}];\n"
+    if power_ids:
+        yield "  { rank=sink; " + " ".join(_dot_id(block_id) for block_id in power_ids) + "; }\n"
+    for flow in _flows(design):
+        signal_type = flow.get("signal_type")
+        if is_power_signal(signal_type) and not include_power:
+            continue
+        style = ", style=dashed" if is_power_signal(signal_type) else ""
+        color = SIGNAL_COLORS.get(signal_type, DEFAULT_COLOR)
+        yield (f"  {_dot_id(flow.get('from_block'))} -> {_dot_id(flow.get('to_block'))} "
+               f"[label={_dot_id(signal_type)}, color=\"{color}\"{style}];\n")
+    yield "}\n"
+
+
+def _spice_name(value: Any) -> str:
+    return re.sub(r"[^A-Za-z0-9_]", "_", str(value)) or "_"
+
+
+def iter_netlist(design: Dict[str, Any], include_power: bool = True) -> Iterator[str]:
+    """Render a design as a SPICE-style block netlist, one block at a time.
+
+    Every block is a subcircuit (a stub listing its pins) and an instance
+    whose pins are its inputs then its outputs. An output drives the net
+    N_<block>_<output>, which every input connected to it by signal_flow
+    shares; power pins sit on the global rail nets (ground is node 0) and
+    unconnected inputs on their own NC_ nets. Supply pins are always wired,
+    so include_power has no effect here.
+    """
+    blocks = _blocks(design)
+    info = design.get("circuit_info") or {}
+    yield f"* {info.get('name', 'Circuit design')} - block netlist\n"
+    if info.get("supply_voltage"):
+        yield f"* Supply: {info['supply_voltage']}\n"
+    yield "* Block subcircuits are stubs: pins and function only\n\n"
+
+    # Which output net feeds each input, matched by signal_type like the diagram
+    outputs = _PortMatcher(blocks, "outputs")
+    inputs = _PortMatcher(blocks, "inputs")
+    input_nets = {}  # (block id, input index) -> net
+    for flow in _flows(design):
+        signal_type = flow.get("signal_type")
+        if is_power_signal(signal_type):
+            continue
+        out_index = outputs.next(flow.get("from_block"), signal_type)
+        in_index = inputs.next(flow.get("to_block"), signal_type)
+        if out_index >= 0 and in_index >= 0:
+            input_nets[(flow["to_block"], in_index)] = f"N_{_spice_name(flow['from_block'])}_{out_index}"
+
+    for block in blocks:
+        name = _spice_name(block["id"]).upper()
+        pins = []
+        nets = []
+        for i, port in enumerate(_ports(block, "inputs")):
+            pins.append(f"IN{i}_{_spice_name(port.get('signal_type'))}")
+            nets.append(POWER_NETS.get(port.get("signal_type")) or input_nets.get(
+                (block["id"], i), f"NC_{_spice_name(block['id'])}_{i}"))
+        for i, port in enumerate(_ports(block, "outputs")):
+            pins.append(f"OUT{i}_{_spice_name(port.get('signal_type'))}")
+            nets.append(POWER_NETS.get(port.get("signal_type")) or f"N_{_spice_name(block['id'])}_{i}")
+        function = " ".join(str(block.get("function", "")).split())
+        yield f"* {block.get('name', block['id'])}: {function}\n"
+        yield f".SUBCKT {name} {' '.join(pins)}\n.ENDS {name}\n"
+        yield f"X{_spice_name(block['id'])} {' '.join(nets)} {name}\n\n"
+    yield ".END\n"
+
+
+def iter_json(design: Dict[str, Any], include_power: bool = True) -> Iterator[str]:
+    """Render a design as indented JSON, encoded piece by piece."""
+    return json.JSONEncoder(indent=2, ensure_ascii=False).iterencode(design)
+
+
+# format -> (writer, media type, file extension)
+EXPORTERS: Dict[str, Tuple[Callable[..., Iterator[str]], str, str]] = {
+    "svg": (iter_svg, "image/svg+xml", ".svg"),
+    "dot": (iter_dot, "text/vnd.graphviz", ".dot"),
+    "netlist": (iter_netlist, "text/plain", ".cir"),
+    "json": (iter_json, "application/json", ".json")
+}
+
+
+def export_design(design: Dict[str, Any], fmt: str, include_power: bool = True) -> Iterator[str]:
+    """Stream a design in one of EXPORTERS' formats as chunks of text."""
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Unknown export format: {fmt} (expected one of {', '.join(EXPORTERS)})")
+    return chunked(EXPORTERS[fmt][0](design, include_power=include_power))
+
+
+def write_export(design: Dict[str, Any], fmt: str, output: TextIO, include_power: bool = True) -> int:
+    """Write a design in the given format to a text file; returns the characters written."""
+    written = 0
+    for chunk in export_design(design, fmt, include_power):
+        output.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def export_source(source: Source, output_stem: str, formats: List[str], include_power: bool = True) -> List[Dict[str, Any]]:
+    """Load one design source and write it to output_stem plus each format's extension.
+
+    The unit of work of batch exports, run in pool workers, so errors are
+    reported in the result records instead of raised. Files are written
+    atomically.
+    """
+    start = time.perf_counter()
+    try:
+        design = load_source(source)
+        if not isinstance(design, dict):
+            raise ValueError("design is not a JSON object")
+    except (OSError, ValueError) as e:
+        return [{"source": source[1], "format": fmt, "ok": False, "error": f"Could not load design: {e}"} for fmt in formats]
+
+    results = []
+    for fmt in formats:
+        output_path = output_stem + EXPORTERS[fmt][2]
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                written = write_export(design, fmt, f, include_power)
+            os.replace(tmp_path, output_path)
+        except OSError as e:
+            results.append({"source": source[1], "format": fmt, "output": output_path, "ok": False, "error": str(e)})
+            continue
+        results.append({"source": source[1], "format": fmt, "output": output_path, "ok": True, "chars": written})
+    for result in results:
+        result["export_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return results
+
+
+def export_corpus(jobs: Iterable[Tuple[Source, str]], formats: List[str], workers: Optional[int] = None,
+                  include_power: bool = True) -> Iterator[Dict[str, Any]]:
+    """Export (source, output stem) jobs on a process pool, yielding result records as designs finish.
+
+    As with validate_corpus, only a few designs per worker are in flight, so
+    memory stays bounded however many designs there are.
+    """
+    unknown = [fmt for fmt in formats if fmt not in EXPORTERS]
+    if unknown:
+        raise ValueError(f"Unknown export format: {', '.join(unknown)} (expected one of {', '.join(EXPORTERS)})")
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 4
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for source, output_stem in jobs:
+            pending.add(pool.submit(export_source, source, output_stem, formats, include_power))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
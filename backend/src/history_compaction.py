@@ -0,0 +1,124 @@
+import json
+import re
+from typing import Any, Dict, List
+
+# Word runs, digit runs and punctuation runs; each costs about one token per few characters
+_TOKEN_PIECES = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]+")
+
+# Spec fragments pulled out of the user's answers into user_requirements
+_VOLTAGE = re.compile(r"[±+-]?\s?\d+(?:\.\d+)?\s?V\b(?!/)")
+_FREQUENCY = re.compile(r"\d+(?:\.\d+)?\s?[kKM]?Hz(?:\s?(?:-|to|–)\s?\d+(?:\.\d+)?\s?[kKM]?Hz)?")
+_SIGNAL_WORDS = {
+    "audio_signal": ("audio",),
+    "cv_signal": ("cv", "control voltage", "v/oct", "1v/oct"),
+    "gate_signal": ("gate", "trigger"),
+    "sync_signal": ("sync",)
+}
+
+# Longest answer and number of most recent answers kept verbatim in the summary
+MAX_ANSWER_CHARS = 500
+MAX_ANSWERS = 10
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of text locally, without a tokenizer or API call.
+
+    Counts letter runs (one token per 4 characters, at least one), digit runs
+    (one per 3 digits) and punctuation runs (one per 2 characters, since BPE
+    merges common sequences such as '": "'). That is close enough to a real
+    tokenizer on English prose and JSON to enforce a prompt budget before the
+    request is sent.
+    """
+    if not text:
+        return 0
+    tokens = 0
+    for piece in _TOKEN_PIECES.findall(text):
+        if piece.isalpha():
+            tokens += (len(piece) + 3) // 4
+        elif piece.isdigit():
+            tokens += (len(piece) + 2) // 3
+        else:
+            tokens += (len(piece) + 1) // 2
+    return tokens
+
+
+def estimate_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Estimate the prompt tokens of a list of messages, including per-message overhead."""
+    total = 0
+    for message in messages:
+        content = message.get("content")
+        text = content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+        total += estimate_tokens(text) + 4
+    return total
+
+
+def update_requirements(requirements: Dict[str, Any], question: str, answer: str) -> Dict[str, Any]:
+    """Fold one user answer into the structured user_requirements summary.
+
+    The latest answers are kept (truncated) together with any supply
+    voltages, frequencies and signal types they mention. The question is not
+    kept: the agent's turns are the long ones and the summary only needs what
+    the user decided.
+    """
+    answers = requirements.setdefault("answers", [])
+    answers.append(answer if len(answer) <= MAX_ANSWER_CHARS else answer[:MAX_ANSWER_CHARS] + "...")
+    del answers[:-MAX_ANSWERS]
+
+    voltages = [v.replace(" ", "") for v in _VOLTAGE.findall(answer)]
+    if voltages:
+        requirements["supply_voltage"] = " ".join(dict.fromkeys(voltages))
+    frequencies = _FREQUENCY.findall(answer)
+    if frequencies:
+        requirements["frequency"] = list(dict.fromkeys(requirements.get("frequency", []) + frequencies))
+
+    lowered = answer.lower()
+    signals = [s for s, words in _SIGNAL_WORDS.items() if any(w in lowered for w in words)]
+    if signals:
+        requirements["signals"] = sorted(set(requirements.get("signals", [])) | set(signals))
+    if question:
+        requirements["questions_answered"] = requirements.get("questions_answered", 0) + 1
+    return requirements
+
+
+def summary_message(requirements: Dict[str, Any]) -> Dict[str, str]:
+    """Build the user message that stands in for the compacted turns."""
+    return {
+        "role": "user",
+        "content": "Summary of my requirements from our earlier conversation:\n" + json.dumps(requirements, indent=1, ensure_ascii=False)
+    }
+
+
+def compact_history(history: List[Dict[str, str]], requirements: Dict[str, Any], budget_tokens: int,
+                    reserved_tokens: int = 0, keep_recent: int = 2) -> List[Dict[str, str]]:
+    """Replace the oldest turns with a requirements summary once history exceeds its budget.
+
+    reserved_tokens covers what else goes into the prompt (system prompt,
+    final instruction). When compaction triggers, history is cut to about half
+    the budget rather than just under it, so it stays unchanged (and prompt
+    cache friendly) for several turns before compacting again. The last
+    keep_recent messages are always kept, and the kept part starts on an
+    assistant turn where possible so roles keep alternating after the summary.
+    """
+    available = budget_tokens - reserved_tokens
+    if not history or estimate_message_tokens(history) <= available:
+        return history
+
+    summary = summary_message(requirements)
+    target = max(available // 2, 0) - estimate_message_tokens([summary])
+    sizes = [estimate_message_tokens([m]) for m in history]
+
+    # Walk back from the newest turn while it fits the target
+    start = len(history)
+    kept = 0
+    while start > 0 and (len(history) - start < keep_recent or kept + sizes[start - 1] <= target):
+        start -= 1
+        kept += sizes[start]
+    while start < len(history) and history[start]["role"] != "assistant" and len(history) - start > keep_recent:
+        start += 1
+    if start == 0:
+        return history
+    kept_turns = history[start:]
+    if kept_turns[0]["role"] == "user":
+        # Merge into the kept user turn rather than sending two user turns in a row
+        return [{"role": "user", "content": summary["content"] + "\n\n" + kept_turns[0]["content"]}] + kept_turns[1:]
+    return [summary] + kept_turns
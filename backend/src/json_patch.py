@@ -0,0 +1,161 @@
+from typing import Any, Dict, List, Tuple
+
+
+class JsonPatchError(ValueError):
+    """Raised when a JSON Patch operation cannot be applied."""
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    """Split an RFC 6901 JSON Pointer into unescaped reference tokens."""
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def apply_patch(document: Any, operations: List[Dict[str, Any]]) -> Any:
+    """Apply an RFC 6902 JSON Patch and return the patched document.
+
+    The input is never modified: only the containers along each operation's
+    path are copied, so patching one block of a large design does not copy
+    the other blocks.
+    """
+    for i, operation in enumerate(operations):
+        try:
+            document = _apply_operation(document, operation)
+        except JsonPatchError as e:
+            raise JsonPatchError(f"Operation {i} ({operation.get('op')} {operation.get('path')}): {e}")
+    return document
+
+
+def affected_paths(operations: List[Dict[str, Any]]) -> List[List[str]]:
+    """Return the parsed paths (and move/copy sources) touched by a patch."""
+    paths = []
+    for operation in operations:
+        paths.append(parse_pointer(operation.get("path", "")))
+        if operation.get("op") in ("move", "copy"):
+            paths.append(parse_pointer(operation.get("from", "")))
+    return paths
+
+
+def _apply_operation(document: Any, operation: Dict[str, Any]) -> Any:
+    op = operation.get("op")
+    if "path" not in operation:
+        raise JsonPatchError("missing 'path'")
+    path = parse_pointer(operation["path"])
+
+    if op == "add":
+        return _add(document, path, _value(operation))
+    if op == "remove":
+        return _remove(document, path)[0]
+    if op == "replace":
+        if not path:
+            # Replacing the root swaps the whole document (RFC 6902)
+            return _value(operation)
+        document, _ = _remove(document, path)
+        return _add(document, path, _value(operation))
+    if op == "move":
+        from_path = parse_pointer(operation.get("from", ""))
+        if path[:len(from_path)] == from_path and path != from_path:
+            raise JsonPatchError("cannot move a value into itself")
+        document, value = _remove(document, from_path)
+        return _add(document, path, value)
+    if op == "copy":
+        return _add(document, path, _get(document, parse_pointer(operation.get("from", ""))))
+    if op == "test":
+        if _get(document, path) != _value(operation):
+            raise JsonPatchError("test failed")
+        return document
+    raise JsonPatchError(f"unknown op {op!r}")
+
+
+def _value(operation: Dict[str, Any]) -> Any:
+    if "value" not in operation:
+        raise JsonPatchError("missing 'value'")
+    return operation["value"]
+
+
+def _get(document: Any, path: List[str]) -> Any:
+    for token in path:
+        document = _child(document, token)
+    return document
+
+
+def _child(container: Any, token: str) -> Any:
+    if isinstance(container, dict):
+        if token not in container:
+            raise JsonPatchError(f"no member {token!r}")
+        return container[token]
+    if isinstance(container, list):
+        return container[_index(container, token)]
+    raise JsonPatchError(f"cannot index into {type(container).__name__}")
+
+
+def _index(array: List[Any], token: str, allow_end: bool = False) -> int:
+    if token == "-" and allow_end:
+        return len(array)
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise JsonPatchError(f"invalid array index {token!r}")
+    index = int(token)
+    if index > len(array) or (index == len(array) and not allow_end):
+        raise JsonPatchError(f"array index {index} out of range")
+    return index
+
+
+def _copy_path(document: Any, path: List[str]) -> Tuple[Any, Any]:
+    """Shallow-copy the containers from the root to the parent of path; return (root, parent)."""
+    root = _shallow_copy(document)
+    parent = root
+    for token in path[:-1]:
+        if isinstance(parent, dict):
+            if token not in parent:
+                raise JsonPatchError(f"no member {token!r}")
+            child = _shallow_copy(parent[token])
+            parent[token] = child
+        elif isinstance(parent, list):
+            index = _index(parent, token)
+            child = _shallow_copy(parent[index])
+            parent[index] = child
+        else:
+            raise JsonPatchError(f"cannot index into {type(parent).__name__}")
+        parent = child
+    return root, parent
+
+
+def _shallow_copy(value: Any) -> Any:
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+def _add(document: Any, path: List[str], value: Any) -> Any:
+    if not path:
+        return value
+    root, parent = _copy_path(document, path)
+    token = path[-1]
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, token, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"cannot add to {type(parent).__name__}")
+    return root
+
+
+def _remove(document: Any, path: List[str]) -> Tuple[Any, Any]:
+    if not path:
+        raise JsonPatchError("cannot remove the whole document")
+    root, parent = _copy_path(document, path)
+    token = path[-1]
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"no member {token!r}")
+        value = parent.pop(token)
+    elif isinstance(parent, list):
+        value = parent.pop(_index(parent, token))
+    else:
+        raise JsonPatchError(f"cannot remove from {type(parent).__name__}")
+    return root, value
@@ -0,0 +1,102 @@
+from typing import List, Optional, Tuple
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """Return the first top-level JSON object in text, or everything after its '{' if it never closes.
+
+    Scans with string/escape awareness, so braces inside strings, code fences
+    and prose around the JSON do not confuse it the way find('{')/rfind('}') does.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == "{" or c == "[":
+            depth += 1
+        elif c == "}" or c == "]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def repair_json(text: str) -> str:
+    """Repair common defects in LLM-produced JSON.
+
+    Removes trailing commas before a closing bracket and, when the text was cut
+    off (for example by max_tokens), drops the incomplete trailing value and
+    closes every open string, array and object. The result may still be
+    invalid JSON if the damage is elsewhere; callers should try to parse it.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escape = False
+    # Last place the text could be cut and closed cleanly: (output length, open containers)
+    safe_point: Optional[Tuple[int, Tuple[str, ...]]] = None
+
+    for c in text:
+        if in_string:
+            out.append(c)
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+            continue
+
+        if c == '"':
+            in_string = True
+        elif c == "{" or c == "[":
+            stack.append(c)
+            out.append(c)
+            safe_point = (len(out), tuple(stack))  # an empty container is complete too
+            continue
+        elif c == "}" or c == "]":
+            _strip_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(c)
+            safe_point = (len(out), tuple(stack))
+            if not stack:
+                break
+            continue
+        elif c == "," and stack:
+            safe_point = (len(out), tuple(stack))
+        out.append(c)
+
+    if not stack:
+        return "".join(out)
+
+    # Truncated: cut back to the last complete value and close what is still open
+    length, open_containers = safe_point
+    out = out[:length]
+    _strip_trailing_comma(out)
+    out.extend(_CLOSERS[c] for c in reversed(open_containers))
+    return "".join(out)
+
+
+def _strip_trailing_comma(out: List[str]) -> None:
+    """Remove a trailing comma (and the whitespace after it) from the output."""
+    i = len(out) - 1
+    while i >= 0 and out[i] in " \t\r\n":
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i:]
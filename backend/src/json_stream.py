@@ -0,0 +1,93 @@
+import json
+from typing import List, Tuple, Any
+
+
+class IncrementalDesignParser:
+    """Incremental parser for circuit design JSON arriving in chunks.
+
+    Feed it text as the model streams it. It scans each character once, tracking
+    string/escape state and the stack of open containers, and emits every
+    complete `circuit_info` object, `blocks[]` entry and `signal_flow[]` edge as
+    soon as its closing brace arrives. Text before the first '{' (such as a code
+    fence) is ignored.
+    """
+
+    # Top-level arrays whose elements are emitted one by one, and their event names
+    ARRAY_EVENTS = {"blocks": "block", "signal_flow": "signal_flow"}
+
+    def __init__(self):
+        self.buffer = ""
+        self.complete = False
+        self._pos = 0
+        self._started = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = None
+        self._pending_key = None
+        self._stack = []  # (container char, key in parent object, start index)
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk and return the (event, object) pairs it completed."""
+        self.buffer += text
+        events = []
+        buffer = self.buffer
+
+        for i in range(self._pos, len(buffer)):
+            c = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = (self._string_start, i + 1)
+                continue
+
+            if self.complete:
+                break
+
+            if not self._started:
+                if c == "{":
+                    self._started = True
+                    self._stack.append(("{", None, i))
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c == ":":
+                if self._stack[-1][0] == "{" and self._last_string:
+                    self._pending_key = json.loads(buffer[self._last_string[0]:self._last_string[1]])
+            elif c == "{" or c == "[":
+                key = self._pending_key if self._stack[-1][0] == "{" else None
+                self._stack.append((c, key, i))
+                self._pending_key = None
+            elif c == "}" or c == "]":
+                opener, key, start = self._stack.pop()
+                event = self._event_for(opener, key)
+                if event:
+                    try:
+                        events.append((event, json.loads(buffer[start:i + 1])))
+                    except json.JSONDecodeError:
+                        pass
+                if not self._stack:
+                    self.complete = True
+            elif c == ",":
+                self._pending_key = None
+
+        self._pos = len(buffer)
+        return events
+
+    def _event_for(self, opener: str, key: Any):
+        """Return the event name for a container that just closed, if any."""
+        if opener != "{":
+            return None
+        depth = len(self._stack)
+        if depth == 1 and key == "circuit_info":
+            return "circuit_info"
+        if depth == 2 and self._stack[1][0] == "[":
+            return self.ARRAY_EVENTS.get(self._stack[1][1])
+        return None
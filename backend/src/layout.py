@@ -0,0 +1,277 @@
+from typing import Any, Dict, Iterable, List, Tuple
+
+from design_validator import is_power_signal
+
+# Horizontal distance between layers and minimum vertical distance between blocks
+LAYER_SPACING = 300
+ROW_SPACING = 120
+
+# Barycenter sweeps (one down, one up each) used for crossing minimization
+CROSSING_SWEEPS = 4
+
+
+def is_power_block(block: Dict[str, Any]) -> bool:
+    """Return True for blocks whose outputs are all power rails or ground (supplies, regulators)."""
+    outputs = block.get("outputs") or []
+    return bool(outputs) and all(is_power_signal(o.get("signal_type")) for o in outputs if isinstance(o, dict))
+
+
+def signal_edges(signal_flow: Iterable[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """Return the (from_block, to_block) pairs of the non-power signal_flow edges."""
+    return [
+        (flow.get("from_block"), flow.get("to_block"))
+        for flow in signal_flow
+        if isinstance(flow, dict) and not is_power_signal(flow.get("signal_type"))
+    ]
+
+
+def layout_design(blocks: List[Dict[str, Any]], signal_flow: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Compute left-to-right layered (Sugiyama-style) positions for every block id.
+
+    Signal blocks are layered from signal_flow, ordered to reduce edge crossings
+    and given coordinates that keep edges straight. Power blocks, which would
+    otherwise connect to everything, sit on their own row below the diagram.
+    """
+    ids = [b["id"] for b in blocks if isinstance(b, dict) and isinstance(b.get("id"), str)]
+    power_ids = {b["id"] for b in blocks if isinstance(b, dict) and isinstance(b.get("id"), str) and is_power_block(b)}
+    signal_ids = [i for i in ids if i not in power_ids]
+
+    coords = layered_layout(signal_ids, signal_edges(signal_flow))
+    positions = {node: {"x": x, "y": y} for node, (x, y) in coords.items()}
+
+    power_y = (max((p["y"] for p in positions.values()), default=-ROW_SPACING)) + 2 * ROW_SPACING
+    for i, block_id in enumerate(i for i in ids if i in power_ids):
+        positions[block_id] = {"x": i * LAYER_SPACING, "y": power_y}
+    return positions
+
+
+def layered_layout(node_ids: List[str], edges: List[Tuple[str, str]]) -> Dict[str, Tuple[float, float]]:
+    """Sugiyama layout of a directed graph: cycle breaking, layering, crossing reduction, coordinates.
+
+    Every step is linear in nodes plus edges (plus the dummy nodes inserted on
+    long edges), apart from sorting each layer during the barycenter sweeps.
+    """
+    n = len(node_ids)
+    if n == 0:
+        return {}
+    index = {node: i for i, node in enumerate(node_ids)}
+
+    # Deduplicated adjacency over node indices, ignoring self loops and unknown ids
+    successors = [[] for _ in range(n)]
+    seen = set()
+    for u, v in edges:
+        if u in index and v in index and u != v and (index[u], index[v]) not in seen:
+            seen.add((index[u], index[v]))
+            successors[index[u]].append(index[v])
+
+    successors = _break_cycles(successors)
+    layers = _assign_layers(successors)
+    order, up, down = _minimize_crossings(successors, layers)
+    ys = _assign_coordinates(order, up, down)
+
+    return {node_ids[i]: (layers[i] * LAYER_SPACING, round(ys[i])) for i in range(n)}
+
+
+def _break_cycles(successors: List[List[int]]) -> List[List[int]]:
+    """Reverse the back edges found by an iterative DFS so the graph becomes acyclic."""
+    n = len(successors)
+    state = [0] * n  # 0 unvisited, 1 on stack, 2 done
+    acyclic = [[] for _ in range(n)]
+    for root in range(n):
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, 0)]
+        while stack:
+            node, i = stack[-1]
+            if i < len(successors[node]):
+                stack[-1] = (node, i + 1)
+                child = successors[node][i]
+                if state[child] == 1:
+                    acyclic[child].append(node)  # back edge: reverse it
+                else:
+                    acyclic[node].append(child)
+                    if state[child] == 0:
+                        state[child] = 1
+                        stack.append((child, 0))
+            else:
+                state[node] = 2
+                stack.pop()
+    return acyclic
+
+
+def _assign_layers(successors: List[List[int]]) -> List[int]:
+    """Longest-path layering, then pull source nodes next to their first consumer."""
+    n = len(successors)
+    in_degree = [0] * n
+    for children in successors:
+        for child in children:
+            in_degree[child] += 1
+
+    topo = [i for i in range(n) if in_degree[i] == 0]
+    layers = [0] * n
+    for node in topo:  # topo grows while iterating (Kahn's algorithm)
+        for child in successors[node]:
+            layers[child] = max(layers[child], layers[node] + 1)
+            in_degree[child] -= 1
+            if in_degree[child] == 0:
+                topo.append(child)
+
+    # Sources such as CV inputs otherwise all land in layer 0 with long edges
+    has_predecessor = [False] * n
+    for children in successors:
+        for child in children:
+            has_predecessor[child] = True
+    for node in reversed(topo):
+        if not has_predecessor[node] and successors[node]:
+            layers[node] = min(layers[child] for child in successors[node]) - 1
+    return layers
+
+
+def _minimize_crossings(successors: List[List[int]], layers: List[int]):
+    """Order nodes within layers with barycenter sweeps.
+
+    Edges spanning several layers are split with dummy nodes (indices >= n) so
+    every edge joins adjacent layers. Returns the order of each layer and the
+    upper/lower neighbors of every node, dummies included.
+    """
+    n = len(successors)
+    up = [[] for _ in range(n)]
+    down = [[] for _ in range(n)]
+    node_layer = list(layers)
+
+    for u in range(n):
+        for v in successors[u]:
+            prev = u
+            for layer in range(layers[u] + 1, layers[v]):
+                dummy = len(node_layer)
+                node_layer.append(layer)
+                up.append([prev])
+                down.append([])
+                down[prev].append(dummy)
+                prev = dummy
+            down[prev].append(v)
+            up[v].append(prev)
+
+    layer_count = max(node_layer) + 1
+    order = [[] for _ in range(layer_count)]
+    for node, layer in enumerate(node_layer):
+        order[layer].append(node)
+    position = [0.0] * len(node_layer)
+    for nodes in order:
+        for i, node in enumerate(nodes):
+            position[node] = i
+
+    def sweep(layer_range, neighbors):
+        for layer in layer_range:
+            nodes = order[layer]
+            keys = {}
+            for node in nodes:
+                adjacent = neighbors[node]
+                keys[node] = sum(position[a] for a in adjacent) / len(adjacent) if adjacent else position[node]
+            nodes.sort(key=keys.__getitem__)
+            for i, node in enumerate(nodes):
+                position[node] = i
+
+    for _ in range(CROSSING_SWEEPS):
+        sweep(range(1, layer_count), up)
+        sweep(range(layer_count - 2, -1, -1), down)
+
+    return order, up, down
+
+
+def _assign_coordinates(order: List[List[int]], up: List[List[int]], down: List[List[int]]) -> List[float]:
+    """Place nodes at the mean y of their neighbors while keeping order and ROW_SPACING.
+
+    Dummy nodes take part so long edges stay straight; callers read only the
+    entries of real nodes.
+    """
+    y = [0.0] * len(up)
+    for nodes in order:
+        for i, node in enumerate(nodes):
+            y[node] = i * ROW_SPACING
+
+    for _ in range(2):
+        for nodes in order:
+            desired = []
+            for node in nodes:
+                adjacent = up[node] + down[node]
+                desired.append(sum(y[a] for a in adjacent) / len(adjacent) if adjacent else y[node])
+            # Forward pass enforces spacing, then the layer is shifted back toward its targets
+            placed = []
+            for target in desired:
+                placed.append(max(target, placed[-1] + ROW_SPACING) if placed else target)
+            shift = sum(t - p for t, p in zip(desired, placed)) / len(placed)
+            for node, value in zip(nodes, placed):
+                y[node] = value + min(shift, 0.0)
+
+    top = min(y)
+    return [value - top for value in y]
+
+
+def place_new_blocks(positions: Dict[str, Dict[str, float]], blocks: List[Dict[str, Any]],
+                     signal_flow: List[Dict[str, Any]], new_ids: Iterable[str]) -> Dict[str, Dict[str, float]]:
+    """Incrementally position new blocks without moving the existing ones.
+
+    Each new block goes one layer right of its rightmost upstream neighbor (or
+    left of its downstream ones), at the mean height of its neighbors, nudged
+    to the nearest free slot in that column. If that would put it left of the
+    diagram, the whole diagram is shifted right instead.
+    """
+    positions = {block_id: dict(p) for block_id, p in positions.items()}
+    power_ids = {b.get("id") for b in blocks if isinstance(b, dict) and is_power_block(b)}
+    predecessors = {}
+    successors = {}
+    for u, v in signal_edges(signal_flow):
+        successors.setdefault(u, []).append(v)
+        predecessors.setdefault(v, []).append(u)
+
+    for block_id in new_ids:
+        if block_id in power_ids:
+            power_row = [p for b, p in positions.items() if b in power_ids]
+            y = power_row[0]["y"] if power_row else max((p["y"] for p in positions.values()), default=0) + 2 * ROW_SPACING
+            x = max((p["x"] for p in power_row), default=-LAYER_SPACING) + LAYER_SPACING
+            positions[block_id] = {"x": x, "y": y}
+            continue
+
+        preds = [positions[p] for p in predecessors.get(block_id, ()) if p in positions]
+        succs = [positions[s] for s in successors.get(block_id, ()) if s in positions]
+        if preds:
+            x = max(p["x"] for p in preds) + LAYER_SPACING
+        elif succs:
+            x = min(s["x"] for s in succs) - LAYER_SPACING
+        else:
+            x = 0
+        neighbors = preds + succs
+        y = sum(p["y"] for p in neighbors) / len(neighbors) if neighbors else 0
+
+        if x < 0:
+            for p in positions.values():
+                p["x"] -= x
+            x = 0
+
+        column = sorted(p["y"] for b, p in positions.items() if p["x"] == x and b not in power_ids)
+        positions[block_id] = {"x": x, "y": round(_free_slot(column, y))}
+    return positions
+
+
+def _free_slot(column: List[float], y: float) -> float:
+    """Return the y closest to the requested one that keeps ROW_SPACING from every y in column."""
+    def free(candidate):
+        return all(abs(candidate - other) >= ROW_SPACING for other in column)
+
+    if free(y):
+        return y
+    candidates = [other + ROW_SPACING for other in column] + [other - ROW_SPACING for other in column]
+    return min((c for c in candidates if free(c) and c >= 0), key=lambda c: abs(c - y), default=y)
+
+
+def apply_layout(blocks: List[Dict[str, Any]], positions: Dict[str, Dict[str, float]]) -> List[Dict[str, Any]]:
+    """Return shallow copies of the blocks with their computed positions."""
+    positioned = []
+    for block in blocks:
+        block_copy = dict(block)
+        if block.get("id") in positions:
+            block_copy["position"] = positions[block["id"]]
+        positioned.append(block_copy)
+    return positioned
@@ -0,0 +1,787 @@
+import asyncio
+import concurrent.futures
+import email.utils
+import hashlib
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+import anthropic
+
+from history_compaction import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "claude-3-5-sonnet-20241022"
+DEFAULT_MAX_TOKENS = 4000
+# Most requests one Message Batch may hold
+MAX_BATCH_REQUESTS = 100000
+
+# Call types issued by CircuitDesignAgent; each can override the defaults
+CALL_TYPES = ("question", "follow_up", "design", "repair", "skeleton", "block_detail", "edit")
+
+# Reply of the fake backend when it has nothing recorded for a request
+FAKE_QUESTION_REPLY = "1. What frequency range do you need?\n2. What supply voltage will you use?\n3. Which outputs and CV inputs should it have?"
+FAKE_DESIGN = {
+    "circuit_info": {
+        "name": "Fake Oscillator",
+        "description": "Deterministic design served by the fake LLM backend",
+        "supply_voltage": "±12V",
+        "categories": ["oscillator"]
+    },
+    "blocks": [
+        {
+            "id": "power_supply",
+            "name": "Power Supply",
+            "function": "Provide regulated supply rails",
+            "position": {"x": 0, "y": 240},
+            "inputs": [],
+            "outputs": [
+                {"signal_type": "power_12v", "name": "+12V"},
+                {"signal_type": "power_neg12v", "name": "-12V"}
+            ]
+        },
+        {
+            "id": "osc_core",
+            "name": "Oscillator Core",
+            "function": "Generate a square wave",
+            "position": {"x": 0, "y": 0},
+            "inputs": [{"signal_type": "cv_signal", "name": "V/Oct CV", "required": True}],
+            "outputs": [{"signal_type": "audio_signal", "name": "Square Out"}]
+        },
+        {
+            "id": "output_buffer",
+            "name": "Output Buffer",
+            "function": "Buffer the output signal",
+            "position": {"x": 300, "y": 0},
+            "inputs": [{"signal_type": "audio_signal", "name": "Audio In", "required": True}],
+            "outputs": [{"signal_type": "audio_signal", "name": "Audio Out"}]
+        }
+    ],
+    "signal_flow": [
+        {"signal_type": "audio_signal", "from_block": "osc_core", "to_block": "output_buffer"}
+    ]
+}
+FAKE_REPLIES = {
+    "question": FAKE_QUESTION_REPLY,
+    "follow_up": "Thanks, I have everything I need to generate the design.",
+    "design": json.dumps(FAKE_DESIGN, indent=2, ensure_ascii=False),
+    "repair": "[]",
+    "skeleton": json.dumps(FAKE_DESIGN, indent=2, ensure_ascii=False),
+    "block_detail": json.dumps({
+        "implementation": "Op-amp based stage",
+        "how_it_works": "Deterministic description served by the fake LLM backend",
+        "keywords": ["fake"],
+        "main_components": ["Op-amp", "resistors", "capacitors"],
+        "parameters": {"gain": "1"},
+        "adjustment": "No adjustment needed",
+        "test_points": ["Output"],
+        "troubleshooting": "Check the supply rails",
+        "alternatives": [{"method": "Discrete transistors", "pros": ["Cheaper"], "cons": ["Less stable"]}]
+    }, indent=2),
+    "edit": "[]"
+}
+
+
+def call_settings_from_env() -> Dict[str, Dict[str, Any]]:
+    """Read the model and sampling settings of every call type from the environment.
+
+    LLM_MODEL, LLM_MAX_TOKENS and LLM_TEMPERATURE set the defaults, and
+    LLM_<CALL_TYPE>_MODEL etc. (e.g. LLM_DESIGN_MAX_TOKENS) override them for
+    one call type. The "default" entry applies to unlisted call types.
+    """
+    def read(prefix):
+        settings = {}
+        if os.getenv(f"{prefix}_MODEL"):
+            settings["model"] = os.getenv(f"{prefix}_MODEL")
+        if os.getenv(f"{prefix}_MAX_TOKENS"):
+            settings["max_tokens"] = int(os.getenv(f"{prefix}_MAX_TOKENS"))
+        if os.getenv(f"{prefix}_TEMPERATURE"):
+            settings["temperature"] = float(os.getenv(f"{prefix}_TEMPERATURE"))
+        return settings
+
+    settings = {"default": read("LLM")}
+    for call_type in CALL_TYPES:
+        overrides = read(f"LLM_{call_type.upper()}")
+        if overrides:
+            settings[call_type] = overrides
+    return settings
+
+
+def request_key(params: Dict[str, Any]) -> str:
+    """Return a stable hash of request parameters, used to look up recorded responses."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+class LLMError(Exception):
+    """An LLM call failed. Retryable errors may succeed if the call is repeated later.
+
+    retry_after is the delay the API asked for (retry-after header), if any.
+    """
+
+    retryable = False
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class LLMRateLimitError(LLMError):
+    """429: request or token rate limit exceeded."""
+
+    retryable = True
+
+
+class LLMOverloadedError(LLMError):
+    """529/503: the API is temporarily overloaded."""
+
+    retryable = True
+
+
+class LLMServerError(LLMError):
+    """Other 5xx responses, or a response without content."""
+
+    retryable = True
+
+
+class LLMConnectionError(LLMError):
+    """The API could not be reached or did not answer in time."""
+
+    retryable = True
+
+
+class LLMRequestError(LLMError):
+    """4xx other than 429: the request itself is wrong (bad parameters, authentication, too large)."""
+
+
+def parse_retry_after(headers: Any) -> Optional[float]:
+    """Return the delay in seconds from retry-after-ms or retry-after (seconds or HTTP date) headers."""
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Usage:
+    """Token usage of one response, with the attributes of the Messages API usage block."""
+
+    def __init__(self, input_tokens: int = 0, output_tokens: int = 0,
+                 cache_creation_input_tokens: int = 0, cache_read_input_tokens: int = 0):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.cache_creation_input_tokens = cache_creation_input_tokens
+        self.cache_read_input_tokens = cache_read_input_tokens
+
+
+class LLMResponse:
+    """Text and usage of one completed LLM call."""
+
+    def __init__(self, text: str, usage: Any):
+        self.text = text
+        self.usage = usage
+
+
+class LLMBackend(ABC):
+    """Interface between CircuitDesignAgent and a Messages-API-style model.
+
+    params are Messages API request parameters (model, max_tokens, temperature,
+    system, messages); call_type identifies the agent step making the call.
+    stream() yields text chunks and finally the complete LLMResponse.
+    """
+
+    @abstractmethod
+    def create(self, params: Dict[str, Any], call_type: str = "chat") -> LLMResponse:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def create_async(self, params: Dict[str, Any], call_type: str = "chat") -> LLMResponse:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def stream(self, params: Dict[str, Any], call_type: str = "chat") -> AsyncIterator[Union[str, LLMResponse]]:
+        raise NotImplementedError
+        yield
+
+
+class AnthropicBackend(LLMBackend):
+    """The Anthropic Messages API.
+
+    SDK errors are raised as LLMError subclasses. The SDK's own retries are
+    off by default (max_retries=0) because LLMScheduler retries with
+    rate-limit-aware backoff for every backend.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, max_retries: int = 0):
+        if not api_key:
+            api_key = os.getenv("ANTHROPIC_API_KEY")
+            if not api_key:
+                raise ValueError("Anthropic API key is required. Set ANTHROPIC_API_KEY in .env file or pass api_key parameter.")
+
+        # base_url lets the agent talk to a local mock Messages endpoint (load tests)
+        self.client = anthropic.Anthropic(api_key=api_key, base_url=base_url, max_retries=max_retries)
+        self.async_client = anthropic.AsyncAnthropic(api_key=api_key, base_url=base_url, max_retries=max_retries)
+
+    def create(self, params: Dict[str, Any], call_type: str = "chat") -> LLMResponse:
+        try:
+            response = self.client.messages.create(**params)
+        except anthropic.APIError as e:
+            raise self._translate_error(e) from e
+        return LLMResponse(self._response_text(response), response.usage)
+
+    async def create_async(self, params: Dict[str, Any], call_type: str = "chat") -> LLMResponse:
+        try:
+            response = await self.async_client.messages.create(**params)
+        except anthropic.APIError as e:
+            raise self._translate_error(e) from e
+        return LLMResponse(self._response_text(response), response.usage)
+
+    async def stream(self, params: Dict[str, Any], call_type: str = "chat") -> AsyncIterator[Union[str, LLMResponse]]:
+        try:
+            async with self.async_client.messages.stream(**params) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                final_message = await stream.get_final_message()
+        except anthropic.APIError as e:
+            raise self._translate_error(e) from e
+        yield LLMResponse(self._response_text(final_message), final_message.usage)
+
+    def _response_text(self, response) -> str:
+        """Return the stripped text of a Messages API response."""
+        if not response.content or len(response.content) == 0:
+            raise LLMServerError("Empty response from Claude API")
+
+        return response.content[0].text.strip()
+
+    @staticmethod
+    def _translate_error(error: Exception) -> LLMError:
+        """Map an SDK exception onto the LLMError hierarchy."""
+        if isinstance(error, anthropic.APIConnectionError):
+            return LLMConnectionError(str(error))
+        status = getattr(error, "status_code", None)
+        response = getattr(error, "response", None)
+        retry_after = parse_retry_after(response.headers if response is not None else None)
+        if status == 429:
+            return LLMRateLimitError(str(error), status, retry_after)
+        if status in (503, 529):
+            return LLMOverloadedError(str(error), status, retry_after)
+        if status is not None and status >= 500:
+            return LLMServerError(str(error), status, retry_after)
+        return LLMRequestError(str(error), status)
+
+
+class FakeBackend(LLMBackend):
+    """Deterministic local backend for benchmarks, load tests and offline development.
+
+    Replies come from a replay file recorded by RecordingBackend (matched by
+    request hash, then by call type) or from the synthetic FAKE_REPLIES.
+    Timing follows a simple model: `latency` seconds plus uncached input
+    tokens at `prefill_tokens_per_second` to the first token, then
+    `tokens_per_second` output tokens per second (0 disables either rate).
+    Usage is estimated locally; with prompt caching on, a system prompt seen
+    before is reported as a cache read.
+    """
+
+    def __init__(self, replies: Optional[Dict[str, str]] = None, replay_path: Optional[str] = None,
+                 latency: float = 0.0, tokens_per_second: float = 0.0, chunk_tokens: int = 8,
+                 prefill_tokens_per_second: float = 0.0):
+        self.replies = dict(FAKE_REPLIES, **(replies or {}))
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.chunk_tokens = chunk_tokens
+        self.recorded = {}
+        if replay_path:
+            self.load_replay(replay_path)
+        self._lock = threading.Lock()
+        self._cached_prefixes = set()
+
+    @classmethod
+    def from_env(cls) -> "FakeBackend":
+        """Build from LLM_FAKE_REPLAY, LLM_FAKE_LATENCY and LLM_FAKE_(PREFILL_)TOKENS_PER_SECOND."""
+        return cls(
+            replay_path=os.getenv("LLM_FAKE_REPLAY") or None,
+            latency=float(os.getenv("LLM_FAKE_LATENCY", "0")),
+            tokens_per_second=float(os.getenv("LLM_FAKE_TOKENS_PER_SECOND", "0")),
+            prefill_tokens_per_second=float(os.getenv("LLM_FAKE_PREFILL_TOKENS_PER_SECOND", "0"))
+        )
+
+    def load_replay(self, path: str) -> None:
+        """Load responses recorded as JSONL; the last line for a request or call type wins."""
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                self.recorded[record["key"]] = record["text"]
+                self.replies[record["call_type"]] = record["text"]
+
+    def reply_for(self, params: Dict[str, Any], call_type: str) -> str:
+        """Return the recorded reply for this exact request, else the reply for its call type."""
+        text = self.recorded.get(request_key(params))
+        if text is None:
+            text = self.replies.get(call_type, FAKE_QUESTION_REPLY)
+        return text
+
+    def create(self, params: Dict[str, Any], call_type: str = "chat") -> LLMResponse:
+        response = self._respond(params, call_type)
+        time.sleep(self._first_token_delay(response.usage) + self._output_delay(response.usage))
+        return response
+
+    async def create_async(self, params: Dict[str, Any], call_type: str = "chat") -> LLMResponse:
+        response = self._respond(params, call_type)
+        await asyncio.sleep(self._first_token_delay(response.usage) + self._output_delay(response.usage))
+        return response
+
+    async def stream(self, params: Dict[str, Any], call_type: str = "chat") -> AsyncIterator[Union[str, LLMResponse]]:
+        response = self._respond(params, call_type)
+        await asyncio.sleep(self._first_token_delay(response.usage))
+        chunk_chars = self.chunk_tokens * 4
+        for i in range(0, len(response.text), chunk_chars):
+            if self.tokens_per_second:
+                await asyncio.sleep(self.chunk_tokens / self.tokens_per_second)
+            yield response.text[i:i + chunk_chars]
+        yield response
+
+    def _first_token_delay(self, usage: Usage) -> float:
+        prefill_tokens = usage.input_tokens + usage.cache_creation_input_tokens
+        return self.latency + (prefill_tokens / self.prefill_tokens_per_second if self.prefill_tokens_per_second else 0.0)
+
+    def _output_delay(self, usage: Usage) -> float:
+        return usage.output_tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _respond(self, params: Dict[str, Any], call_type: str) -> LLMResponse:
+        text = self.reply_for(params, call_type)
+        system = params.get("system") or ""
+        cached = isinstance(system, list) and any("cache_control" in part for part in system)
+        system_text = "".join(part.get("text", "") for part in system) if isinstance(system, list) else system
+        message_tokens = sum(estimate_tokens(json.dumps(m.get("content"), ensure_ascii=False)) for m in params.get("messages", []))
+        system_tokens = estimate_tokens(system_text)
+
+        usage = Usage(input_tokens=message_tokens, output_tokens=estimate_tokens(text))
+        if not cached:
+            usage.input_tokens += system_tokens
+        else:
+            with self._lock:
+                hit = system_text in self._cached_prefixes
+                self._cached_prefixes.add(system_text)
+            if hit:
+                usage.cache_read_input_tokens = system_tokens
+            else:
+                usage.cache_creation_input_tokens = system_tokens
+        return LLMResponse(text, usage)
+
+
+class RecordingBackend(LLMBackend):
+    """Wraps another backend and appends every response to a JSONL file FakeBackend can replay."""
+
+    def __init__(self, backend: LLMBackend, path: str):
+        self.backend = backend
+        self.path = path
+        self._lock = threading.Lock()
+
+    def create(self, params: Dict[str, Any], call_type: str = "chat") -> LLMResponse:
+        return self._record(params, call_type, self.backend.create(params, call_type))
+
+    async def create_async(self, params: Dict[str, Any], call_type: str = "chat") -> LLMResponse:
+        return self._record(params, call_type, await self.backend.create_async(params, call_type))
+
+    async def stream(self, params: Dict[str, Any], call_type: str = "chat") -> AsyncIterator[Union[str, LLMResponse]]:
+        async for item in self.backend.stream(params, call_type):
+            if isinstance(item, LLMResponse):
+                self._record(params, call_type, item)
+            yield item
+
+    def _record(self, params: Dict[str, Any], call_type: str, response: LLMResponse) -> LLMResponse:
+        usage = {key: getattr(response.usage, key, 0) or 0 for key in vars(Usage())}
+        line = json.dumps({"key": request_key(params), "call_type": call_type, "text": response.text, "usage": usage}, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+        return response
+
+
+class ThrottlingBackend(LLMBackend):
+    """Wraps another backend and rejects calls like a rate-limited, overloaded API.
+
+    Like the Messages API, requests_per_minute is a bucket of that many
+    requests refilled continuously; a call finding it empty raises
+    LLMRateLimitError with retry_after set to when the next request is
+    available. A random overload_rate fraction of the accepted calls raise
+    LLMOverloadedError instead. Used to exercise LLMScheduler offline.
+    """
+
+    def __init__(self, backend: LLMBackend, requests_per_minute: int = 0, overload_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.backend = backend
+        self.requests_per_minute = requests_per_minute
+        self.overload_rate = overload_rate
+        self.rejected = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._available = float(requests_per_minute)
+        self._updated = time.monotonic()
+
+    def create(self, params: Dict[str, Any], call_type: str = "chat") -> LLMResponse:
+        self._admit()
+        return self.backend.create(params, call_type)
+
+    async def create_async(self, params: Dict[str, Any], call_type: str = "chat") -> LLMResponse:
+        self._admit()
+        return await self.backend.create_async(params, call_type)
+
+    async def stream(self, params: Dict[str, Any], call_type: str = "chat") -> AsyncIterator[Union[str, LLMResponse]]:
+        self._admit()
+        async for item in self.backend.stream(params, call_type):
+            yield item
+
+    def _admit(self) -> None:
+        now = time.monotonic()
+        rate = self.requests_per_minute / 60
+        with self._lock:
+            if self.requests_per_minute:
+                self._available = min(self.requests_per_minute, self._available + (now - self._updated) * rate)
+                self._updated = now
+                if self._available < 1:
+                    self.rejected += 1
+                    retry_after = (1 - self._available) / rate
+                    raise LLMRateLimitError("Rate limit exceeded (throttling backend)", 429, round(retry_after, 3))
+                self._available -= 1
+            if self.overload_rate and self._random.random() < self.overload_rate:
+                self.rejected += 1
+                raise LLMOverloadedError("Overloaded (throttling backend)", 529)
+
+
+class LocalMessageBatches:
+    """Local stand-in for the SDK's client.messages.batches, for tests and offline runs.
+
+    A batch ends `delay` seconds after it is created; its requests are then
+    answered one by one by backend (FakeBackend by default) with the call
+    type MessageBatchBackend puts in front of each custom_id, and failures
+    become "errored" results, with the shapes MessageBatchBackend reads.
+    """
+
+    def __init__(self, backend: Optional[LLMBackend] = None, delay: float = 0.0):
+        self.backend = backend or FakeBackend()
+        self.delay = delay
+        self.created = 0
+        self._ids = itertools.count(1)
+        self._batches = {}
+
+    def create(self, requests: List[Dict[str, Any]]) -> Any:
+        custom_ids = [request["custom_id"] for request in requests]
+        if len(set(custom_ids)) != len(custom_ids) or len(custom_ids) > MAX_BATCH_REQUESTS:
+            raise LLMRequestError("Batch custom_ids must be unique and at most 100000", 400)
+        batch_id = f"msgbatch_local_{next(self._ids)}"
+        self._batches[batch_id] = {"requests": list(requests), "created": time.monotonic(), "results": None}
+        self.created += 1
+        return self.retrieve(batch_id)
+
+    def retrieve(self, batch_id: str) -> Any:
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            raise LLMRequestError(f"Unknown batch {batch_id}", 404)
+        ended = time.monotonic() - batch["created"] >= self.delay
+        return SimpleNamespace(id=batch_id, processing_status="ended" if ended else "in_progress")
+
+    def results(self, batch_id: str) -> List[Any]:
+        if self.retrieve(batch_id).processing_status != "ended":
+            raise LLMRequestError(f"Batch {batch_id} has not ended", 400)
+        batch = self._batches[batch_id]
+        if batch["results"] is None:
+            batch["results"] = [SimpleNamespace(custom_id=request["custom_id"], result=self._answer(request))
+                                for request in batch["requests"]]
+        return batch["results"]
+
+    def _answer(self, request: Dict[str, Any]) -> Any:
+        call_type = request["custom_id"].partition("-")[0]
+        try:
+            response = self.backend.create(request["params"], call_type)
+        except LLMError as e:
+            error_type = "api_error" if e.retryable else "invalid_request_error"
+            return SimpleNamespace(type="errored", error=SimpleNamespace(
+                type="error", error=SimpleNamespace(type=error_type, message=str(e))))
+        message = SimpleNamespace(content=[SimpleNamespace(type="text", text=response.text)], usage=response.usage)
+        return SimpleNamespace(type="succeeded", message=message)
+
+
+class MessageBatchBackend(LLMBackend):
+    """Sends calls through the Message Batches API instead of one request each.
+
+    Calls are collected for collect_window seconds after the first one (or
+    until max_batch_size are waiting) and submitted as one batch, then every
+    caller waits until the batch has ended, polled every poll_interval
+    seconds. Batches can take minutes to hours but cost less per token, so
+    this is meant for offline jobs with many concurrent sessions, whose
+    calls of the same turn end up in the same batch. batches is the SDK's
+    client.messages.batches or a LocalMessageBatches stand-in.
+
+    With a journal_path, submitted batches and every result are appended to
+    a JSONL file: a restarted run answers calls it already has a result for
+    and waits for batches still in progress instead of paying for them
+    again. Failed requests raise LLMErrors (expired and API errors are
+    retryable).
+
+    Identical deterministic (temperature 0) calls share one request and its
+    answer. Sampled calls are numbered per request instead, so best-of-N
+    candidates and later identical calls each get their own sample, while
+    a restarted run making the same calls still finds them in the journal.
+
+    Collection, submission and polling run on a private event loop in a
+    daemon thread, so sync callers (threads blocking in create) and async
+    callers on any event loop share the same batches.
+    """
+
+    def __init__(self, batches: Any, collect_window: float = 2.0, poll_interval: float = 30.0,
+                 max_batch_size: int = MAX_BATCH_REQUESTS, journal_path: Optional[str] = None):
+        self.batches = batches
+        self.collect_window = collect_window
+        self.poll_interval = poll_interval
+        self.max_batch_size = min(max_batch_size, MAX_BATCH_REQUESTS)
+        self.journal_path = journal_path
+        self.submitted = 0
+        self.resumed = 0
+        # custom_id -> {"text", "usage"} of every answered request
+        self._results = {}
+        # custom_id -> future of a request that is collected or in a submitted batch
+        self._futures = {}
+        # custom_id of a sampled request -> identical sampled calls made so far
+        self._samples = Counter()
+        self._collecting = {}
+        self._flush_handle = None
+        self._unfinished = {}
+        self._tasks = set()
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        if journal_path and os.path.exists(journal_path):
+            self._load_journal(journal_path)
+
+    def create(self, params: Dict[str, Any], call_type: str = "chat") -> LLMResponse:
+        return self._call(params, call_type).result()
+
+    async def create_async(self, params: Dict[str, Any], call_type: str = "chat") -> LLMResponse:
+        return await asyncio.wrap_future(self._call(params, call_type))
+
+    def _call(self, params: Dict[str, Any], call_type: str) -> "concurrent.futures.Future":
+        """Start a call on the private loop, returning its thread-safe future."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="message-batches", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(self._request(params, call_type), self._loop)
+
+    async def _request(self, params: Dict[str, Any], call_type: str) -> LLMResponse:
+        if self._unfinished:
+            self._resume_batches()
+        key = self.custom_id(params, call_type)
+        if params.get("temperature", 1.0) > 0:
+            self._samples[key] += 1
+            key = f"{key}-{self._samples[key]}"
+        record = self._results.get(key)
+        if record is None:
+            future = self._futures.get(key)
+            if future is None:
+                future = self._futures[key] = asyncio.get_running_loop().create_future()
+                self._collecting[key] = params
+                self._schedule_flush()
+            # A cancelled caller (such as a losing best-of-N candidate) leaves the shared future alone
+            record = await asyncio.shield(future)
+        return LLMResponse(record["text"], Usage(**record["usage"]))
+
+    async def stream(self, params: Dict[str, Any], call_type: str = "chat") -> AsyncIterator[Union[str, LLMResponse]]:
+        yield await self.create_async(params, call_type)
+
+    @staticmethod
+    def custom_id(params: Dict[str, Any], call_type: str) -> str:
+        """The batch request id of a call: its call type and request hash, within the 64 characters allowed.
+
+        Sampled calls get a "-<n>" suffix on top of it (see _request).
+        """
+        return f"{call_type}-{request_key(params)[:40]}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches_submitted": self.submitted,
+            "batches_resumed": self.resumed,
+            "results": len(self._results),
+            "waiting": len(self._futures)
+        }
+
+    def _schedule_flush(self) -> None:
+        if len(self._collecting) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.collect_window, self._flush)
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._collecting:
+            self._spawn(self._submit(self._collecting))
+            self._collecting = {}
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _resume_batches(self) -> None:
+        """Wait again for the batches a previous run submitted but never received the results of."""
+        loop = asyncio.get_running_loop()
+        for batch_id, keys in self._unfinished.items():
+            for key in keys:
+                self._futures.setdefault(key, loop.create_future())
+            self.resumed += 1
+            self._spawn(self._poll(batch_id, keys))
+        self._unfinished = {}
+
+    async def _submit(self, requests: Dict[str, Dict[str, Any]]) -> None:
+        keys = list(requests)
+        try:
+            batch = await asyncio.to_thread(
+                self.batches.create, requests=[{"custom_id": key, "params": params} for key, params in requests.items()]
+            )
+        except Exception as e:
+            error = self._translate(e)
+            for key in keys:
+                self._fail(key, error)
+            return
+        self.submitted += 1
+        logger.info("Submitted message batch %s with %d requests", batch.id, len(keys))
+        self._journal({"batch": batch.id, "keys": keys})
+        await self._poll(batch.id, keys)
+
+    async def _poll(self, batch_id: str, keys: List[str]) -> None:
+        while True:
+            try:
+                batch = await asyncio.to_thread(self.batches.retrieve, batch_id)
+                if batch.processing_status == "ended":
+                    results = await asyncio.to_thread(lambda: list(self.batches.results(batch_id)))
+                    break
+            except Exception as e:
+                if getattr(e, "status_code", None) == 404:
+                    # The batch is gone (deleted, or older than its results are kept): submit the requests again
+                    for key in keys:
+                        self._fail(key, LLMServerError(f"Message batch {batch_id} is unavailable: {e}"))
+                    return
+                logger.warning("Polling message batch %s failed, will retry: %s", batch_id, e)
+            await asyncio.sleep(self.poll_interval)
+
+        for item in results:
+            self._resolve(item.custom_id, item.result)
+        for key in keys:
+            if key in self._futures:
+                self._fail(key, LLMServerError(f"Message batch {batch_id} returned no result for a request"))
+        self._journal({"batch": batch_id, "ended": True})
+
+    def _resolve(self, key: str, result: Any) -> None:
+        if result.type == "succeeded":
+            message = result.message
+            if not message.content:
+                self._fail(key, LLMServerError("Empty response in message batch"))
+                return
+            usage = {name: getattr(message.usage, name, 0) or 0 for name in vars(Usage())}
+            record = {"text": message.content[0].text.strip(), "usage": usage}
+            self._results[key] = record
+            self._journal(dict(record, key=key))
+            future = self._futures.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(record)
+        elif result.type == "errored":
+            error = getattr(result.error, "error", result.error)
+            message = f"Message batch request failed: {getattr(error, 'message', error)}"
+            if getattr(error, "type", None) == "invalid_request_error":
+                self._fail(key, LLMRequestError(message, 400))
+            else:
+                self._fail(key, LLMServerError(message, 500))
+        else:
+            # canceled or expired (not processed within 24 hours)
+            self._fail(key, LLMServerError(f"Message batch request {result.type}"))
+
+    @staticmethod
+    def _translate(error: Exception) -> LLMError:
+        if isinstance(error, LLMError):
+            return error
+        if isinstance(error, anthropic.APIError):
+            return AnthropicBackend._translate_error(error)
+        return LLMConnectionError(f"Failed to submit message batch: {error}")
+
+    def _fail(self, key: str, error: LLMError) -> None:
+        # Dropping the future lets the scheduler's retry collect the request into a new batch
+        future = self._futures.pop(key, None)
+        if future is not None and not future.done():
+            future.set_exception(error)
+            # Nobody may be waiting any more (cancelled callers); do not log it as never retrieved
+            future.exception()
+
+    def _journal(self, record: Dict[str, Any]) -> None:
+        if self.journal_path:
+            with open(self.journal_path, "a") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _load_journal(self, path: str) -> None:
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if "key" in record:
+                    self._results[record["key"]] = {"text": record["text"], "usage": record["usage"]}
+                elif record.get("ended"):
+                    self._unfinished.pop(record["batch"], None)
+                else:
+                    self._unfinished[record["batch"]] = record["keys"]
+        for batch_id in list(self._unfinished):
+            keys = [key for key in self._unfinished[batch_id] if key not in self._results]
+            if keys:
+                self._unfinished[batch_id] = keys
+            else:
+                del self._unfinished[batch_id]
+
+
+def backend_from_env(api_key: Optional[str] = None, base_url: Optional[str] = None) -> LLMBackend:
+    """Build the backend selected by LLM_BACKEND ("anthropic" or "fake"), recording to LLM_RECORD if set.
+
+    LLM_FAKE_RPM and LLM_FAKE_OVERLOAD_RATE make the fake backend reject calls like a throttled API.
+    """
+    name = os.getenv("LLM_BACKEND", "anthropic").lower()
+    if name == "fake":
+        backend = FakeBackend.from_env()
+    elif name == "anthropic":
+        backend = AnthropicBackend(api_key=api_key, base_url=base_url)
+    else:
+        raise ValueError(f"Unknown LLM_BACKEND: {name}")
+
+    throttle_rpm = int(os.getenv("LLM_FAKE_RPM", "0"))
+    overload_rate = float(os.getenv("LLM_FAKE_OVERLOAD_RATE", "0"))
+    if name == "fake" and (throttle_rpm or overload_rate):
+        backend = ThrottlingBackend(backend, throttle_rpm, overload_rate)
+
+    record_path = os.getenv("LLM_RECORD")
+    if record_path:
+        backend = RecordingBackend(backend, record_path)
+    return backend
@@ -0,0 +1,333 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Union
+
+from history_compaction import estimate_tokens
+from llm_backend import LLMError, LLMResponse
+from observability import REGISTRY, LOCAL_LATENCY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first: interactive turns go ahead of generation, per-block detail calls go last
+DEFAULT_PRIORITIES = {
+    "question": 0,
+    "follow_up": 0,
+    "edit": 0,
+    "design": 1,
+    "repair": 1,
+    "skeleton": 1,
+    "block_detail": 2
+}
+DEFAULT_PRIORITY = 1
+# Added to the priority of calls made for speculative work (see mark_speculative)
+SPECULATIVE_PRIORITY_OFFSET = 10
+
+_speculative = contextvars.ContextVar("llm_speculative", default=False)
+
+LLM_RETRIES = REGISTRY.counter("llm_retries_total", "LLM calls retried after a retryable error, by call type and error")
+LLM_QUEUE_SECONDS = REGISTRY.histogram(
+    "llm_queue_wait_seconds", "Time LLM calls waited for a concurrency slot or rate limit budget, by call type",
+    LOCAL_LATENCY_BUCKETS + (2.5, 5, 10, 30, 60)
+)
+
+
+def mark_speculative() -> None:
+    """Queue the LLM calls of the current task (and the tasks it starts) behind every regular call."""
+    _speculative.set(True)
+
+
+def is_speculative() -> bool:
+    """True inside a task marked with mark_speculative."""
+    return _speculative.get()
+
+
+class TokenBucket:
+    """Refills per_minute units per minute up to per_minute; may go into debt when actual use exceeds an estimate."""
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.clock = clock
+        self.updated = clock()
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount (capped at capacity, so huge requests still run) is available."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class _Waiter:
+    """A call waiting for admission; wake() interrupts its wait so it re-checks."""
+
+    __slots__ = ("priority", "seq", "tokens", "wake")
+
+    def __init__(self, priority: int, seq: int, tokens: int, wake: Callable[[], None]):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.wake = wake
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class LLMScheduler:
+    """Admission control, rate limiting and retries for every LLM call of an agent.
+
+    Calls wait in one priority queue (FIFO within a priority) for a
+    concurrency slot and for requests-per-minute and tokens-per-minute
+    budget; the token cost is estimated from the prompt before the call and
+    corrected with the reported usage afterwards. Retryable LLMErrors are
+    retried with full-jitter exponential backoff, or after the retry-after
+    delay the API asked for, which also pauses admission of every other call.
+    Sync callers (threads) and async callers (event loops) share the queue.
+    Non-retryable errors, and retryable ones after max_retries, are raised.
+    0 disables a limit.
+    """
+
+    # Longest sleep of a waiter that is not first in line or has no free slot; it is
+    # normally woken earlier by the release or admission that makes it eligible
+    RECHECK_SECONDS = 1.0
+
+    def __init__(self, max_concurrency: int = 32, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 30.0,
+                 priorities: Optional[Dict[str, int]] = None, clock: Callable[[], float] = time.monotonic):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.priorities = dict(DEFAULT_PRIORITIES, **(priorities or {}))
+        self.clock = clock
+        self.requests = TokenBucket(requests_per_minute, clock) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, clock) if tokens_per_minute else None
+        self._lock = threading.Lock()
+        self._queue = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self.retries = 0
+
+    @classmethod
+    def from_env(cls) -> "LLMScheduler":
+        """Create a scheduler from LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE and LLM_MAX_RETRIES."""
+        return cls(
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+            requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0")),
+            tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "0")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+            base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "30"))
+        )
+
+    def call(self, fn: Callable[[Dict[str, Any], str], LLMResponse], params: Dict[str, Any], call_type: str) -> LLMResponse:
+        """Run fn(params, call_type) (a backend's create) once admitted, retrying retryable errors."""
+        tokens = self._estimate_tokens(params)
+        for attempt in itertools.count():
+            self._acquire(call_type, tokens)
+            try:
+                response = fn(params, call_type)
+                usage = response.usage
+            except LLMError as e:
+                self._release(tokens, None, e)
+                time.sleep(self._retry_delay(e, call_type, attempt))
+                continue
+            except BaseException:
+                self._release(tokens, None)
+                raise
+            self._release(tokens, usage)
+            return response
+
+    async def call_async(self, fn: Callable[..., Any], params: Dict[str, Any], call_type: str) -> LLMResponse:
+        """Async variant of call for a backend's create_async."""
+        tokens = self._estimate_tokens(params)
+        for attempt in itertools.count():
+            await self._acquire_async(call_type, tokens)
+            try:
+                response = await fn(params, call_type)
+                usage = response.usage
+            except LLMError as e:
+                self._release(tokens, None, e)
+                await asyncio.sleep(self._retry_delay(e, call_type, attempt))
+                continue
+            except BaseException:
+                self._release(tokens, None)
+                raise
+            self._release(tokens, usage)
+            return response
+
+    async def stream(self, fn: Callable[..., AsyncIterator[Union[str, LLMResponse]]], params: Dict[str, Any],
+                     call_type: str) -> AsyncIterator[Union[str, LLMResponse]]:
+        """Stream fn(params, call_type) (a backend's stream) holding one slot until it ends.
+
+        Errors before the first chunk are retried like any call; once text
+        has been yielded a failure is raised, since it cannot be taken back.
+        """
+        tokens = self._estimate_tokens(params)
+        for attempt in itertools.count():
+            await self._acquire_async(call_type, tokens)
+            started = False
+            usage = None
+            try:
+                async for item in fn(params, call_type):
+                    if isinstance(item, LLMResponse):
+                        usage = item.usage
+                    started = True
+                    yield item
+            except LLMError as e:
+                self._release(tokens, None, e)
+                if started:
+                    raise
+                await asyncio.sleep(self._retry_delay(e, call_type, attempt))
+                continue
+            except BaseException:
+                self._release(tokens, None)
+                raise
+            self._release(tokens, usage)
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        """Report queue depth, calls in flight, remaining rate budget and retries."""
+        with self._lock:
+            return {
+                "queued": len(self._queue),
+                "in_flight": self._in_flight,
+                "max_concurrency": self.max_concurrency,
+                "requests_available": round(self.requests.level, 1) if self.requests else None,
+                "tokens_available": round(self.tokens.level) if self.tokens else None,
+                "paused_for": round(max(0.0, self._paused_until - self.clock()), 3),
+                "retries": self.retries
+            }
+
+    def priority_for(self, call_type: str) -> int:
+        priority = self.priorities.get(call_type, DEFAULT_PRIORITY)
+        return priority + SPECULATIVE_PRIORITY_OFFSET if _speculative.get() else priority
+
+    def _estimate_tokens(self, params: Dict[str, Any]) -> int:
+        """Estimate the prompt tokens of a request, only when a tokens-per-minute limit needs it."""
+        if self.tokens is None:
+            return 0
+        system = params.get("system") or ""
+        text = system if isinstance(system, str) else json.dumps(system, ensure_ascii=False)
+        return estimate_tokens(text) + estimate_tokens(json.dumps(params.get("messages", []), ensure_ascii=False))
+
+    def _acquire(self, call_type: str, tokens: int) -> None:
+        event = threading.Event()
+        waiter = self._enqueue(call_type, tokens, event.set)
+        start = time.perf_counter()
+        try:
+            while True:
+                wait = self._try_admit(waiter)
+                if wait is None:
+                    break
+                event.wait(wait)
+                event.clear()
+        except BaseException:
+            self._dequeue(waiter)
+            raise
+        LLM_QUEUE_SECONDS.observe(time.perf_counter() - start, call_type=call_type)
+
+    async def _acquire_async(self, call_type: str, tokens: int) -> None:
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = self._enqueue(call_type, tokens, lambda: loop.call_soon_threadsafe(event.set))
+        start = time.perf_counter()
+        try:
+            while True:
+                wait = self._try_admit(waiter)
+                if wait is None:
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        except BaseException:
+            # Cancelled while queued: give up the place so the next caller can go
+            self._dequeue(waiter)
+            raise
+        LLM_QUEUE_SECONDS.observe(time.perf_counter() - start, call_type=call_type)
+
+    def _enqueue(self, call_type: str, tokens: int, wake: Callable[[], None]) -> _Waiter:
+        waiter = _Waiter(self.priority_for(call_type), next(self._seq), tokens, wake)
+        with self._lock:
+            heapq.heappush(self._queue, waiter)
+        return waiter
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                self._wake_head()
+
+    def _try_admit(self, waiter: _Waiter) -> Optional[float]:
+        """Admit the waiter if it is first in line and within every limit; else return how long to wait (None: admitted)."""
+        with self._lock:
+            if self._queue[0] is not waiter:
+                return self.RECHECK_SECONDS
+            if self.max_concurrency and self._in_flight >= self.max_concurrency:
+                return self.RECHECK_SECONDS
+            wait = max(
+                self._paused_until - self.clock(),
+                self.requests.wait_time(1) if self.requests else 0.0,
+                self.tokens.wait_time(waiter.tokens) if self.tokens else 0.0
+            )
+            if wait > 0:
+                return wait
+            heapq.heappop(self._queue)
+            self._in_flight += 1
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(waiter.tokens)
+            # The next caller may fit as well
+            self._wake_head()
+            return None
+
+    def _release(self, estimated_tokens: int, usage: Any, error: Optional[LLMError] = None) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if usage is not None and self.tokens:
+                # Cache reads do not count towards input token rate limits
+                actual = sum(getattr(usage, key, 0) or 0 for key in ("input_tokens", "cache_creation_input_tokens", "output_tokens"))
+                self.tokens.take(actual - estimated_tokens)
+            if error is not None and error.retry_after:
+                self._paused_until = max(self._paused_until, self.clock() + error.retry_after)
+            self._wake_head()
+
+    def _wake_head(self) -> None:
+        if self._queue:
+            self._queue[0].wake()
+
+    def _retry_delay(self, error: LLMError, call_type: str, attempt: int) -> float:
+        """Return the delay before retrying, or raise the error if it should not be retried."""
+        if not error.retryable or attempt >= self.max_retries:
+            raise error
+        if error.retry_after:
+            delay = error.retry_after + random.uniform(0, self.base_delay)
+        else:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        with self._lock:
+            self.retries += 1
+        LLM_RETRIES.inc(call_type=call_type, error=type(error).__name__)
+        logger.info("Retrying %s call in %.2fs after %s (attempt %d)", call_type, delay, type(error).__name__, attempt + 1)
+        return delay
@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Buckets (seconds) for LLM calls, which take from tens of milliseconds to minutes
+LLM_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160)
+# Buckets (seconds) for local work such as parsing and validating a design
+LOCAL_LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+# Standard LogRecord attributes; anything else on a record came from extra= and is logged as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# Response and prompt text dumps at DEBUG level; DEBUG_DUMPS=0 turns them off even when DEBUG is enabled
+_debug_dumps = os.getenv("DEBUG_DUMPS", "1") != "0"
+
+
+def _label_key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: Iterable[Tuple[str, str]], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in sorted(self._values.items())]
+
+
+class Gauge:
+    """Value read at scrape time from a callback returning a number or {label value: number}.
+
+    kind="counter" exposes a monotonic count kept elsewhere (such as cache hit counters) as a counter.
+    """
+
+    def __init__(self, name: str, help_text: str, callback: Callable[[], Any], label: Optional[str] = None,
+                 kind: str = "gauge"):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        self.label = label
+        self.kind = kind
+
+    def samples(self) -> List[str]:
+        value = self.callback()
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            return [
+                f"{self.name}{_format_labels([(self.label, str(key))])} {_format_value(item)}"
+                for key, item in sorted(value.items())
+            ]
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, in the Prometheus layout."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float]):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}  # label key -> [bucket counts..., +Inf count], sum
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            return sum(series[0]) if series else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            series_items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in series_items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named counters, histograms and gauges rendered in the Prometheus text format.
+
+    Getting a metric that already exists returns it, so modules can declare
+    their metrics at import time without coordinating.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(name, lambda: Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = LLM_LATENCY_BUCKETS) -> Histogram:
+        return self._register(name, lambda: Histogram(name, help_text, buckets))
+
+    def gauge(self, name: str, help_text: str, callback: Callable[[], Any], label: Optional[str] = None,
+              kind: str = "gauge") -> Gauge:
+        """Register (or replace) a gauge whose value is read from callback at scrape time."""
+        gauge = Gauge(name, help_text, callback, label, kind)
+        with self._lock:
+            self._metrics[name] = gauge
+        return gauge
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, name: str, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+
+# Process-wide registry served on /metrics
+REGISTRY = MetricsRegistry()
+
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line with the time, level, logger, message and any extra= fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging(level: Optional[str] = None, log_format: Optional[str] = None,
+                      debug_dumps: Optional[bool] = None) -> None:
+    """Configure leveled logging from LOG_LEVEL, LOG_FORMAT (text|json) and DEBUG_DUMPS.
+
+    Arguments override the environment. Libraries never call this; the API
+    server and CLIs do at startup.
+    """
+    global _debug_dumps
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    log_format = log_format or os.getenv("LOG_FORMAT", "text")
+    if debug_dumps is not None:
+        _debug_dumps = debug_dumps
+
+    handler = logging.StreamHandler()
+    if log_format == "json":
+        handler.setFormatter(JsonLogFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+
+def debug_dumps_enabled(logger: logging.Logger) -> bool:
+    """Return True if response/prompt text should be dumped to this logger.
+
+    Call sites check this before building the dump, so with DEBUG_DUMPS=0 or
+    a level above DEBUG no text is sliced or formatted at all.
+    """
+    return _debug_dumps and logger.isEnabledFor(logging.DEBUG)
+
+
+class Timer:
+    """Context manager that observes its elapsed seconds into a histogram."""
+
+    def __init__(self, histogram: Histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.seconds = 0.0
+
+    def __enter__(self) -> "Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.seconds = time.perf_counter() - self._start
+        self.histogram.observe(self.seconds, **self.labels)
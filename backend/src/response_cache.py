@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+class ResponseCache:
+    """Content-addressed cache of LLM responses.
+
+    Keys are the SHA-256 of the canonical JSON of the request (model, system
+    prompt, messages and sampling parameters), so identical requests share an
+    entry no matter which session made them. Entries live in an in-memory LRU
+    and, when a path is given, in an SQLite file shared across workers and
+    restarts. Both tiers are size-bounded and entries expire after ttl_seconds.
+
+    Only deterministic requests (temperature 0) are cached unless cache_sampled
+    is set, since a sampled reply is just one of many valid answers.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 24 * 3600,
+                 path: Optional[str] = None, max_disk_entries: int = 10000,
+                 cache_sampled: bool = False):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.cache_sampled = cache_sampled
+        self._memory = OrderedDict()  # key -> (response text, stored at)
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """Create a cache from RESPONSE_CACHE_* environment variables, or None if disabled."""
+        if os.getenv("RESPONSE_CACHE", "0") == "0":
+            return None
+        return cls(
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512")),
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(24 * 3600))),
+            path=os.getenv("RESPONSE_CACHE_PATH") or None,
+            max_disk_entries=int(os.getenv("RESPONSE_CACHE_MAX_DISK_ENTRIES", "10000")),
+            cache_sampled=os.getenv("RESPONSE_CACHE_SAMPLED", "0") != "0"
+        )
+
+    def is_eligible(self, params: Dict[str, Any]) -> bool:
+        """Return True if a request with these parameters may be served from cache."""
+        return self.cache_sampled or params.get("temperature", 1.0) == 0
+
+    def key_for(self, params: Dict[str, Any]) -> str:
+        """Return the content address of a request."""
+        canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def get(self, params: Dict[str, Any]) -> Optional[str]:
+        """Return the cached response for a request, or None on a miss."""
+        key = self.key_for(params)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl_seconds:
+                    self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    self._remember(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, params: Dict[str, Any], response: str) -> None:
+        """Store the response for a request in both tiers."""
+        key = self.key_for(params)
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, response, now)
+            self.stores += 1
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, response, now, now)
+                )
+                # Expire old entries, then trim the least recently used ones over the bound
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and tier sizes."""
+        with self._lock:
+            disk_entries = None
+            if self._conn is not None:
+                disk_entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "cache_sampled": self.cache_sampled
+            }
+
+    def _remember(self, key: str, response: str, stored_at: float) -> None:
+        self._memory[key] = (response, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,268 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+class SessionBackend(ABC):
+    """Persistent storage for serialized session state, shared across workers."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, session_id: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def purge(self, older_than: float) -> int:
+        """Delete sessions last written before the given timestamp."""
+        raise NotImplementedError
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """Session backend stored in one table of a SQLite database file.
+
+    Stores sharing a database file (sessions and designs) use different tables.
+    """
+
+    def __init__(self, path: str, table: str = "sessions"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "session_id TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, session_id: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT data FROM {self.table} WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, session_id: str, data: bytes) -> None:
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (session_id, data, updated_at) VALUES (?, ?, ?)",
+                (session_id, data, time.time())
+            )
+            self._conn.commit()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def purge(self, older_than: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute(f"DELETE FROM {self.table} WHERE updated_at < ?", (older_than,))
+            self._conn.commit()
+        return cursor.rowcount
+
+
+class FileSessionBackend(SessionBackend):
+    """Session backend storing one JSON file per session in a local directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        # Session ids are generated server-side, but never trust them as paths
+        safe_id = "".join(c for c in session_id if c.isalnum() or c in "_-")
+        return os.path.join(self.directory, f"{safe_id}.json")
+
+    def get(self, session_id: str) -> Optional[bytes]:
+        try:
+            with open(self._path(session_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, session_id: str, data: bytes) -> None:
+        # Write atomically so other workers never read a partial file
+        path = self._path(session_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def delete(self, session_id: str) -> None:
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def purge(self, older_than: float) -> int:
+        removed = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json") and entry.stat().st_mtime < older_than:
+                os.remove(entry.path)
+                removed += 1
+        return removed
+
+
+def backend_from_url(url: Optional[str], table: str = "sessions") -> Optional[SessionBackend]:
+    """Create a backend from 'sqlite:<path>' (using the given table) or 'file:<directory>', or None if unset."""
+    if not url:
+        return None
+    scheme, _, location = url.partition(":")
+    if scheme == "sqlite":
+        return SQLiteSessionBackend(location, table)
+    if scheme == "file":
+        return FileSessionBackend(location)
+    raise ValueError(f"Unknown session backend: {url}")
+
+
+class SessionManager:
+    """Bounded LRU of per-session conversation state with TTL eviction.
+
+    Idle sessions are kept serialized, so the memory they hold is exactly the
+    reported byte size. Sessions larger than max_session_bytes have their oldest
+    conversation turns dropped. When a backend is configured every write goes
+    through to it and reads are served from it, so multiple workers see the same
+    sessions and sessions survive restarts.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 3600,
+                 max_session_bytes: int = 256 * 1024, backend: Optional[SessionBackend] = None):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_session_bytes = max_session_bytes
+        self.backend = backend
+        self._sessions = OrderedDict()  # session_id -> (serialized state, last access time)
+        self._total_bytes = 0
+        self._last_purge = time.time()
+        self.evictions = 0
+        self.trimmed_sessions = 0
+
+    @classmethod
+    def from_env(cls) -> "SessionManager":
+        """Create a session manager configured from SESSION_* environment variables."""
+        return cls(
+            max_sessions=int(os.getenv("SESSION_MAX", "1000")),
+            ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "3600")),
+            max_session_bytes=int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024))),
+            backend=backend_from_url(os.getenv("SESSION_BACKEND"))
+        )
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh copy of the session state, or None if unknown or expired."""
+        now = time.time()
+
+        if self.backend:
+            data = self.backend.get(session_id)
+            if data is None:
+                self._drop(session_id)
+                return None
+            state = json.loads(data)
+            if now - state.get("updated_at", now) > self.ttl_seconds:
+                self.delete(session_id)
+                return None
+            self._store(session_id, data, now)
+            return state
+
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        data, last_access = entry
+        if now - last_access > self.ttl_seconds:
+            self.delete(session_id)
+            return None
+        self._sessions.move_to_end(session_id)
+        self._sessions[session_id] = (data, now)
+        return json.loads(data)
+
+    def save(self, session_id: str, state: Dict[str, Any]) -> int:
+        """Store the session state and return its serialized size in bytes."""
+        now = time.time()
+        state = dict(state, updated_at=now)
+        data = self._serialize(state)
+
+        self._store(session_id, data, now)
+        if self.backend:
+            self.backend.put(session_id, data)
+
+        self._evict(now)
+        return len(data)
+
+    def delete(self, session_id: str) -> None:
+        """Forget a session."""
+        self._drop(session_id)
+        if self.backend:
+            self.backend.delete(session_id)
+
+    def size_of(self, session_id: str) -> Optional[int]:
+        """Return the in-memory size of a session in bytes."""
+        entry = self._sessions.get(session_id)
+        return len(entry[0]) if entry else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Report session counts and memory usage."""
+        sizes = [len(data) for data, _ in self._sessions.values()]
+        return {
+            "active_sessions": len(sizes),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "total_bytes": self._total_bytes,
+            "max_session_bytes": self.max_session_bytes,
+            "largest_session_bytes": max(sizes) if sizes else 0,
+            "evictions": self.evictions,
+            "trimmed_sessions": self.trimmed_sessions,
+            "backend": type(self.backend).__name__ if self.backend else None
+        }
+
+    def _serialize(self, state: Dict[str, Any]) -> bytes:
+        """Serialize state, dropping the oldest turns until it fits the per-session cap."""
+        data = json.dumps(state, separators=(",", ":")).encode()
+        if len(data) <= self.max_session_bytes:
+            return data
+
+        history = list(state.get("conversation_history", []))
+        while len(data) > self.max_session_bytes and len(history) > 2:
+            # Drop a whole assistant/user exchange so roles keep alternating
+            del history[:2]
+            state = dict(state, conversation_history=history)
+            data = json.dumps(state, separators=(",", ":")).encode()
+        self.trimmed_sessions += 1
+        return data
+
+    def _store(self, session_id: str, data: bytes, now: float) -> None:
+        self._drop(session_id)
+        self._sessions[session_id] = (data, now)
+        self._total_bytes += len(data)
+
+    def _drop(self, session_id: str) -> None:
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self._total_bytes -= len(entry[0])
+
+    def _evict(self, now: float) -> None:
+        """Evict expired sessions, then least recently used ones over the size bound."""
+        while self._sessions:
+            session_id, (_, last_access) = next(iter(self._sessions.items()))
+            if now - last_access <= self.ttl_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            self._drop(session_id)
+            self.evictions += 1
+
+        # Expired sessions in the backend are purged at most every tenth of the TTL
+        if self.backend and now - self._last_purge > self.ttl_seconds / 10:
+            self._last_purge = now
+            self.backend.purge(now - self.ttl_seconds)
@@ -0,0 +1,260 @@
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Lowercase word/number runs; "v/oct", "op-amp" and "1n4148" stay whole (their parts are indexed too)
+_TERM = re.compile(r"[a-z0-9]+(?:[/-][a-z0-9]+)*")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by for from i in into is it me my of on or our that the this to want we with "
+    "would should need please like some".split()
+)
+
+# How much one occurrence of a term counts, by where it appears in a design
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "categories": 3.0,
+    "description": 1.0,
+    "block_names": 1.0,
+    "keywords": 2.0
+}
+
+# Query terms found in more than this fraction of templates barely change the ranking
+# but have the longest postings, so they are skipped once the index is large enough
+MAX_DF_FRACTION = 0.5
+MAX_DF_MIN_TEMPLATES = 100
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into index terms: lowercase, stop words dropped, plural "s" stripped."""
+    terms = []
+    for word in _TERM.findall(text.lower()):
+        parts = [word] + (re.split(r"[/-]", word) if "/" in word or "-" in word else [])
+        for part in parts:
+            if part in _STOP_WORDS or len(part) < 2:
+                continue
+            if len(part) > 3 and part.endswith("s") and not part.endswith("ss"):
+                part = part[:-1]
+            terms.append(part)
+    return terms
+
+
+def _unit_vector(fields: Dict[str, str], field_weights: Dict[str, float]) -> Dict[str, float]:
+    weights = Counter()
+    for field, text in fields.items():
+        for term, count in Counter(tokenize(text)).items():
+            weights[term] += field_weights[field] * (1 + math.log(count))
+    norm = math.sqrt(sum(w * w for w in weights.values()))
+    return {term: w / norm for term, w in weights.items()} if norm else {}
+
+
+def design_terms(design: Dict[str, Any]) -> Dict[str, float]:
+    """Return the unit-length term vector a design is indexed under.
+
+    Terms come from circuit_info (name, description, categories), block names
+    and keywords, weighted by FIELD_WEIGHTS with sublinear term frequency.
+    """
+    info = design.get("circuit_info") or {}
+    blocks = [b for b in design.get("blocks") or [] if isinstance(b, dict)]
+    fields = {
+        "name": str(info.get("name", "")),
+        "categories": " ".join(str(c) for c in info.get("categories") or []),
+        "description": str(info.get("description", "")),
+        "block_names": " ".join(str(b.get("name", "")) for b in blocks),
+        "keywords": " ".join(str(k) for b in blocks for k in b.get("keywords") or [])
+    }
+    return _unit_vector(fields, FIELD_WEIGHTS)
+
+
+def text_terms(text: str) -> Dict[str, float]:
+    """Return the unit-length term vector of free text, such as the requirements a design answered."""
+    return _unit_vector({"text": text}, {"text": 1.0})
+
+
+def template_id_for(design: Dict[str, Any]) -> str:
+    """Content address of a design, so inserting the same design twice is a no-op."""
+    canonical = json.dumps(design, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return "template_" + hashlib.sha256(canonical.encode()).hexdigest()[:24]
+
+
+class TemplateIndex:
+    """Local TF-IDF retrieval index over validated designs.
+
+    Designs are indexed as unit-length vectors of their weighted terms, and
+    queries are weighted by inverse document frequency at search time
+    (SMART lnc.ltc), so a score is a cosine in [0, 1] and inserting a design
+    never re-weights the others: inserts are incremental. Designs generated
+    by the agent are also indexed under the requirements they answered, and
+    a template scores the better of its design and requirements cosines, so
+    asking for the same circuit again scores close to 1. Postings are
+    compact per-term arrays and a query only walks the postings of its own
+    terms. With a path, designs and their term vectors are kept in an SQLite
+    file that is reloaded on start; designs are then read from it on demand
+    instead of being held in memory.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._ids = []  # document number -> template_id
+        self._names = []  # document number -> circuit name
+        self._numbers = {}  # template_id -> document number
+        # vector ("design" or "requirements") -> term -> (array of document numbers, array of weights)
+        self._postings = {"design": {}, "requirements": {}}
+        self._designs = {}  # template_id -> design, when there is no SQLite file
+        self._conn = None
+        self.searches = 0
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS templates ("
+                "template_id TEXT PRIMARY KEY, name TEXT NOT NULL, terms TEXT NOT NULL, "
+                "design BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+            for template_id, name, terms in self._conn.execute("SELECT template_id, name, terms FROM templates ORDER BY rowid"):
+                self._index(template_id, name, json.loads(terms))
+
+    @classmethod
+    def from_env(cls) -> Optional["TemplateIndex"]:
+        """Create an index from TEMPLATE_INDEX_* environment variables, or None if disabled.
+
+        TEMPLATE_INDEX_SEED_DIR (default: the shared example designs) is
+        indexed on start; designs already in the index are skipped.
+        """
+        if os.getenv("TEMPLATE_INDEX", "0") == "0":
+            return None
+        index = cls(path=os.getenv("TEMPLATE_INDEX_PATH") or None)
+        default_seed = os.path.join(os.path.dirname(__file__), "..", "..", "shared", "examples", "sample_circuits")
+        seed_dir = os.getenv("TEMPLATE_INDEX_SEED_DIR", default_seed)
+        if seed_dir and os.path.isdir(seed_dir):
+            index.add_directory(seed_dir)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, design: Dict[str, Any], requirements: str = "") -> str:
+        """Index a validated design (and the requirements it answered) and return its template id."""
+        return self.add_many([(design, requirements)])[0]
+
+    def add_many(self, items: Iterable[Tuple[Dict[str, Any], str]]) -> List[str]:
+        """Index (design, requirements) pairs in one transaction; returns their template ids."""
+        template_ids = []
+        rows = []
+        now = time.time()
+        with self._lock:
+            for design, requirements in items:
+                template_id = template_id_for(design)
+                template_ids.append(template_id)
+                if template_id in self._numbers:
+                    continue
+                terms = {"design": design_terms(design), "requirements": text_terms(requirements)}
+                name = str((design.get("circuit_info") or {}).get("name", ""))
+                self._index(template_id, name, terms)
+                if self._conn is not None:
+                    rows.append((template_id, name, json.dumps(terms), json.dumps(design, ensure_ascii=False).encode(), now))
+                else:
+                    self._designs[template_id] = design
+            if rows:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO templates (template_id, name, terms, design, created_at) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.commit()
+        return template_ids
+
+    def add_directory(self, directory: str) -> List[str]:
+        """Index every design (*.json) in a directory; files that are not designs are skipped."""
+        items = []
+        for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path) as f:
+                    design = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if isinstance(design, dict) and isinstance(design.get("blocks"), list):
+                items.append((design, ""))
+        return self.add_many(items)
+
+    def get(self, template_id: str) -> Optional[Dict[str, Any]]:
+        """Return an indexed design, or None if unknown."""
+        if self._conn is None:
+            return self._designs.get(template_id)
+        with self._lock:
+            row = self._conn.execute("SELECT design FROM templates WHERE template_id = ?", (template_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def search(self, text: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Return up to limit {"template_id", "name", "score"} matches for text, best first."""
+        query = Counter(tokenize(text))
+        with self._lock:
+            self.searches += 1
+            total = len(self._ids)
+            if not total or not query:
+                return []
+            scores = self._cosines(self._postings["design"], query, total)
+            for number, score in self._cosines(self._postings["requirements"], query, total).items():
+                if score > scores.get(number, 0.0):
+                    scores[number] = score
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [
+                {"template_id": self._ids[number], "name": self._names[number], "score": round(min(score, 1.0), 4)}
+                for number, score in best
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "templates": len(self._ids),
+                "terms": len(self._postings["design"].keys() | self._postings["requirements"].keys()),
+                "postings": sum(len(numbers) for postings in self._postings.values() for numbers, _ in postings.values()),
+                "searches": self.searches,
+                "persistent": self._conn is not None
+            }
+
+    @staticmethod
+    def _cosines(postings: Dict[str, Tuple[array, array]], query: Counter, total: int) -> Dict[int, float]:
+        """Cosine of the idf-weighted query with every document sharing a term with it."""
+        weights = {}
+        for term, count in query.items():
+            df = len(postings[term][0]) if term in postings else 0
+            weights[term] = (1 + math.log(count)) * (math.log((total + 1) / (df + 1)) + 1)
+        # Normalized over every query term, so that terms no template has lower the score
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        scores = {}
+        get = scores.get
+        for term, weight in weights.items():
+            if term not in postings:
+                continue
+            numbers, doc_weights = postings[term]
+            if total >= MAX_DF_MIN_TEMPLATES and len(numbers) > total * MAX_DF_FRACTION:
+                continue
+            weight /= norm
+            for number, doc_weight in zip(numbers, doc_weights):
+                scores[number] = get(number, 0.0) + weight * doc_weight
+        return scores
+
+    def _index(self, template_id: str, name: str, terms: Dict[str, Dict[str, float]]) -> None:
+        number = len(self._ids)
+        self._ids.append(template_id)
+        self._names.append(name)
+        self._numbers[template_id] = number
+        for vector, vector_terms in terms.items():
+            index = self._postings[vector]
+            for term, weight in vector_terms.items():
+                postings = index.get(term)
+                if postings is None:
+                    postings = index[term] = (array("i"), array("f"))
+                postings[0].append(number)
+                postings[1].append(weight)
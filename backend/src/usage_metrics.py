@@ -0,0 +1,141 @@
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+
+from observability import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+LLM_REQUEST_SECONDS = REGISTRY.histogram("llm_request_duration_seconds", "LLM call latency to the last token, by call type")
+LLM_FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    "llm_time_to_first_token_seconds", "Streamed LLM call latency to the first text chunk, by call type"
+)
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total", "LLM tokens by call type and kind (input, output, cache_creation_input, cache_read_input)"
+)
+
+
+class UsageMetrics:
+    """Per-call and aggregate token usage, including prompt cache reads and writes."""
+
+    def __init__(self, recent_calls: int = 100):
+        self._lock = threading.Lock()
+        self.recent = deque(maxlen=recent_calls)
+        self.totals = {}
+
+    def record(self, call_type: str, usage: Any, seconds: float = 0.0,
+               first_token_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Record the usage block and latency of one Messages API response and return the per-call metrics.
+
+        first_token_seconds is only known for streamed calls.
+        """
+        call = {
+            "call_type": call_type,
+            "seconds": round(seconds, 4),
+            "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+            "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0
+        }
+        # input_tokens only counts the uncached part of the prompt
+        prompt_tokens = call["input_tokens"] + call["cache_creation_input_tokens"] + call["cache_read_input_tokens"]
+        call["cache_hit_rate"] = round(call["cache_read_input_tokens"] / prompt_tokens, 4) if prompt_tokens else 0.0
+        if first_token_seconds is not None:
+            call["first_token_seconds"] = round(first_token_seconds, 4)
+            LLM_FIRST_TOKEN_SECONDS.observe(first_token_seconds, call_type=call_type)
+        LLM_REQUEST_SECONDS.observe(seconds, call_type=call_type)
+        for key in ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"):
+            if call[key]:
+                LLM_TOKENS.inc(call[key], call_type=call_type, kind=key[:-len("_tokens")])
+        logger.debug("LLM call", extra=call)
+
+        with self._lock:
+            self.recent.append(call)
+            totals = self.totals.setdefault(call_type, {
+                "calls": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "cache_creation_input_tokens": 0,
+                "cache_read_input_tokens": 0,
+                "seconds": 0.0
+            })
+            totals["calls"] += 1
+            totals["seconds"] += seconds
+            for key in ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"):
+                totals[key] += call[key]
+        return call
+
+    def summary(self) -> Dict[str, Any]:
+        """Return totals per call type with their prompt cache hit rate."""
+        with self._lock:
+            by_type = {}
+            for call_type, totals in self.totals.items():
+                prompt_tokens = totals["input_tokens"] + totals["cache_creation_input_tokens"] + totals["cache_read_input_tokens"]
+                by_type[call_type] = dict(
+                    totals,
+                    cache_hit_rate=round(totals["cache_read_input_tokens"] / prompt_tokens, 4) if prompt_tokens else 0.0
+                )
+            return {"by_call_type": by_type, "recent_calls": list(self.recent)}
+
+    def average(self, call_type: str) -> Dict[str, float]:
+        """Return the mean prompt tokens, output tokens and seconds of one call type."""
+        with self._lock:
+            totals = self.totals.get(call_type)
+            if not totals or not totals["calls"]:
+                return {"prompt_tokens": 0.0, "output_tokens": 0.0, "seconds": 0.0}
+            calls = totals["calls"]
+            prompt_tokens = totals["input_tokens"] + totals["cache_creation_input_tokens"] + totals["cache_read_input_tokens"]
+            return {
+                "prompt_tokens": prompt_tokens / calls,
+                "output_tokens": totals["output_tokens"] / calls,
+                "seconds": totals["seconds"] / calls
+            }
+
+
+class RepairMetrics:
+    """How often each recovery tier rescues a generated design, and what it saves.
+
+    Tiers: "clean" (parsed and valid as returned), "local_repair" (valid after
+    the local JSON repair pass), "llm_patch" (valid after a targeted patch
+    call) and "failed" (needs a full regeneration). Savings are estimated
+    against the average cost of a full design generation call, minus every
+    token spent on "repair" calls, successful or not.
+    """
+
+    TIERS = ("clean", "local_repair", "llm_patch", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {tier: 0 for tier in self.TIERS}
+        self.seconds = {tier: 0.0 for tier in self.TIERS}
+
+    def record(self, tier: str, seconds: float) -> None:
+        """Record the outcome of one design recovery and the time it took."""
+        with self._lock:
+            self.counts[tier] += 1
+            self.seconds[tier] += seconds
+
+    def summary(self, usage_metrics: UsageMetrics) -> Dict[str, Any]:
+        """Return tier counts and rates with the estimated tokens and seconds saved."""
+        full = usage_metrics.average("design")
+        full_tokens = full["prompt_tokens"] + full["output_tokens"]
+        repair = usage_metrics.average("repair")
+        repair_calls = usage_metrics.totals.get("repair", {}).get("calls", 0)
+        patch_tokens = repair_calls * (repair["prompt_tokens"] + repair["output_tokens"])
+        with self._lock:
+            rescued = self.counts["local_repair"] + self.counts["llm_patch"]
+            saved_tokens = rescued * full_tokens - patch_tokens
+            # Failed attempts still cost their repair time
+            saved_seconds = rescued * full["seconds"] - self.seconds["local_repair"] - self.seconds["llm_patch"] - self.seconds["failed"]
+            total = sum(self.counts.values())
+            return {
+                "counts": dict(self.counts),
+                "success_rate": {
+                    tier: round(self.counts[tier] / total, 4) if total else 0.0 for tier in self.TIERS
+                },
+                "seconds": {tier: round(value, 4) for tier, value in self.seconds.items()},
+                "patch_tokens": round(patch_tokens),
+                "estimated_saved_tokens": round(saved_tokens),
+                "estimated_saved_seconds": round(saved_seconds, 3)
+            }
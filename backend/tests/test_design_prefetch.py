@@ -0,0 +1,42 @@
+import asyncio
+
+from circuit_agent import CircuitDesignAgent
+from design_prefetch import DesignPrefetcher
+from llm_backend import FakeBackend
+from template_index import TemplateIndex
+
+READY = "To recap: a 1-10kHz square oscillator on ±12V. Shall I generate the design?"
+
+
+def make_session():
+    agent = CircuitDesignAgent(backend=FakeBackend(), template_index=TemplateIndex())
+    session = agent.for_session()
+    session.start_design_session("Make a 555 square wave oscillator")
+    session.process_user_response("1-10kHz, ±12V")
+    return agent, session
+
+
+def test_discarded_prefetch_is_not_indexed():
+    agent, session = make_session()
+
+    async def run():
+        prefetcher = DesignPrefetcher()
+        assert prefetcher.start("s1", session, READY)
+        await asyncio.sleep(0.05)
+        prefetcher.discard("s1")
+
+    asyncio.run(run())
+    assert len(agent.template_index) == 0
+
+
+def test_taken_prefetch_is_indexed_once():
+    agent, session = make_session()
+
+    async def run():
+        prefetcher = DesignPrefetcher()
+        assert prefetcher.start("s1", session, READY)
+        return await prefetcher.take("s1", session.session_state())
+
+    design, _ = asyncio.run(run())
+    assert "error" not in design
+    assert len(agent.template_index) == 1
@@ -0,0 +1,27 @@
+import copy
+
+from design_store import DesignStore
+from llm_backend import FAKE_DESIGN
+
+
+def test_get_returns_a_copy_the_caller_may_modify():
+    store = DesignStore()
+    design_id = store.put(copy.deepcopy(FAKE_DESIGN))
+    body, _ = store.view(design_id)
+    design = store.get(design_id)
+    design["circuit_info"]["name"] = "X"
+    design["blocks"][0]["inputs"].clear()
+    assert store.get(design_id) == FAKE_DESIGN
+    assert store.view(design_id)[0] == body
+
+
+def test_sqlite_file_shared_with_sessions(tmp_path, monkeypatch):
+    from session_store import SessionManager
+
+    monkeypatch.setenv("DESIGN_STORE_BACKEND", f"sqlite:{tmp_path / 'shared.db'}")
+    monkeypatch.setenv("SESSION_BACKEND", f"sqlite:{tmp_path / 'shared.db'}")
+    store = DesignStore.from_env()
+    sessions = SessionManager.from_env()
+    design_id = store.put(copy.deepcopy(FAKE_DESIGN))
+    sessions.backend.purge(float("inf"))
+    assert DesignStore.from_env().get(design_id) == FAKE_DESIGN
@@ -0,0 +1,45 @@
+import copy
+import re
+
+import pytest
+
+from circuit_agent import DESIGN_SYSTEM_PROMPT, REPAIR_SYSTEM_PROMPT, SKELETON_SYSTEM_PROMPT
+from design_validator import validate_design
+from llm_backend import FAKE_DESIGN
+
+
+def with_supply(voltage):
+    design = copy.deepcopy(FAKE_DESIGN)
+    design["circuit_info"]["supply_voltage"] = voltage
+    return design
+
+
+def prompt_examples(prompt):
+    """The supply_voltage examples a prompt gives: each value and the whole list as one value."""
+    listed = re.search(r'"supply_voltage": "string \(ex: (.*?), etc\.\)"', prompt).group(1)
+    return listed.split(", ") + [listed]
+
+
+@pytest.mark.parametrize("voltage", prompt_examples(DESIGN_SYSTEM_PROMPT) + prompt_examples(SKELETON_SYSTEM_PROMPT))
+def test_prompt_supply_voltage_examples_validate(voltage):
+    assert validate_design(with_supply(voltage))["valid"]
+
+
+@pytest.mark.parametrize("voltage", ["±12V", "+5V", "±12V, +5V", "+12V/-12V", "+12V -12V", "9V", "3.3V"])
+def test_supply_voltage_notations_validate(voltage):
+    assert validate_design(with_supply(voltage))["valid"]
+
+
+@pytest.mark.parametrize("voltage", ["", "twelve volts", "12", "±12V,"])
+def test_malformed_supply_voltage_is_rejected(voltage):
+    result = validate_design(with_supply(voltage))
+    assert not result["valid"]
+    assert any("supply_voltage" in error for error in result["errors"])
+
+
+def test_repair_prompt_supply_voltage_examples_validate():
+    line = next(line for line in REPAIR_SYSTEM_PROMPT.splitlines() if "supply_voltage must look like" in line)
+    examples = re.findall(r'"([^"]+)"', line)
+    assert examples
+    for voltage in examples:
+        assert validate_design(with_supply(voltage))["valid"], voltage
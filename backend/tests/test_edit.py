@@ -0,0 +1,32 @@
+import copy
+
+import pytest
+
+from circuit_agent import CircuitDesignAgent
+from llm_backend import FAKE_DESIGN, FakeBackend
+
+
+@pytest.fixture
+def agent():
+    return CircuitDesignAgent(backend=FakeBackend())
+
+
+@pytest.mark.parametrize("path, value", [("/blocks/-", "x"), ("/signal_flow/-", 42), ("/blocks/0", None)])
+def test_edit_rejects_non_dict_blocks_and_flows(agent, path, value):
+    op = "replace" if path == "/blocks/0" else "add"
+    result = agent.edit_circuit_design(copy.deepcopy(FAKE_DESIGN), patch=[{"op": op, "path": path, "value": value}])
+    assert result["error"] == "Edit patch produced invalid blocks"
+
+
+def test_edit_applies_valid_patch(agent):
+    patch = [{"op": "replace", "path": "/blocks/1/name", "value": "Square Core"}]
+    result = agent.edit_circuit_design(copy.deepcopy(FAKE_DESIGN), patch=patch)
+    assert "error" not in result
+    assert result["changed_blocks"] == ["osc_core"]
+
+
+def test_edit_rejects_copied_block_with_duplicate_id(agent):
+    patch = [{"op": "copy", "from": "/blocks/1", "path": "/blocks/-"}]
+    result = agent.edit_circuit_design(copy.deepcopy(FAKE_DESIGN), patch=patch)
+    assert result["error"] == "Edited design failed validation"
+    assert "Duplicate block ID: osc_core" in result["validation_errors"]
@@ -0,0 +1,19 @@
+import pytest
+
+from json_patch import JsonPatchError, apply_patch
+
+
+def test_replace_whole_document():
+    document = {"a": 1}
+    assert apply_patch(document, [{"op": "replace", "path": "", "value": [1, 2]}]) == [1, 2]
+    assert document == {"a": 1}
+
+
+def test_replace_missing_member_fails():
+    with pytest.raises(JsonPatchError):
+        apply_patch({"a": 1}, [{"op": "replace", "path": "/b", "value": 2}])
+
+
+def test_remove_whole_document_fails():
+    with pytest.raises(JsonPatchError):
+        apply_patch({"a": 1}, [{"op": "remove", "path": ""}])
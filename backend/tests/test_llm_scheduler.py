@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+
+from llm_backend import LLMResponse, Usage
+from llm_scheduler import LLMScheduler
+
+
+def test_call_releases_slot_when_response_has_no_usage():
+    scheduler = LLMScheduler(max_concurrency=1)
+    with pytest.raises(AttributeError):
+        scheduler.call(lambda params, call_type: None, {}, "question")
+    assert scheduler.stats()["in_flight"] == 0
+    assert scheduler.call(lambda params, call_type: LLMResponse("ok", Usage()), {}, "question").text == "ok"
+
+
+def test_call_async_releases_slot_when_response_has_no_usage():
+    scheduler = LLMScheduler(max_concurrency=1)
+
+    async def broken(params, call_type):
+        return None
+
+    with pytest.raises(AttributeError):
+        asyncio.run(scheduler.call_async(broken, {}, "question"))
+    assert scheduler.stats()["in_flight"] == 0
@@ -0,0 +1,80 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from circuit_agent import CircuitDesignAgent
+from llm_backend import FakeBackend, LLMRequestError, LocalMessageBatches, MessageBatchBackend
+
+
+def params(text, temperature=0.0):
+    return {"model": "m", "max_tokens": 10, "temperature": temperature, "messages": [{"role": "user", "content": text}]}
+
+
+def make_backend(batches=None, **kwargs):
+    return MessageBatchBackend(batches or LocalMessageBatches(delay=0.05), collect_window=0.05, poll_interval=0.01, **kwargs)
+
+
+def test_sync_calls_from_threads_share_one_batch():
+    backend = make_backend()
+    with ThreadPoolExecutor(4) as executor:
+        responses = list(executor.map(lambda i: backend.create(params(str(i)), "question"), range(4)))
+    assert all(response.text for response in responses)
+    assert backend.stats()["batches_submitted"] == 1
+
+
+def test_async_callers_share_identical_requests():
+    backend = make_backend()
+
+    async def run():
+        first = asyncio.create_task(backend.create_async(params("x"), "design"))
+        second = asyncio.create_task(backend.create_async(params("x"), "design"))
+        await asyncio.sleep(0.02)
+        # A cancelled caller does not cancel the request the other one waits for
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()).text
+    assert backend.stats() == {"batches_submitted": 1, "batches_resumed": 0, "results": 1, "waiting": 0}
+
+
+def test_sampled_calls_get_their_own_requests(tmp_path):
+    journal = str(tmp_path / "batches.jsonl")
+    backend = make_backend(journal_path=journal)
+
+    async def candidates():
+        return await asyncio.gather(*(backend.create_async(params("x", 0.7), "design") for _ in range(3)))
+
+    asyncio.run(candidates())
+    backend.create(params("x", 0.7), "design")
+    assert backend.stats()["results"] == 4
+    # A restarted run making the same sampled calls finds them in the journal
+    restarted = make_backend(journal_path=journal)
+    restarted.create(params("x", 0.7), "design")
+    assert restarted.stats()["batches_submitted"] == 0
+
+
+def test_invalid_request_raises_non_retryable_error():
+    class Rejecting(FakeBackend):
+        def create(self, params, call_type="chat"):
+            raise LLMRequestError("prompt is too long", 400)
+
+    backend = make_backend(LocalMessageBatches(Rejecting()))
+    with pytest.raises(LLMRequestError) as error:
+        backend.create(params("x"), "design")
+    assert not error.value.retryable
+
+
+def test_journal_answers_a_restarted_run(tmp_path):
+    journal = str(tmp_path / "batches.jsonl")
+    text = make_backend(journal_path=journal).create(params("x"), "design").text
+    restarted = make_backend(journal_path=journal)
+    assert restarted.create(params("x"), "design").text == text
+    assert restarted.stats()["batches_submitted"] == 0
+
+
+def test_agent_sync_session_through_batches():
+    agent = CircuitDesignAgent(backend=make_backend())
+    assert agent.start_design_session("Make a 555 square wave oscillator")
+    design = agent.generate_circuit_design()
+    assert "error" not in design
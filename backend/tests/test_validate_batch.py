@@ -0,0 +1,36 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+from fastapi.testclient import TestClient
+
+import server
+from llm_backend import FAKE_DESIGN
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(server.app) as client:
+        yield client
+
+
+def test_json_array_body_gets_a_json_array(client):
+    response = client.post("/api/circuit/validate/batch?batch_size=2", json=[FAKE_DESIGN] * 5 + [{"blocks": 1}])
+    assert response.headers["content-type"].startswith("application/json")
+    results = response.json()
+    assert [result.get("valid") for result in results[:-1]] == [True] * 5 + [False]
+    assert results[-1]["summary"]["valid"] == 5
+
+
+def test_ndjson_body_gets_one_result_per_line(client):
+    body = "\n".join(json.dumps(FAKE_DESIGN) for _ in range(3)) + "\nnot json\n"
+    response = client.post("/api/circuit/validate/batch?batch_size=2", content=body,
+                           headers={"Content-Type": "application/x-ndjson"})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line.get("valid") for line in lines[:-1]] == [True, True, True, False]
+    assert lines[-1]["summary"]["valid"] == 3
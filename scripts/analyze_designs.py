@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Batch signal-graph analysis CLI: reachability, orphans, unpowered blocks, fan-out, loops and power budget
+"""
+
+import argparse
+import json
+import os
+import sys
+
+# Add the backend src directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'src'))
+
+from batch_validation import iter_design_sources, analyze_corpus, AnalysisSummary
+from design_analysis import DEFAULT_MAX_FAN_OUT
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze directories, .json files and .jsonl files of circuit designs")
+    parser.add_argument("paths", nargs="+", help="Design files, JSONL files or directories")
+    parser.add_argument("-o", "--output", help="Write per-design results as JSONL here (default: stdout)")
+    parser.add_argument("--summary", help="Also write the summary JSON to this file")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Designs per worker task")
+    parser.add_argument("--max-fan-out", type=int, default=DEFAULT_MAX_FAN_OUT,
+                        help="Edges of one signal type a block may drive before it is reported")
+    parser.add_argument("--issues-only", action="store_true", help="Only write results for invalid designs or designs with issues")
+    parser.add_argument("--fail-on-issues", action="store_true", help="Exit with status 1 if any design has issues")
+    args = parser.parse_args()
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    summary = AnalysisSummary()
+
+    try:
+        results = analyze_corpus(
+            iter_design_sources(args.paths),
+            workers=args.workers,
+            batch_size=args.batch_size,
+            max_fan_out=args.max_fan_out
+        )
+        for result in results:
+            summary.add(result)
+            analysis = result["analysis"]
+            if args.issues_only and result["valid"] and not any(analysis["issues"].values()):
+                continue
+            output.write(json.dumps(result) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    summary_json = json.dumps(summary.as_dict(), indent=2)
+    print(summary_json, file=sys.stderr)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            f.write(summary_json + "\n")
+
+    failed = summary.valid < summary.total or (args.fail_on_issues and summary.with_issues)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
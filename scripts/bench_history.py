@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark prompt size and latency over long design sessions, with and without history compaction
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+# Add the backend src directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'src'))
+
+from circuit_agent import CircuitDesignAgent
+from llm_backend import FakeBackend
+
+# A long-winded follow-up reply, like the recommendations the real model gives
+FOLLOW_UP_REPLY = " ".join([
+    "Based on your answers I recommend an exponential converter with a matched transistor pair,",
+    "a temperature compensated tempco resistor, a triangle core built around an OTA integrator,",
+    "and a wave shaper for sine and square outputs. Please confirm the output levels you need."
+] * 6)
+
+
+def run_session(turns: int, budget: int, backend: FakeBackend, every: int):
+    """Run one session and yield per-turn prompt tokens and latency at every `every` turns."""
+    agent = CircuitDesignAgent(backend=backend, prompt_caching=False, history_token_budget=budget)
+    agent.start_design_session("Eurorack VCO with sine, triangle and square outputs")
+    for turn in range(1, turns + 1):
+        answer = f"Answer {turn}: ±12V supply, 20Hz-20kHz range, 1V/oct CV input and a sync input."
+        start = time.perf_counter()
+        agent.process_user_response(answer)
+        seconds = time.perf_counter() - start
+        if turn % every == 0:
+            call = agent.usage_metrics.recent[-1]
+            yield {
+                "budget": budget,
+                "turn": turn,
+                "history_messages": len(agent.conversation_history),
+                "prompt_tokens": call["input_tokens"] + call["cache_creation_input_tokens"] + call["cache_read_input_tokens"],
+                "latency_ms": round(seconds * 1000, 1)
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark history compaction on long sessions (fake LLM backend)")
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--every", type=int, default=10, help="Report every N turns")
+    parser.add_argument("--budget", type=int, default=4000, help="History token budget for the compacted run")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fixed fake LLM latency in seconds")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=20000,
+                        help="Fake LLM prompt processing rate, which makes latency grow with prompt size")
+    args = parser.parse_args()
+
+    backend = FakeBackend(
+        replies={"follow_up": FOLLOW_UP_REPLY},
+        latency=args.latency,
+        prefill_tokens_per_second=args.prefill_tokens_per_second
+    )
+    for budget in (0, args.budget):
+        for result in run_session(args.turns, budget, backend, args.every):
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
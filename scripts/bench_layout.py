@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Benchmark the layered layout engine on synthetic designs
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+# Add the backend src directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'src'))
+
+from layout import layout_design, place_new_blocks
+from synthetic_designs import make_synthetic_design
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full and incremental layout")
+    parser.add_argument("--sizes", default="10,100,1000,5000,10000", help="Comma-separated synthetic block counts")
+    args = parser.parse_args()
+
+    for size in [int(x) for x in args.sizes.split(",")]:
+        design = make_synthetic_design(size)
+        start = time.perf_counter()
+        positions = layout_design(design["blocks"], design["signal_flow"])
+        full_seconds = time.perf_counter() - start
+
+        design["blocks"].append({"id": "added", "inputs": [], "outputs": [{"signal_type": "audio_signal", "name": "Out"}]})
+        design["signal_flow"].append({"signal_type": "audio_signal", "from_block": design["blocks"][-2]["id"], "to_block": "added"})
+        start = time.perf_counter()
+        place_new_blocks(positions, design["blocks"], design["signal_flow"], ["added"])
+        incremental_seconds = time.perf_counter() - start
+
+        print(json.dumps({
+            "blocks": size,
+            "edges": len(design["signal_flow"]),
+            "layers": len({p["x"] for p in positions.values()}),
+            "full_layout_ms": round(full_seconds * 1000, 2),
+            "incremental_layout_ms": round(incremental_seconds * 1000, 3)
+        }))
+
+
+if __name__ == "__main__":
+    main()
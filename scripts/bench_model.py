@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Design model benchmark: parsed-JSON dicts versus design_model.Design
+
+For synthetic designs of each --blocks size, reports the memory retained by
+the parsed dict and by the typed model (tracemalloc), the cost of building
+the model, adjacency lookups versus scanning signal_flow, and response
+serialization with json, orjson (if installed) and the pydantic response
+model the server used before.
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+# Add the backend src directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'src'))
+
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+import design_model
+from design_model import Design
+from synthetic_designs import make_synthetic_design
+
+
+class CircuitDesignResponse(BaseModel):
+    # Same fields as server.CircuitDesignResponse (importing the server would start its app)
+    circuit_design: Dict[str, Any]
+    success: bool
+    errors: Optional[List[str]] = None
+    design_id: Optional[str] = None
+    template: Optional[Dict[str, Any]] = None
+
+
+def retained_bytes(build):
+    """Memory still allocated by the object build() returns, and the object."""
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, value
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Design model memory and serialization benchmark")
+    parser.add_argument("--blocks", default="1000,10000", help="Comma-separated design sizes")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for n in (int(size) for size in args.blocks.split(",")):
+        text = json.dumps(make_synthetic_design(n))
+        dict_bytes, design = retained_bytes(lambda: json.loads(text))
+        model_bytes, model = retained_bytes(lambda: Design.from_dict(json.loads(text)))
+        assert model.to_dict() == design
+
+        build = best_of(lambda: Design.from_dict(design), args.repeat)
+        ids = [block["id"] for block in design["blocks"][::max(1, n // 100)]]
+        scan = best_of(lambda: [[f for f in design["signal_flow"] if f["from_block"] == i] for i in ids], args.repeat)
+        indexed = best_of(lambda: [model.adjacency.successors.get(i) for i in ids], args.repeat)
+
+        json_time = best_of(lambda: json.dumps(design, separators=(",", ":"), ensure_ascii=False).encode(), args.repeat)
+        fast_time = best_of(lambda: design_model.dumps(design), args.repeat)
+        pydantic_time = best_of(
+            lambda: json.dumps(CircuitDesignResponse(circuit_design=design, success=True, design_id="design_x").model_dump()),
+            args.repeat
+        )
+        print(json.dumps({
+            "blocks": n,
+            "edges": len(design["signal_flow"]),
+            "dict_mb": round(dict_bytes / 2 ** 20, 2),
+            "model_mb": round(model_bytes / 2 ** 20, 2),
+            "memory_saved": round(1 - model_bytes / dict_bytes, 3),
+            "model_build_ms": round(build * 1000, 1),
+            "successor_lookup_scan_ms": round(scan * 1000, 2),
+            "successor_lookup_indexed_ms": round(indexed * 1000, 3),
+            "serializer": "orjson" if design_model.orjson is not None else "json",
+            "json_dumps_ms": round(json_time * 1000, 1),
+            "fast_dumps_ms": round(fast_time * 1000, 1),
+            "pydantic_response_ms": round(pydantic_time * 1000, 1)
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark the LLM scheduler against a fake backend that injects 429/529 throttling
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+# Add the backend src directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'src'))
+
+from circuit_agent import CircuitDesignAgent
+from llm_backend import FakeBackend, LLMError, ThrottlingBackend
+from llm_scheduler import LLMScheduler, DEFAULT_PRIORITIES
+
+
+async def run_session(agent: CircuitDesignAgent, i: int) -> dict:
+    """Run one question/answer/generate session; a session is lost if any turn fails."""
+    session = agent.for_session()
+    start = time.perf_counter()
+    try:
+        await session.start_design_session_async(f"Eurorack VCO #{i}")
+        question_seconds = time.perf_counter() - start
+        await session.process_user_response_async("±12V supply, 20Hz-20kHz, 1V/oct CV input")
+        design = await session.generate_circuit_design_async()
+    except LLMError as e:
+        return {"lost": True, "error": type(e).__name__}
+    return {"lost": "error" in design, "question_seconds": question_seconds, "seconds": time.perf_counter() - start}
+
+
+async def background_load(agent: CircuitDesignAgent, calls: int) -> None:
+    """Bulk per-block detail calls competing with the interactive sessions."""
+    async def detail(i):
+        try:
+            await agent._get_claude_response_async("Describe the block.", f"Block {i}", call_type="block_detail")
+        except LLMError:
+            pass
+    await asyncio.gather(*(detail(i) for i in range(calls)))
+
+
+async def run(name: str, args, scheduler: LLMScheduler) -> dict:
+    backend = ThrottlingBackend(
+        FakeBackend(latency=args.latency),
+        requests_per_minute=args.api_rpm, overload_rate=args.overload_rate, seed=0
+    )
+    agent = CircuitDesignAgent(backend=backend, scheduler=scheduler, prompt_caching=False)
+    start = time.perf_counter()
+    background = asyncio.create_task(background_load(agent, args.background_calls))
+    # Let the bulk calls fill the queue first, so the sessions' calls have to overtake them
+    await asyncio.sleep(args.latency)
+    sessions = await asyncio.gather(*(run_session(agent, i) for i in range(args.sessions)))
+    await background
+    completed = [s for s in sessions if not s["lost"]]
+    questions = sorted(s["question_seconds"] for s in completed)
+    return {
+        "scheduler": name,
+        "sessions": args.sessions,
+        "lost_sessions": len(sessions) - len(completed),
+        "api_rejections": backend.rejected,
+        "retries": scheduler.retries,
+        "elapsed_s": round(time.perf_counter() - start, 2),
+        "question_p50_ms": round(questions[len(questions) // 2] * 1000) if questions else None,
+        "question_max_ms": round(questions[-1] * 1000) if questions else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retries, rate limiting and priorities against a throttling fake backend")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--background-calls", type=int, default=100, help="Concurrent block_detail calls")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake LLM latency in seconds")
+    parser.add_argument("--api-rpm", type=int, default=150, help="Requests per minute above which the fake API returns 429")
+    parser.add_argument("--overload-rate", type=float, default=0.05, help="Fraction of calls answered with 529")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    flat = {call_type: 1 for call_type in DEFAULT_PRIORITIES}
+    configurations = [
+        ("no retries", LLMScheduler(max_concurrency=args.concurrency, max_retries=0, priorities=flat)),
+        ("retries", LLMScheduler(max_concurrency=args.concurrency, max_retries=8, base_delay=0.05, max_delay=1.0,
+                                 priorities=flat)),
+        ("retries + rpm limit", LLMScheduler(max_concurrency=args.concurrency, requests_per_minute=args.api_rpm * 0.9,
+                                             max_retries=8, base_delay=0.05, max_delay=1.0, priorities=flat)),
+        ("retries + rpm limit + priority", LLMScheduler(max_concurrency=args.concurrency, requests_per_minute=args.api_rpm * 0.9,
+                                                        max_retries=8, base_delay=0.05, max_delay=1.0))
+    ]
+    for name, scheduler in configurations:
+        print(json.dumps(asyncio.run(run(name, args, scheduler))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Static server benchmark: the previous serve_static.py versus the current one
+
+Both servers run in their own process over the same temporary site (an
+index.html and a synthetic design JSON of --blocks blocks, precompressed for
+the current server). Concurrent keep-alive clients then request each
+scenario for --seconds and report requests per second and latency
+percentiles:
+
+- full: plain GET of the design JSON
+- gzip: the same with Accept-Encoding: gzip (the previous server ignores it)
+- revalidate: conditional GET with the validators of the last response
+- small: plain GET of index.html
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+# Add the backend src directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'src'))
+
+from synthetic_designs import make_synthetic_design
+
+SCENARIOS = ("full", "gzip", "revalidate", "small")
+
+
+def run_legacy(directory, port):
+    """The server serve_static.py ran before: single-threaded TCPServer plus SimpleHTTPRequestHandler with CORS."""
+    import http.server
+    import socketserver
+
+    class CORSHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+        def end_headers(self):
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+            super().end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    os.chdir(directory)
+    with socketserver.TCPServer(("127.0.0.1", port), CORSHTTPRequestHandler) as httpd:
+        httpd.serve_forever()
+
+
+def run_current(directory, port):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import serve_static
+    server = serve_static.make_server("127.0.0.1", port, [("/", directory)], watch=False, quiet=True)
+    server.serve_forever()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def client(port, scenario, deadline, latencies, errors):
+    path = "/index.html" if scenario == "small" else "/design.json"
+    headers = {"Accept-Encoding": "gzip"} if scenario == "gzip" else {}
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            # http.client reconnects by itself after a response that closes the connection (HTTP/1.0)
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors.append(1)
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - start)
+        if scenario == "revalidate" and response.status == 200:
+            headers = {}
+            if response.getheader("ETag"):
+                headers["If-None-Match"] = response.getheader("ETag")
+            if response.getheader("Last-Modified"):
+                headers["If-Modified-Since"] = response.getheader("Last-Modified")
+    connection.close()
+
+
+def bench(port, scenario, concurrency, seconds):
+    latencies = []
+    errors = []
+    deadline = time.monotonic() + seconds
+    threads = [threading.Thread(target=client, args=(port, scenario, deadline, latencies, errors)) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2) if latencies else None
+
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": round(len(latencies) / seconds, 1),
+        "p50_ms": percentile(0.5),
+        "p99_ms": percentile(0.99)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Static server requests/sec benchmark")
+    parser.add_argument("--blocks", type=int, default=500, help="Blocks in the synthetic design served as JSON")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=3.0, help="Duration of each scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    args = parser.parse_args()
+
+    import serve_static
+    directory = tempfile.mkdtemp(prefix="bench_static_")
+    try:
+        with open(os.path.join(directory, "design.json"), "w") as f:
+            json.dump(make_synthetic_design(args.blocks), f, indent=2)
+        with open(os.path.join(directory, "index.html"), "w") as f:
+            f.write("<!doctype html><html><head><title>Circuit Designer</title></head><body><div id=\"root\"></div></body></html>\n")
+        serve_static.precompress([directory])
+        sizes = {name: os.path.getsize(os.path.join(directory, name)) for name in sorted(os.listdir(directory))}
+
+        for name, target in (("legacy", run_legacy), ("current", run_current)):
+            port = free_port()
+            process = multiprocessing.Process(target=target, args=(directory, port), daemon=True)
+            process.start()
+            try:
+                wait_for(port)
+                for scenario in args.scenarios.split(","):
+                    result = bench(port, scenario, args.concurrency, args.seconds)
+                    print(json.dumps(dict(server=name, scenario=scenario, concurrency=args.concurrency, files=sizes, **result)))
+            finally:
+                process.terminate()
+                process.join()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
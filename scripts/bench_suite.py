@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the agent and API hot paths, on the fake LLM backend
+
+Measures design JSON extraction/parsing throughput, validation and layout on
+synthetic designs, and per-endpoint throughput and p50/p99 latency under
+concurrent load. Results are written as one JSON document (with the git
+commit and environment) that --compare checks against a previous run.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+# Add the backend src directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'src'))
+
+from bench_validate import time_per_call
+from synthetic_designs import make_synthetic_design
+
+SUITES = ("parse", "validate", "layout", "api")
+
+
+def result(suite: str, name: str, value: float, unit: str, better: str, **extra) -> Dict[str, Any]:
+    """Build one benchmark result; (suite, name) identifies it across runs."""
+    record = {"suite": suite, "name": name, "value": round(value, 4), "unit": unit, "better": better}
+    record.update(extra)
+    print(json.dumps(record))
+    return record
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def bench_parse(sizes: List[int], min_seconds: float) -> List[Dict[str, Any]]:
+    """Throughput of extracting, parsing and validating design responses as the LLM returns them."""
+    from circuit_agent import CircuitDesignAgent
+    from json_repair import extract_json_object, repair_json
+    from llm_backend import FakeBackend
+
+    agent = CircuitDesignAgent(backend=FakeBackend(), auto_layout=False)
+    results = []
+    for size in sizes:
+        text = json.dumps(make_synthetic_design(size), indent=2)
+        response = f"Here is the circuit design:\n```json\n{text}\n```\nLet me know if you need changes."
+        truncated = response[:int(len(text) * 0.9)]
+        megabytes = len(response.encode()) / 1e6
+
+        seconds = time_per_call(lambda: json.loads(extract_json_object(response)), min_seconds)
+        results.append(result("parse", f"extract_json/{size}", megabytes / seconds, "MB/s", "higher",
+                              blocks=size, ms_per_call=round(seconds * 1000, 3)))
+        seconds = time_per_call(lambda: json.loads(repair_json(extract_json_object(truncated))), min_seconds)
+        results.append(result("parse", f"repair_truncated/{size}", megabytes * 0.9 / seconds, "MB/s", "higher",
+                              blocks=size, ms_per_call=round(seconds * 1000, 3)))
+        seconds = time_per_call(lambda: agent._parse_circuit_design(response), min_seconds)
+        results.append(result("parse", f"parse_circuit_design/{size}", 1 / seconds, "designs/s", "higher",
+                              blocks=size, ms_per_call=round(seconds * 1000, 3)))
+    return results
+
+
+def bench_validate(sizes: List[int], min_seconds: float) -> List[Dict[str, Any]]:
+    """validate_circuit_design latency on synthetic designs."""
+    from design_validator import validate_design
+
+    results = []
+    for size in sizes:
+        design = make_synthetic_design(size)
+        seconds = time_per_call(lambda: validate_design(design), min_seconds)
+        results.append(result("validate", f"validate_design/{size}", seconds * 1000, "ms", "lower",
+                              blocks=size, edges=len(design["signal_flow"])))
+    return results
+
+
+def bench_layout(sizes: List[int], min_seconds: float) -> List[Dict[str, Any]]:
+    """suggest_block_positions latency on synthetic designs."""
+    from circuit_agent import CircuitDesignAgent
+    from llm_backend import FakeBackend
+
+    agent = CircuitDesignAgent(backend=FakeBackend())
+    results = []
+    for size in sizes:
+        design = make_synthetic_design(size)
+        seconds = time_per_call(lambda: agent.suggest_block_positions(design["blocks"], design["signal_flow"]), min_seconds)
+        results.append(result("layout", f"suggest_block_positions/{size}", seconds * 1000, "ms", "lower",
+                              blocks=size, edges=len(design["signal_flow"])))
+    return results
+
+
+def request(method: str, url: str, payload: Any = None, headers: Optional[Dict[str, str]] = None) -> bytes:
+    """Send one HTTP request and return the response body."""
+    data = None
+    headers = dict(headers or {})
+    if payload is not None:
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        headers.setdefault("Content-Type", "application/json")
+    with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers, method=method)) as response:
+        return response.read()
+
+
+def load(call: Callable[[int], Any], concurrency: int, total: int) -> Dict[str, float]:
+    """Run total calls on concurrency threads and return throughput and latency percentiles."""
+    def timed(i):
+        start = time.perf_counter()
+        call(i)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(timed, range(total)))
+    elapsed = time.perf_counter() - start
+    return {
+        "throughput_rps": total / elapsed,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2)
+    }
+
+
+def bench_api(concurrency: int, requests_per_endpoint: int, llm_latency: float, design_blocks: int) -> List[Dict[str, Any]]:
+    """Throughput and p50/p99 latency of each endpoint on one uvicorn worker with the fake LLM backend."""
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["LLM_FAKE_LATENCY"] = str(llm_latency)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from load_test import start_api_server
+
+    api = start_api_server(None)
+    design = make_synthetic_design(design_blocks)
+    session_ids = [
+        json.loads(request("POST", f"{api}/api/session/start", {"description": f"Eurorack VCO #{i}"}))["session_id"]
+        for i in range(concurrency)
+    ]
+    generated = json.loads(request("POST", f"{api}/api/circuit/generate", {"session_id": session_ids[0]}))
+    design_id = generated["design_id"]
+    block_id = generated["circuit_design"]["blocks"][0]["id"]
+    batch = "\n".join(json.dumps(make_synthetic_design(20, seed=i)) for i in range(16)).encode()
+    rename = [{"op": "replace", "path": "/blocks/0/name", "value": "Renamed"}]
+
+    def session(i):
+        return session_ids[i % len(session_ids)]
+
+    endpoints = {
+        "GET /": lambda i: request("GET", f"{api}/"),
+        "POST /api/session/start": lambda i: request("POST", f"{api}/api/session/start", {"description": "Eurorack VCO"}),
+        "POST /api/session/respond": lambda i: request("POST", f"{api}/api/session/respond",
+                                                       {"session_id": session(i), "response": "±12V, 20Hz-20kHz"}),
+        "POST /api/circuit/generate": lambda i: request("POST", f"{api}/api/circuit/generate", {"session_id": session(i)}),
+        "POST /api/circuit/generate/stream": lambda i: request("POST", f"{api}/api/circuit/generate/stream",
+                                                               {"session_id": session(i)}),
+        "GET /api/circuit/{design_id}": lambda i: request("GET", f"{api}/api/circuit/{design_id}",
+                                                          headers={"Accept-Encoding": "gzip"}),
+        "GET /api/circuit/{design_id}/summary": lambda i: request("GET", f"{api}/api/circuit/{design_id}/summary"),
+        "GET /api/circuit/{design_id}/block/{block_id}": lambda i: request("GET", f"{api}/api/circuit/{design_id}/block/{block_id}"),
+        "POST /api/circuit/{design_id}/edit": lambda i: request("POST", f"{api}/api/circuit/{design_id}/edit", {"patch": rename}),
+        f"POST /api/circuit/validate ({design_blocks} blocks)": lambda i: request("POST", f"{api}/api/circuit/validate", design),
+        f"POST /api/circuit/layout ({design_blocks} blocks)": lambda i: request("POST", f"{api}/api/circuit/layout", design),
+        "POST /api/circuit/validate/batch (16 designs)": lambda i: request(
+            "POST", f"{api}/api/circuit/validate/batch", batch, {"Content-Type": "application/x-ndjson"}
+        ),
+        "GET /api/session/status": lambda i: request("GET", f"{api}/api/session/status?session_id={session(i)}"),
+        "GET /api/metrics/usage": lambda i: request("GET", f"{api}/api/metrics/usage"),
+        "GET /metrics": lambda i: request("GET", f"{api}/metrics")
+    }
+
+    results = []
+    for name, call in endpoints.items():
+        call(0)  # warm up (process pool, caches)
+        stats = load(call, concurrency, requests_per_endpoint)
+        results.append(result("api", name, stats.pop("throughput_rps"), "req/s", "higher",
+                              concurrency=concurrency, requests=requests_per_endpoint, **stats))
+    return results
+
+
+def environment() -> Dict[str, Any]:
+    """Describe where and on what the benchmark ran."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Return the results that are more than threshold (a fraction) worse than the baseline."""
+    previous = {(r["suite"], r["name"]): r for r in baseline["results"]}
+    regressions = []
+    for current in results:
+        before = previous.get((current["suite"], current["name"]))
+        if not before or not before["value"]:
+            continue
+        change = (current["value"] - before["value"]) / before["value"]
+        worse = change < -threshold if current["better"] == "higher" else change > threshold
+        if worse:
+            regressions.append({"suite": current["suite"], "name": current["name"], "baseline": before["value"],
+                                "value": current["value"], "unit": current["unit"], "change": round(change, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite (fake LLM backend, no API key needed)")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Comma-separated subset of {','.join(SUITES)}")
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="Synthetic block counts for validate/layout")
+    parser.add_argument("--parse-sizes", default="10,100,1000", help="Synthetic block counts for parsing")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="Minimum timing window per micro-benchmark")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Fake LLM latency in seconds")
+    parser.add_argument("--design-blocks", type=int, default=100, help="Design size for the validate/layout endpoints")
+    parser.add_argument("-o", "--output", help="Write the results document (JSON) here")
+    parser.add_argument("--compare", help="Results document of a previous run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    suites = args.suites.split(",")
+    sizes = [int(x) for x in args.sizes.split(",")]
+    results = []
+    if "parse" in suites:
+        results += bench_parse([int(x) for x in args.parse_sizes.split(",")], args.min_seconds)
+    if "validate" in suites:
+        results += bench_validate(sizes, args.min_seconds)
+    if "layout" in suites:
+        results += bench_layout(sizes, args.min_seconds)
+    if "api" in suites:
+        results += bench_api(args.concurrency, args.requests, args.llm_latency, args.design_blocks)
+
+    document = {"environment": environment(), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(json.dumps(dict(regression, regression=True)))
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
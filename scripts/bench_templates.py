@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Template retrieval index benchmark on a synthetic corpus of small designs
+
+Builds the index over --templates designs drawn from a few dozen circuit
+archetypes, then reports build time, incremental insert latency, query
+latency percentiles, how often the top match has the query's archetype, and
+(with --path) the time to reload the index from its SQLite file.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+# Add the backend src directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'src'))
+
+from template_index import TemplateIndex
+
+ARCHETYPES = {
+    "VCO": ["oscillator", "exponential converter", "integrator", "waveshaper", "1V/oct", "saw", "triangle"],
+    "VCF": ["filter", "ladder", "OTA", "resonance", "cutoff", "lowpass", "state variable"],
+    "VCA": ["amplifier", "OTA", "exponential", "linear", "gain", "CV"],
+    "ADSR": ["envelope", "attack", "decay", "sustain", "release", "gate", "555"],
+    "LFO": ["low frequency oscillator", "triangle", "square", "rate", "modulation"],
+    "Mixer": ["mixer", "summing", "inverting", "channel", "attenuator", "line level"],
+    "Distortion": ["fuzz", "overdrive", "clipping", "diode", "tone", "guitar"],
+    "Delay": ["delay", "bucket brigade", "BBD", "echo", "feedback", "PT2399"],
+    "Sequencer": ["sequencer", "step", "clock", "counter", "CD4017", "gate"],
+    "Noise": ["noise", "white", "pink", "transistor", "avalanche", "sample and hold"],
+    "Compressor": ["compressor", "dynamics", "VCA", "sidechain", "threshold", "ratio"],
+    "Preamp": ["preamp", "microphone", "phantom", "gain", "low noise", "JFET"],
+    "Headphone Amp": ["headphone", "amplifier", "buffer", "op-amp", "class AB", "volume"],
+    "Power Supply": ["power supply", "regulator", "LM317", "bipolar", "rectifier", "filter cap"],
+    "LED Blinker": ["LED", "555", "astable", "timer", "blink", "indicator"],
+    "Phaser": ["phaser", "allpass", "LFO", "stage", "sweep", "JFET"],
+    "Chorus": ["chorus", "BBD", "modulation", "delay", "stereo"],
+    "Reverb": ["reverb", "spring", "tank", "driver", "recovery", "plate"],
+    "Wavefolder": ["wavefolder", "folding", "diode", "harmonics", "timbre"],
+    "Ring Modulator": ["ring modulator", "multiplier", "transformer", "carrier", "AD633"]
+}
+QUALIFIERS = ["Eurorack", "guitar pedal", "DIY", "analog", "synth", "lo-fi", "vintage", "stereo", "compact", "5U",
+              "battery powered", "low noise", "through-hole", "SMD", "polyphonic", "modular"]
+
+
+def make_template(rng: random.Random, archetype: str) -> dict:
+    """A small valid design whose name, categories and keywords come from one archetype."""
+    words = ARCHETYPES[archetype]
+    qualifiers = rng.sample(QUALIFIERS, 2)
+    blocks = []
+    for i in range(rng.randint(3, 8)):
+        blocks.append({
+            "id": f"block_{i}",
+            "name": f"{rng.choice(words).title()} Stage {i}",
+            "function": f"{archetype} stage {i}",
+            "position": {"x": 200 * i, "y": 0},
+            "inputs": [{"signal_type": "audio_signal", "name": "In", "required": True}] if i else [],
+            "outputs": [{"signal_type": "audio_signal", "name": "Out"}],
+            "keywords": rng.sample(words, 3) + [rng.choice(QUALIFIERS)]
+        })
+    return {
+        "circuit_info": {
+            "name": f"{' '.join(qualifiers)} {archetype} #{rng.randrange(10 ** 6)}",
+            "description": f"{archetype} built around {rng.choice(words)}",
+            "supply_voltage": rng.choice(["±12V", "+9V", "+5V"]),
+            "categories": [archetype.lower()] + qualifiers
+        },
+        "blocks": blocks,
+        "signal_flow": [
+            {"signal_type": "audio_signal", "from_block": f"block_{i}", "to_block": f"block_{i + 1}"}
+            for i in range(len(blocks) - 1)
+        ]
+    }
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Template retrieval index benchmark")
+    parser.add_argument("--templates", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--inserts", type=int, default=1000, help="Incremental inserts timed after the bulk build")
+    parser.add_argument("--path", help="SQLite file to build (default: in memory); '-' for a temporary file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names = list(ARCHETYPES)
+    corpus = [make_template(rng, rng.choice(names)) for _ in range(args.templates + args.inserts)]
+    path = args.path
+    if path == "-":
+        path = os.path.join(tempfile.mkdtemp(), "templates.db")
+
+    index = TemplateIndex(path=path)
+    start = time.perf_counter()
+    for offset in range(0, args.templates, 1000):
+        index.add_many((design, "") for design in corpus[offset:min(offset + 1000, args.templates)])
+    build = time.perf_counter() - start
+    print(json.dumps({"phase": "build", "templates": len(index), "seconds": round(build, 2),
+                      "per_template_us": round(build / max(1, args.templates) * 1e6, 1), **index.stats()}))
+
+    insert_times = []
+    for design in corpus[args.templates:]:
+        start = time.perf_counter()
+        index.add(design, f"{design['circuit_info']['description']} {' '.join(design['circuit_info']['categories'])}")
+        insert_times.append(time.perf_counter() - start)
+    insert_times.sort()
+    if insert_times:
+        print(json.dumps({"phase": "insert", "inserts": len(insert_times),
+                          "p50_ms": round(percentile(insert_times, 0.5) * 1000, 3),
+                          "p99_ms": round(percentile(insert_times, 0.99) * 1000, 3)}))
+
+    query_times = []
+    correct = 0
+    for _ in range(args.queries):
+        archetype = rng.choice(names)
+        words = ARCHETYPES[archetype]
+        query = f"I want a {rng.choice(QUALIFIERS)} {archetype} with {rng.choice(words)} and {rng.choice(words)}"
+        start = time.perf_counter()
+        matches = index.search(query, limit=5)
+        query_times.append(time.perf_counter() - start)
+        if matches and index.get(matches[0]["template_id"])["circuit_info"]["categories"][0] == archetype.lower():
+            correct += 1
+    query_times.sort()
+    print(json.dumps({"phase": "query", "queries": args.queries,
+                      "p50_ms": round(percentile(query_times, 0.5) * 1000, 2),
+                      "p99_ms": round(percentile(query_times, 0.99) * 1000, 2),
+                      "top1_archetype_accuracy": round(correct / max(1, args.queries), 3),
+                      "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)}))
+
+    if path:
+        start = time.perf_counter()
+        reloaded = TemplateIndex(path=path)
+        print(json.dumps({"phase": "reload", "templates": len(reloaded), "seconds": round(time.perf_counter() - start, 2)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark validate_circuit_design on sample and synthetic designs
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+# Add the backend src directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'src'))
+
+from design_validator import validate_design
+from synthetic_designs import make_synthetic_design
+
+
+def time_per_call(fn, min_seconds: float = 0.5) -> float:
+    """Return the mean seconds per call of fn over at least min_seconds."""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark circuit design validation")
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="Comma-separated synthetic block counts")
+    parser.add_argument("--detect-cycles", action="store_true")
+    args = parser.parse_args()
+
+    samples = os.path.join(os.path.dirname(__file__), '..', 'shared', 'examples', 'sample_circuits', '*.json')
+    for path in sorted(glob.glob(samples)):
+        with open(path) as f:
+            design = json.load(f)
+        seconds = time_per_call(lambda: validate_design(design, detect_cycles=args.detect_cycles))
+        print(json.dumps({"design": os.path.basename(path), "blocks": len(design["blocks"]),
+                          "us_per_call": round(seconds * 1e6, 1)}))
+
+    for size in [int(x) for x in args.sizes.split(",")]:
+        design = make_synthetic_design(size)
+        result = validate_design(design, detect_cycles=args.detect_cycles)
+        seconds = time_per_call(lambda: validate_design(design, detect_cycles=args.detect_cycles))
+        print(json.dumps({"design": "synthetic", "blocks": size, "edges": len(design["signal_flow"]),
+                          "valid": result["valid"], "ms_per_call": round(seconds * 1000, 3),
+                          "us_per_block": round(seconds * 1e6 / size, 2)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Batch export CLI: render circuit designs to SVG, GraphViz DOT, SPICE-style netlists or JSON
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+# Add the backend src directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'src'))
+
+from batch_validation import iter_design_sources
+from exporters import EXPORTERS, export_corpus
+
+
+def output_stems(sources, output_dir):
+    """Pair each source with a unique output path stem in output_dir, named after its file (and JSONL line)."""
+    used = set()
+    for source in sources:
+        path, _, line = source[1].rpartition(":") if source[0] == "line" else (source[1], "", "")
+        stem = os.path.splitext(os.path.basename(path))[0] + (f"_{line}" if line else "")
+        stem = re.sub(r"[^\w.-]", "_", stem)
+        candidate, n = stem, 1
+        while candidate in used:
+            n += 1
+            candidate = f"{stem}_{n}"
+        used.add(candidate)
+        yield source, os.path.join(output_dir, candidate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export directories, .json files and .jsonl files of circuit designs")
+    parser.add_argument("paths", nargs="+", help="Design files, JSONL files or directories")
+    parser.add_argument("-o", "--output-dir", default="exports", help="Directory for the exported files")
+    parser.add_argument("-f", "--formats", default="svg,dot,netlist", help=f"Comma-separated subset of {','.join(EXPORTERS)}")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--no-power", action="store_true", help="Leave power and ground edges out of diagrams")
+    args = parser.parse_args()
+
+    formats = args.formats.split(",")
+    os.makedirs(args.output_dir, exist_ok=True)
+    start = time.perf_counter()
+    exported = failed = 0
+    try:
+        results = export_corpus(
+            output_stems(iter_design_sources(args.paths), args.output_dir),
+            formats,
+            workers=args.workers,
+            include_power=not args.no_power
+        )
+        for result in results:
+            print(json.dumps(result))
+            exported += result["ok"]
+            failed += not result["ok"]
+    except ValueError as e:
+        parser.error(str(e))
+
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"exported": exported, "failed": failed, "elapsed_s": round(elapsed, 3),
+                      "files_per_second": round(exported / elapsed, 1) if elapsed else 0.0}), file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
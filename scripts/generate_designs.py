@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Batch design generation: one non-interactive session per JSONL job, run concurrently
+
+Each line of the jobs file is {"description": ..., "answers": [...]} with an
+optional "id" and "hierarchical". Answers are sent in order after the agent's
+questions, then the design is generated, validated and written to
+<output>/<id>.json. Results go to stdout as JSONL and to
+<output>/checkpoint.jsonl, so running the same command again resumes an
+interrupted run. --message-batches sends the LLM calls through the Message
+Batches API (--local-batches: a local stand-in over the LLM_BACKEND backend).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+# Add the backend src directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'src'))
+
+from batch_generation import CHECKPOINT_FILE, Checkpoint, GenerationSummary, load_jobs, run_jobs
+from circuit_agent import CircuitDesignAgent
+from llm_backend import (AnthropicBackend, LocalMessageBatches, MessageBatchBackend, backend_from_env,
+                         call_settings_from_env)
+from llm_scheduler import LLMScheduler
+from response_cache import ResponseCache
+from template_index import TemplateIndex
+
+
+def make_backend(args):
+    """The LLM backend from the environment, or a MessageBatchBackend with --message-batches/--local-batches."""
+    if not (args.message_batches or args.local_batches):
+        return backend_from_env(), LLMScheduler.from_env()
+    if args.local_batches:
+        batches = LocalMessageBatches(backend_from_env(), delay=args.local_batch_delay)
+    else:
+        batches = AnthropicBackend().client.messages.batches
+    backend = MessageBatchBackend(
+        batches,
+        collect_window=args.collect_window,
+        poll_interval=args.poll_interval,
+        journal_path=os.path.join(args.output, "message_batches.jsonl")
+    )
+    # The Batches API has its own limits; every collected call goes into the batch
+    scheduler = LLMScheduler(max_concurrency=0, max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")))
+    return backend, scheduler
+
+
+async def generate(args, agent, jobs, checkpoint, summary, output):
+    async for result in run_jobs(agent, jobs, args.output, checkpoint, concurrency=args.concurrency,
+                                 hierarchical=True if args.hierarchical else None):
+        summary.add(result)
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate one circuit design per job of a JSONL file")
+    parser.add_argument("jobs", help="JSONL of {\"description\", \"answers\", \"id\"?, \"hierarchical\"?}")
+    parser.add_argument("-o", "--output", default="generated_designs", help="Directory for designs and the checkpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="Sessions running at once")
+    parser.add_argument("--hierarchical", action="store_true", help="Skeleton plus per-block detail calls for every job")
+    parser.add_argument("--retry-invalid", action="store_true", help="Also run again jobs whose design was invalid")
+    parser.add_argument("--restart", action="store_true", help=f"Ignore and replace {CHECKPOINT_FILE}")
+    parser.add_argument("--message-batches", action="store_true",
+                        help="Submit LLM calls through the Message Batches API (slower, cheaper)")
+    parser.add_argument("--local-batches", action="store_true",
+                        help="Like --message-batches, against a local stand-in over LLM_BACKEND")
+    parser.add_argument("--local-batch-delay", type=float, default=0.0, help="Seconds a local batch takes to end")
+    parser.add_argument("--collect-window", type=float, default=2.0,
+                        help="Seconds calls are collected before a batch is submitted")
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="Seconds between batch status checks")
+    args = parser.parse_args()
+
+    try:
+        jobs = load_jobs(args.jobs)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    os.makedirs(args.output, exist_ok=True)
+    checkpoint_path = os.path.join(args.output, CHECKPOINT_FILE)
+    if args.restart:
+        for name in (CHECKPOINT_FILE, "message_batches.jsonl"):
+            if os.path.exists(os.path.join(args.output, name)):
+                os.remove(os.path.join(args.output, name))
+    checkpoint = Checkpoint(checkpoint_path)
+    pending = [job for job in jobs if not checkpoint.finished(job["id"], args.retry_invalid)]
+    summary = GenerationSummary(len(jobs), len(jobs) - len(pending))
+
+    try:
+        backend, scheduler = make_backend(args)
+        agent = CircuitDesignAgent(
+            prompt_caching=os.getenv("PROMPT_CACHING", "1") != "0",
+            auto_layout=os.getenv("AUTO_LAYOUT", "1") != "0",
+            llm_repair=os.getenv("LLM_REPAIR", "1") != "0",
+            temperature=float(os.getenv("LLM_TEMPERATURE", "0.7")),
+            response_cache=ResponseCache.from_env(),
+            backend=backend,
+            call_settings=call_settings_from_env(),
+            design_candidates=int(os.getenv("DESIGN_CANDIDATES", "1")),
+            history_token_budget=int(os.getenv("HISTORY_TOKEN_BUDGET", "8000")),
+            block_detail_concurrency=int(os.getenv("BLOCK_DETAIL_CONCURRENCY", "8")),
+            scheduler=scheduler,
+            template_index=TemplateIndex.from_env(),
+            template_reuse_score=float(os.getenv("TEMPLATE_REUSE_SCORE", "0.9")),
+            template_hint_score=float(os.getenv("TEMPLATE_HINT_SCORE", "0.3"))
+        )
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    try:
+        asyncio.run(generate(args, agent, pending, checkpoint, summary, sys.stdout))
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume", file=sys.stderr)
+
+    report = summary.as_dict()
+    report["usage"] = agent.usage_metrics.summary()["by_call_type"]
+    if isinstance(backend, MessageBatchBackend):
+        report["message_batches"] = backend.stats()
+    print(json.dumps(report, indent=2), file=sys.stderr)
+    succeeded = all(checkpoint.results.get(job["id"], {}).get("status") == "ok" for job in jobs)
+    sys.exit(0 if succeeded else 1)
+
+
+if __name__ == "__main__":
+    main()
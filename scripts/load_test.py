@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Load test for the Circuit Design Agent API against a local mock Messages endpoint
+or the in-process fake LLM backend
+"""
+
+import argparse
+import http.server
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# Add the backend api/src directories to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'api'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'src'))
+
+MOCK_REPLY = "1. What frequency range do you need?\n2. What supply voltage will you use?"
+
+
+class MockMessagesHandler(http.server.BaseHTTPRequestHandler):
+    """Answers POST /v1/messages like the Anthropic Messages API after a fixed delay."""
+
+    latency = 0.5
+    reply = MOCK_REPLY
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(self.latency)
+
+        if request.get("stream"):
+            self.send_stream()
+            return
+
+        body = json.dumps({
+            "id": "msg_mock",
+            "type": "message",
+            "role": "assistant",
+            "model": "mock",
+            "content": [{"type": "text", "text": self.reply}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 100, "output_tokens": 20,
+                      "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_stream(self):
+        """Send the reply as Messages API streaming events in small chunks."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+
+        def event(name, data):
+            self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode())
+            self.wfile.flush()
+
+        event("message_start", {"type": "message_start", "message": {
+            "id": "msg_mock", "type": "message", "role": "assistant", "model": "mock",
+            "content": [], "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": 100, "output_tokens": 0}
+        }})
+        event("content_block_start", {"type": "content_block_start", "index": 0,
+                                      "content_block": {"type": "text", "text": ""}})
+        for i in range(0, len(self.reply), 64):
+            event("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                          "delta": {"type": "text_delta", "text": self.reply[i:i + 64]}})
+        event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        event("message_delta", {"type": "message_delta",
+                                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                "usage": {"output_tokens": len(self.reply) // 4}})
+        event("message_stop", {"type": "message_stop"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def free_port() -> int:
+    """Return a free local TCP port."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mock_server(latency: float) -> str:
+    """Start the mock Messages endpoint in a background thread and return its base URL."""
+    MockMessagesHandler.latency = latency
+    port = free_port()
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", port), MockMessagesHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{port}"
+
+
+def start_api_server(mock_url: Optional[str]) -> str:
+    """Start the FastAPI app on a single uvicorn worker pointed at the mock endpoint (or the fake backend)."""
+    import uvicorn
+
+    if mock_url:
+        os.environ["ANTHROPIC_BASE_URL"] = mock_url
+        os.environ.setdefault("ANTHROPIC_API_KEY", "mock-key")
+    from server import app
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def post_json(url: str, payload: dict) -> float:
+    """POST a JSON payload and return the request latency in seconds."""
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"}
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def run_level(api_url: str, concurrency: int, requests_per_client: int) -> dict:
+    """Fire concurrent /api/session/start requests and return throughput stats."""
+    total = concurrency * requests_per_client
+    url = f"{api_url}/api/session/start"
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(
+            lambda i: post_json(url, {"description": f"555 square wave oscillator #{i}"}),
+            range(total)
+        ))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against a mock Messages endpoint")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mock LLM latency in seconds")
+    parser.add_argument("--levels", default="1,4,16,64", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests-per-client", type=int, default=2)
+    parser.add_argument("--backend", choices=["mock", "fake"], default="mock",
+                        help="mock: HTTP mock Messages endpoint through the Anthropic client; fake: in-process FakeBackend")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Fake backend output token rate (0 = instant)")
+    args = parser.parse_args()
+
+    if args.backend == "fake":
+        os.environ["LLM_BACKEND"] = "fake"
+        os.environ["LLM_FAKE_LATENCY"] = str(args.latency)
+        os.environ["LLM_FAKE_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+        mock_url = None
+        print(f"Fake LLM backend (latency {args.latency}s, {args.tokens_per_second or 'unlimited'} tokens/s)")
+    else:
+        mock_url = start_mock_server(args.latency)
+        print(f"Mock Messages endpoint: {mock_url} (latency {args.latency}s)")
+    api_url = start_api_server(mock_url)
+    print(f"API server: {api_url}\n")
+
+    for level in [int(x) for x in args.levels.split(",")]:
+        result = run_level(api_url, level, args.requests_per_client)
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,11 +6,44 @@ CLI interface for Circuit Design Agent
 import sys
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 # Add the backend src directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'src'))
 
 from circuit_agent import CircuitDesignAgent
+from design_prefetch import looks_ready_to_generate, state_key
+from exporters import write_export
+from llm_backend import LLMError
+from llm_scheduler import LLMScheduler, mark_speculative
+
+def prefetch_design(executor, agent):
+    """Start generating the design on a copy of the session; returns (session state key, future)."""
+    state = agent.session_state()
+    session = agent.for_session(state)
+    
+    def generate():
+        mark_speculative()
+        return session.generate_circuit_design(), session
+    
+    return state_key(state), executor.submit(generate)
+
+def take_prefetched(prefetch, agent):
+    """Return the prefetched design if the session has not changed since it started and it succeeded, else None."""
+    key, future = prefetch
+    if key != state_key(agent.session_state()):
+        future.cancel()
+        return None
+    try:
+        design, session = future.result()
+    except LLMError:
+        return None
+    if "error" in design:
+        return None
+    agent.last_template = session.last_template
+    # Speculative generations are not indexed until their design is used
+    session.learn_template(design)
+    return design
 
 def main():
     """Main function to demonstrate the circuit design agent."""
@@ -18,7 +51,7 @@ def main():
     
     # Initialize agent
     try:
-        agent = CircuitDesignAgent()
+        agent = CircuitDesignAgent(scheduler=LLMScheduler.from_env())
     except ValueError as e:
         print(f"Error: {e}")
         print("Please set your Anthropic API key in .env file or pass api_key parameter.")
@@ -33,9 +66,18 @@ def main():
     
     # Start the design session
     print("\n" + "="*50)
-    response = agent.start_design_session(initial_description)
+    try:
+        response = agent.start_design_session(initial_description)
+    except LLMError as e:
+        print(f"Error: {e}")
+        return
     print(f"Agent: {response}")
     
+    # With DESIGN_PREFETCH=1 the design is generated in the background once the agent
+    # summarizes the requirements, and used if the next input is 'generate'
+    executor = ThreadPoolExecutor(max_workers=1) if os.getenv("DESIGN_PREFETCH", "0") == "1" else None
+    prefetch = None
+    
     # Interactive conversation loop
     while True:
         print("\n" + "-"*30)
@@ -48,7 +90,14 @@ def main():
         if user_input.lower() == 'generate':
             print("\n" + "="*50)
             print("Generating circuit design...")
-            circuit_design = agent.generate_circuit_design()
+            try:
+                circuit_design = take_prefetched(prefetch, agent) if prefetch else None
+                prefetch = None
+                if circuit_design is None:
+                    circuit_design = agent.generate_circuit_design()
+            except LLMError as e:
+                print(f"Error: {e}. Type 'generate' to try again.")
+                continue
             
             if "error" in circuit_design:
                 print(f"Error: {circuit_design['error']}")
@@ -63,14 +112,32 @@ def main():
                 with open(output_path, "w") as f:
                     json.dump(circuit_design, f, indent=2)
                 print(f"\nCircuit design saved to '{output_path}'")
+                
+                # Block diagram next to it; scripts/export_designs.py renders DOT and netlists too
+                svg_path = os.path.splitext(output_path)[0] + ".svg"
+                with open(svg_path, "w", encoding="utf-8") as f:
+                    write_export(circuit_design, "svg", f)
+                print(f"Block diagram saved to '{svg_path}'")
             break
         
         if not user_input.strip():
             print("Please provide a response.")
             continue
         
-        response = agent.process_user_response(user_input)
+        try:
+            response = agent.process_user_response(user_input)
+        except LLMError as e:
+            print(f"Error: {e}. Please send your response again.")
+            continue
         print(f"\nAgent: {response}")
+        if prefetch:
+            prefetch[1].cancel()
+            prefetch = None
+        if executor and looks_ready_to_generate(response):
+            prefetch = prefetch_design(executor, agent)
+    
+    if executor:
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 if __name__ == "__main__":
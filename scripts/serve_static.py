@@ -1,42 +1,387 @@
 #!/usr/bin/env python3
 """
-Simple HTTP server to serve the circuit viewer files
+Static file server for the frontend bundle and the example designs
+
+Serves frontend/dist (or frontend/ when there is no build) at / and
+shared/examples at /examples/ from a thread per connection, with HTTP/1.1
+keep-alive, ETag/Last-Modified revalidation, precompressed .br/.gz variants
+(--precompress writes them), zero-copy sendfile and Server-Sent Events at
+/__events that announce every file change, so viewers no longer poll JSON.
 """
 
-import http.server
-import socketserver
-import webbrowser
+import argparse
+import gzip
+import json
+import mimetypes
 import os
-from pathlib import Path
+import posixpath
+import queue
+import sys
+import threading
+import time
+import webbrowser
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+# Add the backend src directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'src'))
+
+from compression import MIN_COMPRESS_BYTES, accepted_encodings, brotli
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PORT = 8080
+EVENTS_PATH = "/__events"
+
+# Precompressed variants by preference: (Content-Encoding, file suffix)
+VARIANTS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml", "application/xml")
+# Build outputs with content hashes in their names never change under the same URL
+IMMUTABLE_DIRS = ("/assets/",)
+HEARTBEAT_SECONDS = 15
+
+
+def default_mounts() -> List[Tuple[str, str]]:
+    """URL prefix -> directory pairs, longest prefix first: the example designs and the frontend."""
+    frontend = os.path.join(ROOT, "frontend")
+    if os.path.isdir(os.path.join(frontend, "dist")):
+        frontend = os.path.join(frontend, "dist")
+    return [("/examples/", os.path.join(ROOT, "shared", "examples")), ("/", frontend)]
+
+
+def content_type(path: str) -> str:
+    if path.endswith(".json"):
+        return "application/json"
+    guessed = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return guessed + "; charset=utf-8" if guessed.startswith("text/") or guessed == "application/javascript" else guessed
+
+
+def is_compressible(path: str) -> bool:
+    return content_type(path).startswith(COMPRESSIBLE_TYPES)
+
+
+def precompress(directories: List[str], level: int = 9) -> int:
+    """Write .gz (and, with the brotli package, .br) next to every compressible file that lacks an up-to-date one."""
+    written = 0
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith((".gz", ".br")) or not is_compressible(path) or os.path.getsize(path) < MIN_COMPRESS_BYTES:
+                    continue
+                mtime = os.stat(path).st_mtime_ns
+                for encoding, suffix in VARIANTS:
+                    if encoding == "br" and brotli is None:
+                        continue
+                    target = path + suffix
+                    if os.path.exists(target) and os.stat(target).st_mtime_ns >= mtime:
+                        continue
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    data = brotli.compress(data, quality=11) if encoding == "br" else gzip.compress(data, compresslevel=level, mtime=0)
+                    with open(target + ".tmp", "wb") as f:
+                        f.write(data)
+                    os.replace(target + ".tmp", target)
+                    written += 1
+    return written
+
+
+class ChangeNotifier:
+    """Watches the mounted directories and fans file changes out to SSE subscribers.
+
+    A background thread compares (mtime, size) of every file every interval
+    seconds, without any file-watching dependency; compressed variants are
+    ignored. Each subscriber gets its own bounded queue, so one slow client
+    never blocks the others (it loses events instead).
+    """
+
+    def __init__(self, mounts: List[Tuple[str, str]], interval: float = 0.5):
+        self.mounts = mounts
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._snapshot = self._scan()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="static-watcher", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def subscribe(self) -> "queue.Queue":
+        subscriber = queue.Queue(maxsize=256)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: "queue.Queue") -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        files = {}
+        for prefix, directory in self.mounts:
+            for root, dirs, names in os.walk(directory):
+                # A nested mount (such as /examples/ inside /) is reported under its own prefix
+                dirs[:] = [d for d in dirs if d != "node_modules" and not d.startswith(".")]
+                for name in names:
+                    if name.endswith((".gz", ".br", ".tmp")):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    url = prefix + os.path.relpath(path, directory).replace(os.sep, "/")
+                    files[url] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            snapshot = self._scan()
+            changes = [{"path": url, "change": "deleted"} for url in self._snapshot.keys() - snapshot.keys()]
+            for url, state in snapshot.items():
+                previous = self._snapshot.get(url)
+                if previous != state:
+                    changes.append({"path": url, "change": "created" if previous is None else "modified"})
+            self._snapshot = snapshot
+            if changes:
+                self._publish(changes)
 
-PORT = 8000
+    def _publish(self, changes: List[Dict[str, str]]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            for change in changes:
+                try:
+                    subscriber.put_nowait(change)
+                except queue.Full:
+                    break
+
+
+class StaticHandler(BaseHTTPRequestHandler):
+    """GET/HEAD of mounted files with conditional requests, precompressed variants and sendfile."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "CircuitStatic/1.0"
+    # Headers and a sendfile body go out as separate writes; with Nagle the body waits for a delayed ACK
+    disable_nagle_algorithm = True
+    # Set by make_server
+    mounts = []
+    notifier = None
+    spa_fallback = True
+    quiet = False
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
 
-class CORSHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     def end_headers(self):
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, HEAD, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type, If-None-Match, If-Modified-Since")
         super().end_headers()
 
-def main():
-    # Change to the directory containing the files
-    os.chdir(Path(__file__).parent)
-    
-    handler = CORSHTTPRequestHandler
-    
-    with socketserver.TCPServer(("", PORT), handler) as httpd:
-        print(f"🚀 Circuit Viewer Server running at http://localhost:{PORT}")
-        print(f"📁 Serving files from: {os.getcwd()}")
-        print(f"🔗 Open this URL: http://localhost:{PORT}/dynamic_circuit_viewer.html")
-        print(f"⚡ Dynamic JSON reload enabled - change any JSON file and see updates!")
-        print(f"🛑 Press Ctrl+C to stop the server")
-        
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _serve(self, head: bool) -> None:
+        url_path = unquote(urlsplit(self.path).path)
+        if url_path == EVENTS_PATH and not head:
+            self._stream_events()
+            return
+        path = self._resolve(url_path)
+        if path is None:
+            self._send_status(404, "Not Found")
+            return
+
+        stat = os.stat(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+        if self._not_modified(etag, stat.st_mtime):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self._send_cache_headers(url_path)
+            self.end_headers()
+            return
+
+        served, encoding, size = self._variant(path, stat)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type(path))
+        self.send_header("Content-Length", str(size))
+        self.send_header("ETag", etag if encoding is None else f'{etag[:-1]}-{encoding}"')
+        self.send_header("Last-Modified", last_modified)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if is_compressible(path):
+            self.send_header("Vary", "Accept-Encoding")
+        self._send_cache_headers(url_path)
+        self.end_headers()
+        if head:
+            return
+        with open(served, "rb") as f:
+            # Zero-copy from the page cache to the socket (os.sendfile) where the platform has it
+            self.connection.sendfile(f, 0, size)
+
+    def _resolve(self, url_path: str) -> Optional[str]:
+        """Map a URL path to a file inside a mount (index.html for directories), or None."""
+        normalized = posixpath.normpath(url_path)
+        for prefix, directory in self.mounts:
+            base = prefix.rstrip("/")
+            if normalized != base and not normalized.startswith(base + "/"):
+                continue
+            relative = normalized[len(base):].strip("/")
+            path = os.path.realpath(os.path.join(directory, *relative.split("/")))
+            if path != directory and not path.startswith(directory + os.sep):
+                return None
+            if os.path.isdir(path):
+                path = os.path.join(path, "index.html")
+            if os.path.isfile(path):
+                return path
+            if prefix == "/" and self.spa_fallback and "." not in posixpath.basename(normalized):
+                # Client-side routes of the single-page app load its index.html
+                index = os.path.join(directory, "index.html")
+                return index if os.path.isfile(index) else None
+            return None
+        return None
+
+    def _not_modified(self, etag: str, mtime: float) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            # A variant's ETag ("...-gzip") revalidates the same file
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or any(tag == etag or tag.startswith(etag[:-1] + "-") for tag in tags)
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _variant(self, path: str, stat: os.stat_result) -> Tuple[str, Optional[str], int]:
+        """The file to send, its Content-Encoding and size: an up-to-date precompressed variant if the client accepts it."""
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+        if accepted and is_compressible(path):
+            for encoding, suffix in VARIANTS:
+                if accepted.get(encoding, 0) <= 0:
+                    continue
+                try:
+                    variant = os.stat(path + suffix)
+                except OSError:
+                    continue
+                if variant.st_mtime_ns >= stat.st_mtime_ns:
+                    return path + suffix, encoding, variant.st_size
+        return path, None, stat.st_size
+
+    def _send_cache_headers(self, url_path: str) -> None:
+        if any(part in url_path for part in IMMUTABLE_DIRS):
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        else:
+            self.send_header("Cache-Control", "no-cache")
+
+    def _send_status(self, code: int, message: str) -> None:
+        body = message.encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_events(self) -> None:
+        """Send a "change" event ({"path", "change"}) for every file created, modified or deleted, until the client leaves."""
+        if self.notifier is None:
+            self._send_status(404, "File change events are disabled")
+            return
+        subscriber = self.notifier.subscribe()
+        self.close_connection = True
         try:
-            # Open browser automatically
-            webbrowser.open(f"http://localhost:{PORT}/dynamic_circuit_viewer.html")
-            httpd.serve_forever()
-        except KeyboardInterrupt:
-            print("\n👋 Server stopped. Goodbye!")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("X-Accel-Buffering", "no")
+            self.end_headers()
+            self.wfile.write(b"retry: 1000\n\n")
+            while True:
+                try:
+                    change = subscriber.get(timeout=HEARTBEAT_SECONDS)
+                    self.wfile.write(f"event: change\ndata: {json.dumps(change)}\n\n".encode())
+                except queue.Empty:
+                    # Comment line: keeps proxies from timing out and detects closed connections
+                    self.wfile.write(b": heartbeat\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.notifier.unsubscribe(subscriber)
+
+
+def make_server(host: str, port: int, mounts: Optional[List[Tuple[str, str]]] = None, watch: bool = True,
+                watch_interval: float = 0.5, quiet: bool = False) -> ThreadingHTTPServer:
+    """Create a threaded static server over mounts (default: default_mounts()); the caller runs serve_forever()."""
+    mounts = [(prefix, os.path.realpath(directory)) for prefix, directory in (mounts or default_mounts())]
+    notifier = ChangeNotifier(mounts, watch_interval) if watch else None
+    handler = type("MountedStaticHandler", (StaticHandler,), {"mounts": mounts, "notifier": notifier, "quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    if notifier:
+        notifier.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the frontend bundle and example designs")
+    parser.add_argument("--host", default="")
+    parser.add_argument("--port", type=int, default=int(os.getenv("STATIC_PORT", PORT)),
+                        help=f"Port (default: {PORT}, so it does not clash with the API on 8000)")
+    parser.add_argument("--mount", action="append", metavar="PREFIX=DIR",
+                        help="Serve DIR under URL PREFIX instead of the defaults (repeatable)")
+    parser.add_argument("--precompress", action="store_true", help="Write missing or stale .gz/.br variants before serving")
+    parser.add_argument("--no-watch", action="store_true", help=f"Disable file change events at {EVENTS_PATH}")
+    parser.add_argument("--quiet", action="store_true", help="Do not log requests")
+    parser.add_argument("--open", action="store_true", help="Open the frontend in a browser")
+    args = parser.parse_args()
+
+    mounts = default_mounts()
+    if args.mount:
+        mounts = []
+        for mount in args.mount:
+            prefix, _, directory = mount.partition("=")
+            mounts.append((prefix.rstrip("/") + "/", directory))
+        mounts.sort(key=lambda m: len(m[0]), reverse=True)
+    if args.precompress:
+        start = time.perf_counter()
+        written = precompress([directory for _, directory in mounts])
+        print(f"Precompressed {written} variants in {time.perf_counter() - start:.2f}s")
+
+    server = make_server(args.host, args.port, mounts, watch=not args.no_watch, quiet=args.quiet)
+    url = f"http://localhost:{args.port}/"
+    print(f"🚀 Static server running at {url}")
+    for prefix, directory in mounts:
+        print(f"📁 {prefix} -> {os.path.realpath(directory)}")
+    if not args.no_watch:
+        print(f"⚡ File change events: {url.rstrip('/')}{EVENTS_PATH}")
+    print("🛑 Press Ctrl+C to stop the server")
+    try:
+        if args.open:
+            webbrowser.open(url)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped. Goodbye!")
+    finally:
+        server.server_close()
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Synthetic circuit designs of arbitrary size for benchmarks
+"""
+
+import random
+
+AUDIO_TYPES = ["audio_signal", "cv_signal", "gate_signal"]
+
+
+def make_synthetic_design(num_blocks: int, seed: int = 0, fan_in: int = 2) -> dict:
+    """Build a valid layered design: a power block feeding num_blocks - 1 signal blocks.
+
+    Each signal block takes up to fan_in edges from earlier blocks, so the
+    signal graph is acyclic and roughly num_blocks * (fan_in + 2) edges long.
+    """
+    rng = random.Random(seed)
+    blocks = [{
+        "id": "power_supply",
+        "name": "Power Supply",
+        "function": "Regulated power supply",
+        "position": {"x": 0, "y": 0},
+        "inputs": [],
+        "outputs": [
+            {"signal_type": "power_12v", "name": "+12V"},
+            {"signal_type": "ground", "name": "GND"}
+        ],
+        "how_it_works": "Linear regulator",
+        "keywords": ["power", "regulator"],
+        "parameters": {"current": "100mA"}
+    }]
+    signal_flow = []
+
+    for i in range(1, num_blocks):
+        block_id = f"block_{i}"
+        signal_type = AUDIO_TYPES[i % len(AUDIO_TYPES)]
+        blocks.append({
+            "id": block_id,
+            "name": f"Block {i}",
+            "function": f"Processing stage {i}",
+            "position": {"x": 0, "y": 0},
+            "inputs": [
+                {"signal_type": t, "name": f"In {t}", "required": True} for t in AUDIO_TYPES
+            ] + [
+                {"signal_type": "power_12v", "name": "+12V", "required": True},
+                {"signal_type": "ground", "name": "GND", "required": True}
+            ],
+            "outputs": [{"signal_type": signal_type, "name": "Out"}],
+            "how_it_works": "Op-amp gain stage",
+            "keywords": ["op-amp", "buffer"],
+            "parameters": {"gain": "2", "current": "5mA"}
+        })
+        signal_flow.append({"signal_type": "power_12v", "from_block": "power_supply", "to_block": block_id})
+        signal_flow.append({"signal_type": "ground", "from_block": "power_supply", "to_block": block_id})
+        if i > 1:
+            for source in rng.sample(range(1, i), min(fan_in, i - 1)):
+                signal_flow.append({
+                    "signal_type": AUDIO_TYPES[source % len(AUDIO_TYPES)],
+                    "from_block": f"block_{source}",
+                    "to_block": block_id
+                })
+
+    return {
+        "circuit_info": {
+            "name": f"Synthetic {num_blocks}-block design",
+            "description": "Generated for benchmarks",
+            "supply_voltage": "±12V",
+            "categories": ["synthetic"]
+        },
+        "blocks": blocks,
+        "signal_flow": signal_flow
+    }
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Bulk validation CLI for circuit design corpora
+"""
+
+import argparse
+import json
+import os
+import sys
+
+# Add the backend src directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'src'))
+
+from batch_validation import iter_design_sources, validate_corpus, ValidationSummary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate directories, .json files and .jsonl files of circuit designs")
+    parser.add_argument("paths", nargs="+", help="Design files, JSONL files or directories")
+    parser.add_argument("-o", "--output", help="Write per-design results as JSONL here (default: stdout)")
+    parser.add_argument("--summary", help="Also write the summary JSON to this file")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Designs per worker task")
+    parser.add_argument("--strict-ports", action="store_true", help="Unconnected required inputs are errors")
+    parser.add_argument("--detect-cycles", action="store_true", help="Report loops in the signal graph")
+    parser.add_argument("--errors-only", action="store_true", help="Only write results for invalid designs")
+    args = parser.parse_args()
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    summary = ValidationSummary()
+
+    try:
+        results = validate_corpus(
+            iter_design_sources(args.paths),
+            workers=args.workers,
+            batch_size=args.batch_size,
+            strict_ports=args.strict_ports,
+            detect_cycles=args.detect_cycles
+        )
+        for result in results:
+            summary.add(result)
+            if result["valid"] and args.errors_only:
+                continue
+            output.write(json.dumps(result) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    summary_json = json.dumps(summary.as_dict(), indent=2)
+    print(summary_json, file=sys.stderr)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            f.write(summary_json + "\n")
+
+    sys.exit(0 if summary.valid == summary.total else 1)
+
+
+if __name__ == "__main__":
+    main()